@@ -0,0 +1,245 @@
+import asyncio
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+
+from bson import Binary
+
+from ids import format_timestamp, parse_timestamp, utcnow
+from pagination import before_clause, time_clause
+
+logger = logging.getLogger(__name__)
+
+# Messages per bucket document, well under the 16MB document limit
+BUCKET_MAX_MESSAGES = 500
+# A bucket never spans two windows of this size
+BUCKET_WINDOW_HOURS = 24
+ARCHIVE_INTERVAL_SECONDS = 600
+# Compactor rate limit
+ARCHIVE_BUCKETS_PER_SECOND = 5
+# Channels picked up per compaction pass
+ARCHIVE_CHANNELS_PER_PASS = 1000
+
+
+def message_key(message: dict) -> Tuple[datetime, str]:
+    return (parse_timestamp(message['created_at']), message['id'])
+
+
+def window_start(created_at) -> datetime:
+    moment = parse_timestamp(created_at)
+    hour = moment.hour - moment.hour % BUCKET_WINDOW_HOURS if BUCKET_WINDOW_HOURS < 24 else 0
+    return moment.replace(hour=hour, minute=0, second=0, microsecond=0)
+
+
+def encode_messages(messages: List[dict], compress: bool) -> dict:
+    if compress:
+        raw = json.dumps(messages, separators=(',', ':'), default=format_timestamp).encode()
+        return {'codec': 'zlib', 'data': Binary(zlib.compress(raw))}
+    return {'codec': 'none', 'messages': messages}
+
+
+def decode_bucket(bucket: dict) -> List[dict]:
+    if bucket.get('codec') == 'zlib':
+        messages = json.loads(zlib.decompress(bytes(bucket['data'])))
+        for message in messages:
+            message['created_at'] = parse_timestamp(message['created_at'])
+        return messages
+    return bucket.get('messages', [])
+
+
+async def iter_archived(db, channel_id: str) -> AsyncIterator[dict]:
+    """Archived messages of a channel, oldest first."""
+    cursor = db.message_buckets.find({'channel_id': channel_id}, {'_id': 0}).sort('first_created_at', 1).batch_size(4)
+    async for bucket in cursor:
+        for message in sorted(decode_bucket(bucket), key=message_key):
+            yield message
+
+
+class MessageArchive:
+    """Cold storage for old channel messages, compacted into time-window buckets.
+
+    Messages older than ``archive_after_days`` are moved, oldest first, into
+    ``message_buckets`` documents of up to BUCKET_MAX_MESSAGES messages that
+    never span two windows. A bucket is upserted as ``pending``, its hot
+    messages are deleted, then it is marked ``committed``. Every pass first
+    finishes the deletes of any pending bucket, so a crash at any step leaves
+    at most temporary duplicates, which readers drop by id.
+
+    Each bucket lists its ``message_ids`` so ``find`` can fetch one archived
+    message, which lets ``since`` polling continue from an archived anchor
+    through ``read_after``. Archived messages are read-only: reactions only
+    apply to hot messages.
+    """
+
+    def __init__(self, db, archive_after_days: int = 30, compress: bool = True):
+        self.db = db
+        self.archive_after_days = archive_after_days
+        self.compress = compress
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.archive_after_days > 0
+
+    async def ensure_indexes(self):
+        await self.db.messages.create_index([('channel_id', 1), ('created_at', -1), ('id', -1)])
+        await self.db.messages.create_index([('created_at', 1)])
+        await self.db.message_buckets.create_index([('channel_id', 1), ('last_created_at', -1)])
+        await self.db.message_buckets.create_index([('channel_id', 1), ('first_created_at', 1)])
+        await self.db.message_buckets.create_index('id', unique=True)
+        await self.db.message_buckets.create_index([('channel_id', 1), ('message_ids', 1)])
+        await self.db.message_buckets.create_index('state', partialFilterExpression={'state': 'pending'})
+
+    # ---------- reads ----------
+
+    async def read_page(self, channel_id: str, limit: int, position: Optional[list]) -> Tuple[List[dict], Optional[list]]:
+        """Newest-first page across hot messages and cold buckets, keyset paginated on (created_at, id)."""
+        query = {'channel_id': channel_id}
+        if position:
+            query.update(before_clause('created_at', position[0], 'id', position[1]))
+        hot = await self.db.messages.find(query, {'_id': 0}).sort([('created_at', -1), ('id', -1)]).limit(limit + 1).to_list(limit + 1)
+
+        merged = {m['id']: m for m in hot}
+        if len(hot) <= limit:
+            # Hot messages aren't necessarily newer than archived ones (late imports), so ask for a full page
+            for message in await self._read_cold(channel_id, limit + 1, position):
+                merged.setdefault(message['id'], message)
+
+        messages = sorted(merged.values(), key=message_key, reverse=True)
+        if len(messages) > limit:
+            messages = messages[:limit]
+            return messages, [messages[-1]['created_at'], messages[-1]['id']]
+        return messages, None
+
+    async def read_after(self, channel_id: str, limit: int, position: list) -> List[dict]:
+        """Oldest-first messages after ``position`` across hot messages and cold buckets."""
+        query = {'channel_id': channel_id, **before_clause('created_at', position[0], 'id', position[1], descending=False)}
+        hot = await self.db.messages.find(query, {'_id': 0}).sort([('created_at', 1), ('id', 1)]).limit(limit).to_list(limit)
+
+        after = (parse_timestamp(position[0]), position[1])
+        cursor = self.db.message_buckets.find(
+            {'channel_id': channel_id, **time_clause('last_created_at', '$gte', position[0])}, {'_id': 0}
+        ).sort('first_created_at', 1).batch_size(4)
+        merged = {m['id']: m for m in hot}
+        async for bucket in cursor:
+            messages = sorted(merged.values(), key=message_key)
+            # Buckets come oldest first; stop once this one can't beat a full page
+            if len(messages) >= limit and parse_timestamp(bucket['first_created_at']) > message_key(messages[limit - 1])[0]:
+                break
+            for message in decode_bucket(bucket):
+                if message_key(message) > after:
+                    merged.setdefault(message['id'], message)
+        return sorted(merged.values(), key=message_key)[:limit]
+
+    async def find(self, channel_id: str, message_id: str) -> Optional[dict]:
+        """An archived message by id, or None."""
+        # Buckets written before message_ids was recorded have to be opened to check
+        cursor = self.db.message_buckets.find(
+            {'channel_id': channel_id, '$or': [{'message_ids': message_id}, {'message_ids': {'$exists': False}}]}, {'_id': 0}
+        ).batch_size(4)
+        async for bucket in cursor:
+            for message in decode_bucket(bucket):
+                if message['id'] == message_id:
+                    return message
+        return None
+
+    async def _read_cold(self, channel_id: str, needed: int, position: Optional[list]) -> List[dict]:
+        query = {'channel_id': channel_id}
+        if position:
+            query.update(time_clause('first_created_at', '$lte', position[0]))
+            before = (parse_timestamp(position[0]), position[1])
+        cursor = self.db.message_buckets.find(query, {'_id': 0}).sort('last_created_at', -1).batch_size(4)
+
+        found: List[dict] = []
+        async for bucket in cursor:
+            if len(found) >= needed:
+                # Buckets come newest first; stop once this one can't beat what we have
+                found.sort(key=message_key, reverse=True)
+                if parse_timestamp(bucket['last_created_at']) < parse_timestamp(found[needed - 1]['created_at']):
+                    break
+            for message in decode_bucket(bucket):
+                if position is None or message_key(message) < before:
+                    found.append(message)
+        found.sort(key=message_key, reverse=True)
+        return found[:needed]
+
+    # ---------- compaction ----------
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.compact_once()
+            except Exception as e:
+                logger.error(f"Message archive compaction failed: {str(e)}")
+            await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+    def cutoff(self) -> datetime:
+        return utcnow() - timedelta(days=self.archive_after_days)
+
+    async def recover(self):
+        async for bucket in self.db.message_buckets.find({'state': 'pending'}, {'_id': 0}):
+            await self._commit_bucket(bucket['id'], [m['id'] for m in decode_bucket(bucket)])
+
+    async def compact_once(self) -> int:
+        await self.recover()
+        cutoff = self.cutoff()
+        groups = await self.db.messages.aggregate([
+            {'$match': time_clause('created_at', '$lt', cutoff)},
+            {'$group': {'_id': '$channel_id'}},
+            {'$limit': ARCHIVE_CHANNELS_PER_PASS},
+        ]).to_list(ARCHIVE_CHANNELS_PER_PASS)
+
+        buckets = 0
+        for group in groups:
+            buckets += await self.compact_channel(group['_id'], cutoff)
+        if buckets:
+            logger.info(f"Archived {buckets} message buckets across {len(groups)} channels")
+        return buckets
+
+    async def compact_channel(self, channel_id: str, cutoff: datetime) -> int:
+        buckets = 0
+        while True:
+            batch = await self.db.messages.find(
+                {'channel_id': channel_id, **time_clause('created_at', '$lt', cutoff)}, {'_id': 0}
+            ).sort([('created_at', 1), ('id', 1)]).limit(BUCKET_MAX_MESSAGES).to_list(BUCKET_MAX_MESSAGES)
+            if not batch:
+                return buckets
+
+            window = window_start(batch[0]['created_at'])
+            window_end = window + timedelta(hours=BUCKET_WINDOW_HOURS)
+            messages = [m for m in batch if parse_timestamp(m['created_at']) < window_end]
+            bucket_id = await self._write_bucket(channel_id, window, messages)
+            await self._commit_bucket(bucket_id, [m['id'] for m in messages])
+
+            buckets += 1
+            await asyncio.sleep(1 / ARCHIVE_BUCKETS_PER_SECOND)
+
+    async def _commit_bucket(self, bucket_id: str, message_ids: List[str]):
+        await self.db.messages.delete_many({'id': {'$in': message_ids}})
+        await self.db.message_buckets.update_one({'id': bucket_id}, {'$set': {'state': 'committed'}})
+
+    async def _write_bucket(self, channel_id: str, window: datetime, messages: List[dict]) -> str:
+        bucket = {
+            'id': f"{channel_id}:{messages[0]['id']}",
+            'channel_id': channel_id,
+            'window_start': window,
+            'first_created_at': messages[0]['created_at'],
+            'last_created_at': messages[-1]['created_at'],
+            'count': len(messages),
+            'message_ids': [m['id'] for m in messages],
+            'state': 'pending',
+            **encode_messages(messages, self.compress),
+        }
+        await self.db.message_buckets.replace_one({'id': bucket['id']}, bucket, upsert=True)
+        return bucket['id']
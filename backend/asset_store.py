@@ -0,0 +1,329 @@
+import hashlib
+import random
+import tarfile
+import zlib
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from bson import Binary
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from ids import parse_timestamp, utcnow
+
+# Content-defined chunk sizes (FastCDC style): cut points depend only on nearby bytes,
+# so an edit only changes the chunks around it
+CHUNK_MIN_SIZE = 16 * 1024
+CHUNK_AVG_SIZE = 64 * 1024
+CHUNK_MAX_SIZE = 256 * 1024
+# Chunks fetched per query when streaming a file back
+CHUNK_READ_BATCH = 16
+# Chunks stored per insert_many when the server does the chunking
+CHUNK_WRITE_BATCH = 32
+# Hashes accepted by one missing-chunk check
+MISSING_CHECK_MAX = 10000
+MANIFEST_MAX_FILES = 5000
+PATH_MAX_LENGTH = 512
+
+# Gear fingerprint over the last FINGERPRINT_WINDOW bytes (a power of two)
+FINGERPRINT_WINDOW = 32
+# More one bits than the average needs before the normal size, fewer after, which narrows the size spread
+_MASK_SMALL = (1 << 18) - 1 << 14
+_MASK_LARGE = (1 << 14) - 1 << 18
+_gear_rng = random.Random(0x5649535441)
+GEAR = [_gear_rng.getrandbits(32) for _ in range(256)]
+# Bytes fingerprinted per pass when chunking a stream
+CHUNKER_WINDOW = 4 * 1024 * 1024
+
+
+class VersionConflict(Exception):
+    """The project moved past the version a save was based on."""
+
+
+def chunk_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk_ends(data: bytes) -> List[int]:
+    """End offsets of the content-defined chunks of ``data``, the last one possibly cut short by its end."""
+    # numpy is only needed for asset saves, so it is imported on first use
+    import numpy as np
+    # fingerprint[i] = sum(GEAR[data[i - k]] << k for k < FINGERPRINT_WINDOW), built by doubling the window
+    fingerprints = np.array(GEAR, dtype=np.uint32)[np.frombuffer(data, dtype=np.uint8)]
+    width = 1
+    while width < FINGERPRINT_WINDOW:
+        shifted = fingerprints[:-width] << np.uint32(width)
+        fingerprints[width:] += shifted
+        width *= 2
+    # A fingerprint matching the mask at byte i allows a cut after it
+    small = np.flatnonzero((fingerprints & np.uint32(_MASK_SMALL)) == 0) + 1
+    large = np.flatnonzero((fingerprints & np.uint32(_MASK_LARGE)) == 0) + 1
+
+    ends, start, size = [], 0, len(data)
+    while start < size:
+        if size - start <= CHUNK_MIN_SIZE:
+            end = size
+        else:
+            normal = start + min(size - start, CHUNK_AVG_SIZE)
+            stop = start + min(size - start, CHUNK_MAX_SIZE)
+            end = stop
+            index = np.searchsorted(small, start + CHUNK_MIN_SIZE + 1)
+            if index < len(small) and small[index] <= normal:
+                end = int(small[index])
+            else:
+                index = np.searchsorted(large, normal + 1)
+                if index < len(large) and large[index] <= stop:
+                    end = int(large[index])
+        ends.append(end)
+        start = end
+    return ends
+
+
+class Chunker:
+    """Incremental chunking: cut points depend only on the bytes since the previous cut."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, block: bytes) -> List[bytes]:
+        self.buffer += block
+        if len(self.buffer) < CHUNKER_WINDOW:
+            return []
+        return self._cut(final=False)
+
+    def finish(self) -> List[bytes]:
+        return self._cut(final=True) if self.buffer else []
+
+    def _cut(self, final: bool) -> List[bytes]:
+        data = bytes(self.buffer)
+        chunks, start = [], 0
+        for end in chunk_ends(data):
+            # A chunk is settled once CHUNK_MAX_SIZE bytes past its start have been seen
+            if not final and start + CHUNK_MAX_SIZE > len(data):
+                break
+            chunks.append(data[start:end])
+            start = end
+        del self.buffer[:start]
+        return chunks
+
+
+def chunk_bytes(data: bytes) -> Iterator[bytes]:
+    """Split ``data`` into content-defined chunks; clients use the same cut points to find changed chunks."""
+    chunker = Chunker()
+    for offset in range(0, len(data), CHUNKER_WINDOW):
+        yield from chunker.feed(data[offset:offset + CHUNKER_WINDOW])
+    yield from chunker.finish()
+
+
+async def chunk_stream(blocks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """``chunk_bytes`` over an async stream of blocks."""
+    chunker = Chunker()
+    async for block in blocks:
+        for chunk in chunker.feed(block):
+            yield chunk
+    for chunk in chunker.finish():
+        yield chunk
+
+
+def encode_chunk(data: bytes) -> dict:
+    # Most game assets are already compressed; only keep zlib output when it clearly helps
+    packed = zlib.compress(data, 1)
+    if len(packed) < len(data) * 0.9:
+        return {'codec': 'zlib', 'data': Binary(packed)}
+    return {'codec': 'none', 'data': Binary(data)}
+
+
+def decode_chunk(chunk: dict) -> bytes:
+    data = bytes(chunk['data'])
+    return zlib.decompress(data) if chunk.get('codec') == 'zlib' else data
+
+
+def validate_path(path: str) -> str:
+    parts = path.split('/')
+    if not path or len(path) > PATH_MAX_LENGTH or path.startswith('/') or any(part in ('', '.', '..') for part in parts):
+        raise ValueError(f'Invalid file path: {path}')
+    return path
+
+
+class AssetStore:
+    """Content-addressed, versioned file storage for studio projects.
+
+    Files are split into content-defined chunks (``chunk_bytes``) stored once
+    per project in ``asset_chunks``, keyed by their SHA-256. A version is a
+    manifest in ``asset_versions`` listing every file's chunk hashes, so a
+    save that edits a few bytes adds one small manifest and the handful of
+    chunks around the edit. Clients that chunk locally ask which hashes are
+    missing, upload only those and commit a manifest; simpler clients
+    upload a single file and the server chunks it against the previous
+    version. Chunks are scoped to their project, so a hash alone never gives
+    access to another project's content.
+
+    Versions are numbered per project; a save names the version it was based
+    on and fails with ``VersionConflict`` if another save got there first.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    async def ensure_indexes(self):
+        await self.db.asset_chunks.create_index([('project_id', 1), ('hash', 1)], unique=True)
+        await self.db.asset_versions.create_index([('project_id', 1), ('version', -1)], unique=True)
+
+    # ---------- chunks ----------
+
+    async def missing_chunks(self, project_id: str, hashes: List[str]) -> List[str]:
+        wanted = list(dict.fromkeys(hashes))
+        if len(wanted) > MISSING_CHECK_MAX:
+            raise ValueError(f'At most {MISSING_CHECK_MAX} hashes per check')
+        found = await self.db.asset_chunks.find(
+            {'project_id': project_id, 'hash': {'$in': wanted}}, {'_id': 0, 'hash': 1}).to_list(len(wanted))
+        stored = {chunk['hash'] for chunk in found}
+        return [h for h in wanted if h not in stored]
+
+    async def put_chunk(self, project_id: str, expected_hash: str, data: bytes) -> bool:
+        """Store one uploaded chunk; returns False when it was already stored."""
+        if not data or len(data) > CHUNK_MAX_SIZE:
+            raise ValueError(f'Chunks must be between 1 and {CHUNK_MAX_SIZE} bytes')
+        if chunk_hash(data) != expected_hash:
+            raise ValueError('Chunk does not match its hash')
+        try:
+            await self.db.asset_chunks.insert_one(self._chunk_doc(project_id, expected_hash, data))
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def store_stream(self, project_id: str, blocks: AsyncIterator[bytes]) -> Tuple[List[str], int, int]:
+        """Chunk a stream and store its new chunks; returns (chunk hashes, size, bytes stored)."""
+        hashes, size, stored = [], 0, 0
+        pending: Dict[str, bytes] = {}
+
+        async def flush():
+            nonlocal stored
+            missing = await self.missing_chunks(project_id, list(pending))
+            if missing:
+                try:
+                    await self.db.asset_chunks.insert_many(
+                        [self._chunk_doc(project_id, h, pending[h]) for h in missing], ordered=False)
+                except BulkWriteError as e:
+                    # A concurrent save stored the same chunk first
+                    if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+                        raise
+                stored += sum(len(pending[h]) for h in missing)
+            pending.clear()
+
+        async for chunk in chunk_stream(blocks):
+            digest = chunk_hash(chunk)
+            hashes.append(digest)
+            size += len(chunk)
+            pending[digest] = chunk
+            if len(pending) >= CHUNK_WRITE_BATCH:
+                await flush()
+        if pending:
+            await flush()
+        return hashes, size, stored
+
+    def _chunk_doc(self, project_id: str, digest: str, data: bytes) -> dict:
+        return {
+            'project_id': project_id,
+            'hash': digest,
+            'size': len(data),
+            **encode_chunk(data),
+            'created_at': utcnow(),
+        }
+
+    # ---------- versions ----------
+
+    async def latest_version(self, project_id: str) -> int:
+        latest = await self.db.asset_versions.find_one(
+            {'project_id': project_id}, {'_id': 0, 'version': 1}, sort=[('version', -1)])
+        return latest['version'] if latest else 0
+
+    async def manifest(self, project_id: str, version: Optional[int] = None) -> Optional[dict]:
+        query = {'project_id': project_id}
+        if version is not None:
+            query['version'] = version
+        return await self.db.asset_versions.find_one(query, {'_id': 0}, sort=[('version', -1)])
+
+    async def list_versions(self, project_id: str, limit: int = 50) -> List[dict]:
+        return await self.db.asset_versions.find(
+            {'project_id': project_id}, {'_id': 0, 'files': 0}).sort('version', -1).limit(limit).to_list(limit)
+
+    async def commit(self, project_id: str, author_id: str, base_version: int, files: List[dict]) -> dict:
+        """Record a version from ``[{'path', 'chunks'}]``; every chunk must already be stored."""
+        if len(files) > MANIFEST_MAX_FILES:
+            raise ValueError(f'At most {MANIFEST_MAX_FILES} files per project')
+        paths = [validate_path(f['path']) for f in files]
+        if len(set(paths)) != len(paths):
+            raise ValueError('Duplicate file path')
+
+        # One query sizes every chunk and proves it was uploaded to this project
+        hashes = list({h for f in files for h in f['chunks']})
+        found = [] if not hashes else await self.db.asset_chunks.find(
+            {'project_id': project_id, 'hash': {'$in': hashes}}, {'_id': 0, 'hash': 1, 'size': 1}).to_list(len(hashes))
+        sizes = {chunk['hash']: chunk['size'] for chunk in found}
+        missing = [h for h in hashes if h not in sizes]
+        if missing:
+            raise ValueError(f'{len(missing)} chunks have not been uploaded')
+
+        manifest_files = [
+            {'path': f['path'], 'size': sum(sizes[h] for h in f['chunks']), 'chunks': list(f['chunks'])}
+            for f in sorted(files, key=lambda f: f['path'])
+        ]
+        manifest = {
+            'project_id': project_id,
+            'version': base_version + 1,
+            'base_version': base_version,
+            'author_id': author_id,
+            'files': manifest_files,
+            'file_count': len(manifest_files),
+            'size': sum(f['size'] for f in manifest_files),
+            'chunk_count': len(hashes),
+            'created_at': utcnow(),
+        }
+        if base_version != await self.latest_version(project_id):
+            raise VersionConflict(base_version)
+        try:
+            await self.db.asset_versions.insert_one(manifest)
+        except DuplicateKeyError:
+            raise VersionConflict(base_version)
+        manifest.pop('_id', None)
+        return manifest
+
+    async def save_file(self, project_id: str, author_id: str, base_version: int, path: str,
+                        blocks: AsyncIterator[bytes]) -> Tuple[dict, int]:
+        """New version replacing (or adding) one file; returns (manifest, bytes stored)."""
+        validate_path(path)
+        base = await self.manifest(project_id, base_version) if base_version else None
+        if base_version and base is None:
+            raise VersionConflict(base_version)
+        hashes, _, stored = await self.store_stream(project_id, blocks)
+        files = [f for f in (base['files'] if base else []) if f['path'] != path]
+        files.append({'path': path, 'chunks': hashes})
+        return await self.commit(project_id, author_id, base_version, files), stored
+
+    # ---------- reads ----------
+
+    async def iter_file(self, project_id: str, file: dict) -> AsyncIterator[bytes]:
+        """The file's bytes, a batch of chunks per query, so memory stays at CHUNK_READ_BATCH chunks."""
+        hashes = file['chunks']
+        for start in range(0, len(hashes), CHUNK_READ_BATCH):
+            batch = hashes[start:start + CHUNK_READ_BATCH]
+            chunks = await self.db.asset_chunks.find(
+                {'project_id': project_id, 'hash': {'$in': list(set(batch))}},
+                {'_id': 0, 'hash': 1, 'codec': 1, 'data': 1}).to_list(len(batch))
+            by_hash = {chunk['hash']: chunk for chunk in chunks}
+            for digest in batch:
+                yield decode_chunk(by_hash[digest])
+
+    async def iter_archive(self, project_id: str, manifest: dict) -> AsyncIterator[bytes]:
+        """A whole version as an uncompressed tar stream, built from the manifest's sizes."""
+        mtime = parse_timestamp(manifest['created_at']).timestamp()
+        for file in manifest['files']:
+            info = tarfile.TarInfo(file['path'])
+            info.size = file['size']
+            info.mtime = mtime
+            yield info.tobuf(format=tarfile.PAX_FORMAT)
+            async for data in self.iter_file(project_id, file):
+                yield data
+            padding = -file['size'] % tarfile.BLOCKSIZE
+            if padding:
+                yield b'\0' * padding
+        yield b'\0' * (tarfile.BLOCKSIZE * 2)
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from metrics import AUTHZ_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+AUTHZ_CACHE_USERS = 50000
+# Cached memberships are trusted this long; joins made by other processes show up within it
+AUTHZ_TTL_SECONDS = 60
+# A "not a member" answer is re-checked against Mongo when the cached set is older than this
+AUTHZ_RECHECK_SECONDS = 2
+
+
+class MembershipCache:
+    """In-memory answers to "may user U read server S / channel C".
+
+    Keeps each active user's set of server ids (from ``servers.members``),
+    LRU bounded. A channel's server comes from the MetadataCache, so channel
+    lookups share its versioned entries and invalidation instead of keeping
+    a second map. ``joined`` adds a server to a cached set in place and
+    discards any load already in flight for that user, so the joiner is
+    never refused by a read that started before the join.
+
+    Positive answers are served from memory for AUTHZ_TTL_SECONDS. A
+    negative answer from a set older than AUTHZ_RECHECK_SECONDS reloads it
+    first, which covers joins handled by another API worker. Loads are
+    single-flight per user.
+    """
+
+    def __init__(self, db, metadata, max_users: int = AUTHZ_CACHE_USERS,
+                 ttl_seconds: float = AUTHZ_TTL_SECONDS, recheck_seconds: float = AUTHZ_RECHECK_SECONDS):
+        self.db = db
+        self.metadata = metadata
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self.recheck_seconds = recheck_seconds
+        # user id -> (server ids, loaded at)
+        self.user_servers: 'OrderedDict[str, Tuple[FrozenSet[str], float]]' = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+
+    async def ensure_indexes(self):
+        await self.db.servers.create_index('members')
+
+    # ---------- invalidation ----------
+
+    def joined(self, user_id: str, server_id: str):
+        cached = self.user_servers.get(user_id)
+        if cached is not None:
+            self.user_servers[user_id] = (cached[0] | {server_id}, cached[1])
+        # A load that started before the join may not include it
+        self._loading.pop(user_id, None)
+
+    # ---------- checks ----------
+
+    async def is_member(self, user_id: str, server_id: str) -> bool:
+        server_ids, loaded_at = await self._servers(user_id)
+        if server_id in server_ids:
+            return True
+        if time.monotonic() - loaded_at < self.recheck_seconds:
+            return False
+        AUTHZ_CACHE_LOOKUPS.inc('recheck')
+        server_ids, _ = await self._load(user_id)
+        return server_id in server_ids
+
+    async def channel_server(self, channel_id: str) -> Optional[str]:
+        channel = await self.metadata.get_channel(channel_id)
+        return channel['server_id'] if channel else None
+
+    async def can_read_channel(self, user_id: str, channel_id: str) -> Tuple[Optional[str], bool]:
+        """(server id, allowed); the server id is None when the channel doesn't exist."""
+        server_id = await self.channel_server(channel_id)
+        if server_id is None:
+            return None, False
+        return server_id, await self.is_member(user_id, server_id)
+
+    # ---------- loading ----------
+
+    async def _servers(self, user_id: str) -> Tuple[FrozenSet[str], float]:
+        cached = self.user_servers.get(user_id)
+        if cached is not None and time.monotonic() - cached[1] < self.ttl_seconds:
+            self.user_servers.move_to_end(user_id)
+            AUTHZ_CACHE_LOOKUPS.inc('hit')
+            return cached
+        AUTHZ_CACHE_LOOKUPS.inc('miss')
+        return await self._load(user_id)
+
+    async def _load(self, user_id: str) -> Tuple[FrozenSet[str], float]:
+        future = self._loading.get(user_id)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(user_id))
+            self._loading[user_id] = future
+            future.add_done_callback(lambda f: self._loaded(user_id, f))
+        # Shielded so a cancelled request doesn't cancel the load other requests share
+        return await asyncio.shield(future)
+
+    async def _fetch(self, user_id: str) -> Tuple[FrozenSet[str], float]:
+        loaded_at = time.monotonic()
+        servers = await self.db.servers.find({'members': user_id}, {'_id': 0, 'id': 1}).to_list(None)
+        return frozenset(server['id'] for server in servers), loaded_at
+
+    def _loaded(self, user_id: str, future: asyncio.Future):
+        if self._loading.get(user_id) is not future:
+            # Superseded by a join while in flight
+            return
+        del self._loading[user_id]
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.error(f"Membership load for user {user_id} failed: {str(future.exception())}")
+            return
+        self.user_servers[user_id] = future.result()
+        self.user_servers.move_to_end(user_id)
+        while len(self.user_servers) > self.max_users:
+            self.user_servers.popitem(last=False)
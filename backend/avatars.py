@@ -0,0 +1,109 @@
+"""Default avatars, server icons and placeholder thumbnails, drawn locally as SVG.
+
+Each image is a pure function of its URL: an identicon from a hash of the
+seed, initials on a seeded colour, or a sized placeholder with a caption.
+Responses are therefore served as immutable, and the drawing code is part
+of that contract: changing what a URL renders needs a new path, or clients
+keep the old picture for a year.
+"""
+import hashlib
+from functools import lru_cache
+from html import escape
+from typing import Optional, Tuple
+from urllib.parse import quote, urlencode
+
+# Rendered images kept in memory; each is well under 2KB
+AVATAR_CACHE_SIZE = 4096
+AVATAR_SEED_MAX_LENGTH = 100
+PLACEHOLDER_MAX_SIZE = 2000
+PLACEHOLDER_TEXT_MAX_LENGTH = 40
+IMAGE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+IDENTICON_GRID = 5
+
+
+def identicon_path(seed: str) -> str:
+    return f"/api/avatars/identicon/{quote(seed[:AVATAR_SEED_MAX_LENGTH], safe='')}.svg"
+
+
+def initials_path(seed: str) -> str:
+    return f"/api/avatars/initials/{quote(seed[:AVATAR_SEED_MAX_LENGTH], safe='')}.svg"
+
+
+def placeholder_path(width: int, height: int, text: Optional[str] = None) -> str:
+    query = f"?{urlencode({'text': text[:PLACEHOLDER_TEXT_MAX_LENGTH]})}" if text else ''
+    return f"/api/placeholders/{width}x{height}.svg{query}"
+
+
+def _seed_digest(seed: str) -> bytes:
+    return hashlib.sha256(seed.encode()).digest()
+
+
+def _hue(digest: bytes) -> int:
+    return int.from_bytes(digest[-2:], 'big') % 360
+
+
+def _initials(seed: str) -> str:
+    words = [''.join(filter(str.isalnum, word)) for word in seed.replace('_', ' ').replace('-', ' ').split()]
+    words = [word for word in words if word]
+    if not words:
+        return '?'
+    if len(words) == 1:
+        return words[0][:2].upper()
+    return (words[0][0] + words[1][0]).upper()
+
+
+def identicon_svg(seed: str) -> str:
+    """A 5x5 grid mirrored left to right, cells and colour picked by the seed's hash."""
+    digest = _seed_digest(seed)
+    half = (IDENTICON_GRID + 1) // 2
+    cells = []
+    for row in range(IDENTICON_GRID):
+        for column in range(half):
+            bit = row * half + column
+            if digest[bit // 8] >> (bit % 8) & 1:
+                cells.append((column, row))
+                if column != IDENTICON_GRID - 1 - column:
+                    cells.append((IDENTICON_GRID - 1 - column, row))
+    rects = ''.join(f'<rect x="{x + 1}" y="{y + 1}" width="1" height="1"/>' for x, y in cells)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {IDENTICON_GRID + 2} {IDENTICON_GRID + 2}" '
+        f'shape-rendering="crispEdges"><rect width="100%" height="100%" fill="#f0f0f5"/>'
+        f'<g fill="hsl({_hue(digest)},65%,50%)">{rects}</g></svg>'
+    )
+
+
+def initials_svg(seed: str) -> str:
+    """Up to two initials of ``seed`` on a colour picked by its hash, for server icons."""
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100">'
+        f'<rect width="100%" height="100%" fill="hsl({_hue(_seed_digest(seed))},55%,45%)"/>'
+        '<text x="50" y="50" dy="0.35em" text-anchor="middle" font-family="Arial,Helvetica,sans-serif" '
+        f'font-size="42" font-weight="600" fill="#ffffff">{escape(_initials(seed))}</text></svg>'
+    )
+
+
+def placeholder_svg(width: int, height: int, text: str) -> str:
+    caption = text or f'{width}×{height}'
+    font_size = max(8, min(height / 4, width * 1.6 / len(caption)))
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+        '<rect width="100%" height="100%" fill="#2b2d31"/>'
+        f'<text x="50%" y="50%" dy="0.35em" text-anchor="middle" font-family="Arial,Helvetica,sans-serif" '
+        f'font-size="{font_size:.0f}" fill="#949ba4">{escape(caption)}</text></svg>'
+    )
+
+
+@lru_cache(maxsize=AVATAR_CACHE_SIZE)
+def render(kind: str, seed: str = '', width: int = 0, height: int = 0) -> Tuple[bytes, str]:
+    """``(svg bytes, ETag)`` for an image; arguments are expected to be validated already."""
+    if kind == 'identicon':
+        svg = identicon_svg(seed)
+    elif kind == 'initials':
+        svg = initials_svg(seed)
+    elif kind == 'placeholder':
+        svg = placeholder_svg(width, height, seed)
+    else:
+        raise ValueError(f'Unknown image kind {kind}')
+    body = svg.encode()
+    return body, f'"{hashlib.sha256(body).hexdigest()[:20]}"'
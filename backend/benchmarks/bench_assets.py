@@ -0,0 +1,144 @@
+"""Studio asset store: small-edit saves on a large project, and streaming loads.
+
+    cd backend && python -m benchmarks.bench_assets [--size-mb 64] [--files 32] [--edits 20] [--json out.json]
+
+Builds a project of incompressible binary assets and text scripts, saves
+it once, then applies ``--edits`` small edits (a few bytes inserted or
+overwritten in one file) and saves after each. ``client`` saves chunk the
+changed file locally and upload only missing chunks; ``server`` saves
+upload the changed file and let the server chunk it. Both are compared
+with re-uploading the whole project. Loads stream the newest version back
+as a tar archive. Point BENCH_MONGO_URL at a real mongod for realistic
+timings; with mongomock the numbers mostly show CPU cost.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+from asset_store import AssetStore, chunk_bytes, chunk_hash
+from benchmarks.common import bench_db, drop_db, summarize, write_results
+
+TEXT_LINE = b'local part = workspace:FindFirstChild("Part") -- move the platform\n'
+
+
+def make_project(rng: random.Random, size: int, files: int) -> dict:
+    project = {}
+    for n in range(files):
+        file_size = size // files
+        if n % 4 == 3:
+            project[f'scripts/script_{n}.lua'] = (TEXT_LINE * (file_size // len(TEXT_LINE) + 1))[:file_size]
+        else:
+            project[f'assets/asset_{n}.bin'] = rng.randbytes(file_size)
+    return project
+
+
+def small_edit(rng: random.Random, data: bytes) -> bytes:
+    at = rng.randrange(len(data))
+    patch = rng.randbytes(rng.randint(1, 64))
+    if rng.random() < 0.5:
+        return data[:at] + patch + data[at:]
+    return data[:at] + patch + data[at + len(patch):]
+
+
+async def client_save(store: AssetStore, project_id: str, version: int, changed: dict, hashes: dict) -> int:
+    """What a chunking client does: chunk changed files, upload missing chunks, commit the manifest."""
+    uploaded = 0
+    for path, data in changed.items():
+        chunks = {}
+        hashes[path] = []
+        for chunk in chunk_bytes(data):
+            digest = chunk_hash(chunk)
+            chunks[digest] = chunk
+            hashes[path].append(digest)
+        for digest in await store.missing_chunks(project_id, list(chunks)):
+            await store.put_chunk(project_id, digest, chunks[digest])
+            uploaded += len(chunks[digest])
+    files = [{'path': path, 'chunks': chunk_list} for path, chunk_list in hashes.items()]
+    await store.commit(project_id, 'bench', version, files)
+    return uploaded
+
+
+async def server_save(store: AssetStore, project_id: str, version: int, path: str, data: bytes) -> int:
+    async def blocks():
+        for offset in range(0, len(data), 1024 * 1024):
+            yield data[offset:offset + 1024 * 1024]
+
+    await store.save_file(project_id, 'bench', version, path, blocks())
+    return len(data)
+
+
+async def run_case(mode: str, size: int, files: int, edits: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    db = bench_db(f'bench_assets_{mode}')
+    store = AssetStore(db)
+    await store.ensure_indexes()
+    project_id = str(uuid.uuid4())
+    project = make_project(rng, size, files)
+    hashes = {}
+
+    started = time.perf_counter()
+    await client_save(store, project_id, 0, project, hashes)
+    initial = time.perf_counter() - started
+
+    samples, uploaded = [], 0
+    for version in range(1, edits + 1):
+        path = rng.choice(sorted(project))
+        project[path] = small_edit(rng, project[path])
+        started = time.perf_counter()
+        if mode == 'client':
+            uploaded += await client_save(store, project_id, version, {path: project[path]}, hashes)
+        else:
+            uploaded += await server_save(store, project_id, version, path, project[path])
+        samples.append(time.perf_counter() - started)
+
+    manifest = await store.manifest(project_id)
+    started = time.perf_counter()
+    loaded = 0
+    async for block in store.iter_archive(project_id, manifest):
+        loaded += len(block)
+    load = time.perf_counter() - started
+    if manifest['size'] != sum(len(data) for data in project.values()):
+        raise RuntimeError('Reassembled version does not match the project')
+
+    stored_chunks = await db.asset_chunks.count_documents({'project_id': project_id})
+    await drop_db(db)
+    total = sum(len(data) for data in project.values())
+    return {
+        'mode': mode,
+        'project_mb': round(total / 1e6, 1),
+        'initial_save_s': round(initial, 2),
+        'edit_save': summarize(samples),
+        'uploaded_per_edit_kb': round(uploaded / edits / 1e3, 1) if edits else 0.0,
+        'full_upload_per_edit_kb': round(total / 1e3, 1),
+        'stored_chunks': stored_chunks,
+        'load_mb_per_s': round(loaded / 1e6 / load, 1) if load else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=64)
+    parser.add_argument('--files', type=int, default=32)
+    parser.add_argument('--edits', type=int, default=20)
+    parser.add_argument('--modes', default='client,server')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json')
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes.split(','):
+        result = await run_case(mode, args.size_mb * 1024 * 1024, args.files, args.edits, args.seed)
+        results.append(result)
+        print(f"{mode:>6}: {result['project_mb']}MB project, initial save {result['initial_save_s']}s, "
+              f"edit save p50 {result['edit_save']['p50_ms']}ms p99 {result['edit_save']['p99_ms']}ms, "
+              f"{result['uploaded_per_edit_kb']}KB uploaded per edit (full upload {result['full_upload_per_edit_kb']}KB), "
+              f"load {result['load_mb_per_s']}MB/s")
+
+    if args.json:
+        write_results(args.json, {'benchmark': 'assets', 'cases': results})
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
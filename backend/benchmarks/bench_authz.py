@@ -0,0 +1,125 @@
+"""Latency added by channel read authorization.
+
+    cd backend && python -m benchmarks.bench_authz [--users 5000] [--servers 500] [--checks 50000] [--json out.json]
+
+Seeds users spread over servers with several channels each, then times
+``MembershipCache.can_read_channel`` for random member/channel pairs:
+``warm`` with every user's set and channel already cached (the steady state
+for active users), ``cold`` for each user's first check (one indexed query)
+and each channel's first lookup (its server's metadata entry, loaded once
+per server), ``denied`` for non-members within
+the recheck window, and ``naive`` for the two queries per read the cache
+replaces. The warm p99 is checked against the 1ms budget. Point
+BENCH_MONGO_URL at a real mongod for realistic cold and naive numbers.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+from authz import MembershipCache
+from benchmarks.common import bench_db, drop_db, summarize, write_results
+from metadata_cache import MetadataCache
+
+BUDGET_P99_MS = 1.0
+
+
+async def seed(db, rng: random.Random, users: int, servers: int, channels_per_server: int, servers_per_user: int):
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    server_ids = [str(uuid.uuid4()) for _ in range(servers)]
+    members = {server_id: [] for server_id in server_ids}
+    memberships = {}
+    for user_id in user_ids:
+        joined = rng.sample(server_ids, min(servers_per_user, servers))
+        memberships[user_id] = set(joined)
+        for server_id in joined:
+            members[server_id].append(user_id)
+    await db.servers.insert_many([{'id': s, 'name': f'server {n}', 'members': members[s]} for n, s in enumerate(server_ids)])
+    channels = [{'id': str(uuid.uuid4()), 'server_id': s} for s in server_ids for _ in range(channels_per_server)]
+    await db.channels.insert_many(channels)
+    await db.channels.create_index('id', unique=True)
+    await db.channels.create_index('server_id')
+    return user_ids, channels, memberships
+
+
+async def timed(samples: list, check):
+    started = time.perf_counter()
+    await check
+    samples.append(time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--servers', type=int, default=500)
+    parser.add_argument('--channels-per-server', type=int, default=8)
+    parser.add_argument('--servers-per-user', type=int, default=10)
+    parser.add_argument('--checks', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--json')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    db = bench_db('bench_authz')
+    user_ids, channels, memberships = await seed(db, rng, args.users, args.servers, args.channels_per_server, args.servers_per_user)
+    cache = MembershipCache(db, MetadataCache(db))
+    await cache.ensure_indexes()
+    by_server = {}
+    for channel in channels:
+        by_server.setdefault(channel['server_id'], []).append(channel['id'])
+
+    def member_pair():
+        user_id = rng.choice(user_ids)
+        return user_id, rng.choice(by_server[rng.choice(sorted(memberships[user_id]))])
+
+    def stranger_pair():
+        user_id = rng.choice(user_ids)
+        channel = rng.choice(channels)
+        while channel['server_id'] in memberships[user_id]:
+            channel = rng.choice(channels)
+        return user_id, channel['id']
+
+    results = {}
+    cold = []
+    for user_id in user_ids:
+        await timed(cold, cache.can_read_channel(user_id, rng.choice(by_server[next(iter(memberships[user_id]))])))
+    for channel in channels:
+        await timed(cold, cache.channel_server(channel['id']))
+    results['cold'] = summarize(cold)
+
+    warm = []
+    pairs = [member_pair() for _ in range(args.checks)]
+    for user_id, channel_id in pairs:
+        await timed(warm, cache.can_read_channel(user_id, channel_id))
+    results['warm'] = summarize(warm)
+
+    # Fresh sets answer "no" from memory; only sets older than the recheck window go back to Mongo
+    for user_id in user_ids:
+        cache.user_servers[user_id] = (cache.user_servers[user_id][0], time.monotonic())
+    denied = []
+    for user_id, channel_id in [stranger_pair() for _ in range(min(args.checks, 10000))]:
+        await timed(denied, cache.can_read_channel(user_id, channel_id))
+    results['denied'] = summarize(denied)
+
+    async def naive_check(user_id: str, channel_id: str) -> bool:
+        channel = await db.channels.find_one({'id': channel_id}, {'_id': 0, 'server_id': 1})
+        return await db.servers.find_one({'id': channel['server_id'], 'members': user_id}, {'_id': 0, 'id': 1}) is not None
+
+    naive = []
+    for user_id, channel_id in pairs[:min(args.checks, 2000)]:
+        await timed(naive, naive_check(user_id, channel_id))
+    results['naive'] = summarize(naive)
+    await drop_db(db)
+
+    for name, summary in results.items():
+        print(f"{name:>7}: p50 {summary['p50_ms']}ms p95 {summary['p95_ms']}ms p99 {summary['p99_ms']}ms ({summary['count']} checks)")
+    within = results['warm']['p99_ms'] < BUDGET_P99_MS
+    print(f"warm p99 {'within' if within else 'OVER'} the {BUDGET_P99_MS}ms budget")
+
+    if args.json:
+        write_results(args.json, {'benchmark': 'authz', 'budget_p99_ms': BUDGET_P99_MS, 'within_budget': within, 'cases': results})
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""Following-feed fan-out and read benchmark.
+
+    cd backend && python -m benchmarks.bench_feed [--followers 10,10000,1000000] [--json out.json]
+
+Measures fan-out time per reel and timeline page latency for authors of
+different sizes. Authors at or above FANOUT_READ_THRESHOLD take the
+fan-out-on-read path, so their fan-out cost stays flat. Point
+BENCH_MONGO_URL at a real mongod for meaningful numbers; mongomock checks
+unique indexes with a scan, which makes large fan-outs quadratic.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+
+from benchmarks.common import bench_db, drop_db, summarize, write_results
+from feed import FeedService, FANOUT_READ_THRESHOLD
+
+
+async def run_case(followers: int, reels: int, reads: int) -> dict:
+    db = bench_db(f'bench_feed_{followers}')
+    feed = FeedService(db)
+    await feed.ensure_indexes()
+    
+    author_id = str(uuid.uuid4())
+    follower_ids = [f'follower-{i}' for i in range(followers)]
+    await db.users.insert_one({'id': author_id, 'username': 'author'})
+    
+    start_time = datetime.now(timezone.utc)
+    fanout_samples = []
+    for i in range(reels):
+        reel = {
+            'id': str(uuid.uuid4()),
+            'author_id': author_id,
+            'created_at': (start_time + timedelta(seconds=i)).isoformat(),
+        }
+        await db.reels.insert_one(dict(reel))
+        started = time.perf_counter()
+        await feed.fan_out(reel, follower_ids)
+        fanout_samples.append(time.perf_counter() - started)
+    
+    reader = {'id': follower_ids[0], 'following': [author_id]}
+    read_samples = []
+    for _ in range(reads):
+        started = time.perf_counter()
+        await feed.get_page(reader, 20, None)
+        read_samples.append(time.perf_counter() - started)
+    
+    timeline_entries = await db.reel_timelines.count_documents({})
+    await drop_db(db)
+    return {
+        'followers': followers,
+        'path': 'read' if followers >= FANOUT_READ_THRESHOLD else 'write',
+        'timeline_entries': timeline_entries,
+        'fanout': summarize(fanout_samples),
+        'read': summarize(read_samples),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--followers', default='10,10000,1000000')
+    parser.add_argument('--reels', type=int, default=5)
+    parser.add_argument('--reads', type=int, default=200)
+    parser.add_argument('--json')
+    args = parser.parse_args()
+    
+    results = []
+    for followers in [int(n) for n in args.followers.split(',')]:
+        result = await run_case(followers, args.reels, args.reads)
+        results.append(result)
+        print(f"{followers:>9} followers ({result['path']:>5}): "
+              f"fan-out p50 {result['fanout']['p50_ms']}ms, read p50 {result['read']['p50_ms']}ms "
+              f"p99 {result['read']['p99_ms']}ms, {result['timeline_entries']} timeline entries")
+    
+    if args.json:
+        write_results(args.json, {'benchmark': 'feed', 'cases': results})
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""Thundering-herd benchmark for single-flight reads.
+
+    cd backend && python -m benchmarks.bench_herd [--herd 200] [--rounds 10] [--json out.json]
+
+Seeds a tiny dataset, then fires ``--herd`` concurrent identical requests at
+one reel, one forum post and the forum category list, ``--rounds`` times
+each, first with ``hot_reads`` coalescing and then with every request
+running its own load. Reports request latency and how many loads (each one
+a set of Mongo queries) each herd cost. Point BENCH_MONGO_URL at a real
+mongod for meaningful latency: mongomock queries are cheap and run one at a
+time, so there only the load counts carry over.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+
+from benchmarks.common import drop_db, load_app, summarize, write_results
+from benchmarks.seed import SCALES, seed
+
+
+class LoadCounter:
+    """Stands in for ``hot_reads``: counts loads, and coalesces only when asked to."""
+
+    def __init__(self, single_flight, coalesce: bool):
+        self.single_flight = single_flight
+        self.coalesce = coalesce
+        self.loads = 0
+
+    async def do(self, key, load):
+        async def counted():
+            self.loads += 1
+            return await load()
+        if self.coalesce:
+            return await self.single_flight.do(key, counted)
+        return await counted()
+
+
+async def run_herds(client: httpx.AsyncClient, path: str, headers: list, herd: int, rounds: int, counter: LoadCounter) -> dict:
+    samples, errors = [], 0
+
+    async def one(index: int):
+        nonlocal errors
+        started = time.perf_counter()
+        response = await client.get(path, headers=headers[index % len(headers)])
+        samples.append(time.perf_counter() - started)
+        errors += response.status_code >= 400
+
+    counter.loads = 0
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(one(i) for i in range(herd)))
+    wall = time.perf_counter() - started
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'loads_per_herd': round(counter.loads / rounds, 2),
+        'throughput_rps': round(len(samples) / wall, 2) if wall else 0.0,
+        'latency': summarize(samples),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--herd', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--json')
+    args = parser.parse_args()
+
+    server, db = load_app('vistagram_bench_herd')
+    from core import create_token, hot_reads
+    from routers import forum, reels
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    await drop_db(db)
+    dataset = await seed(db, dict(SCALES['tiny']), create_token)
+    headers = [dataset.headers(user['id']) for user in dataset.users]
+    targets = {
+        'reel': f'/api/reels/{dataset.reel_ids[0]}',
+        'forum_post': f'/api/forum/posts/{dataset.post_ids[0]}',
+        'forum_categories': '/api/forum/categories',
+    }
+
+    await server.app.router.startup()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for mode in ('coalesced', 'direct'):
+                counter = LoadCounter(hot_reads, coalesce=mode == 'coalesced')
+                reels.hot_reads = forum.hot_reads = counter
+                for name, path in targets.items():
+                    result = await run_herds(client, path, headers, args.herd, args.rounds, counter)
+                    results.setdefault(name, {})[mode] = result
+                    latency = result['latency']
+                    print(f"{name:<16} {mode:<9} loads/herd {result['loads_per_herd']:>7}  {result['throughput_rps']:>9} req/s  "
+                          f"p50 {latency['p50_ms']}ms  p99 {latency['p99_ms']}ms  errors {result['errors']}")
+    finally:
+        reels.hot_reads = forum.hot_reads = hot_reads
+        await server.app.router.shutdown()
+        await drop_db(db)
+
+    if args.json:
+        write_results(args.json, {'benchmark': 'herd', 'herd': args.herd, 'rounds': args.rounds, 'cases': results})
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""Message write throughput with and without group commit.
+
+    cd backend && python -m benchmarks.bench_messages [--messages 20000] [--concurrency 200] [--json out.json]
+
+Concurrent senders post into one channel, the way a raid on a big server
+does. ``direct`` is the old path (channel find_one plus insert_one per
+message), ``cached`` serves the channel check from MetadataCache, and
+``batched`` also group-commits inserts through MessageWriter. Point
+BENCH_MONGO_URL at a real mongod for meaningful numbers; mongomock has no
+round trips and never yields to the event loop, so its latencies mostly
+measure queueing behind other senders.
+"""
+import argparse
+import asyncio
+import itertools
+import time
+import uuid
+from datetime import datetime, timezone
+
+from benchmarks.common import bench_db, drop_db, summarize, write_results
+from message_writer import MessageWriter
+from metadata_cache import MetadataCache
+
+
+def message_doc(channel_id: str, author_id: str, n: int) -> dict:
+    return {
+        'id': str(uuid.uuid4()),
+        'content': f'message {n}',
+        'channel_id': channel_id,
+        'author_id': author_id,
+        'attachments': [],
+        'reactions': {},
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def run_case(mode: str, messages: int, concurrency: int, delay_ms: float) -> dict:
+    db = bench_db(f'bench_messages_{mode}')
+    await db.messages.create_index('id', unique=True)
+    server_id, channel_id = str(uuid.uuid4()), str(uuid.uuid4())
+    await db.servers.insert_one({'id': server_id, 'name': 'raid'})
+    await db.channels.insert_one({'id': channel_id, 'name': 'general', 'server_id': server_id})
+
+    metadata = MetadataCache(db)
+    writer = MessageWriter(db, batching=mode == 'batched', delay_ms=delay_ms)
+    writer.start()
+
+    async def send(n: int):
+        if mode == 'direct':
+            if not await db.channels.find_one({'id': channel_id}):
+                raise RuntimeError('Channel not found')
+            await db.messages.insert_one(message_doc(channel_id, 'author', n))
+        else:
+            if not await metadata.get_channel(channel_id):
+                raise RuntimeError('Channel not found')
+            await writer.insert('messages', message_doc(channel_id, 'author', n))
+
+    issued = itertools.count()
+    samples = []
+
+    async def sender():
+        while (n := next(issued)) < messages:
+            started = time.perf_counter()
+            await send(n)
+            samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    await writer.stop()
+
+    stored = await db.messages.count_documents({})
+    await drop_db(db)
+    return {
+        'mode': mode,
+        'messages': stored,
+        'messages_per_second': round(stored / wall, 1) if wall else 0.0,
+        'latency': summarize(samples),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--delay-ms', type=float, default=5)
+    parser.add_argument('--modes', default='direct,cached,batched')
+    parser.add_argument('--json')
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes.split(','):
+        result = await run_case(mode, args.messages, args.concurrency, args.delay_ms)
+        results.append(result)
+        print(f"{mode:>8}: {result['messages_per_second']:>9} msgs/s, "
+              f"p50 {result['latency']['p50_ms']}ms p99 {result['latency']['p99_ms']}ms, {result['messages']} stored")
+
+    if args.json:
+        write_results(args.json, {'benchmark': 'messages', 'concurrency': args.concurrency, 'cases': results})
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""Cold-start benchmark: import time and time to first 200.
+
+    cd backend && python -m benchmarks.bench_startup [--runs 5] [--json out.json]
+
+Each run is a fresh interpreter that imports the app, runs the startup
+hooks and sends one signup request (which touches Mongo, bcrypt and JWT).
+The slowest imports are taken from ``python -X importtime`` in the first
+run. Uses mongomock unless BENCH_MONGO_URL is set; with a real mongod the
+startup figure includes pool prewarming and index checks.
+"""
+import argparse
+import importlib
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+from benchmarks.common import BACKEND_DIR, write_results
+
+PHASES = ('import_ms', 'startup_ms', 'first_request_ms', 'total_ms')
+
+
+def child():
+    started = time.perf_counter()
+    db_name = f'bench_startup_{uuid.uuid4().hex[:8]}'
+    os.environ['MONGO_URL'] = os.environ.get('BENCH_MONGO_URL') or 'mongodb://localhost:27017'
+    os.environ['DB_NAME'] = db_name
+    importlib.import_module('server')
+    imported = time.perf_counter()
+
+    import httpx
+    from benchmarks.common import load_app, drop_db
+    server, db = load_app(db_name)
+
+    async def first_request():
+        setup_started = time.perf_counter()
+        await server.app.router.startup()
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            response = await client.post('/api/auth/signup', json={
+                'username': 'startup', 'email': 'startup@bench.local', 'password': 'bench-password'})
+        answered = time.perf_counter()
+        await server.app.router.shutdown()
+        await drop_db(db)
+        return response.status_code, ready - setup_started, answered - ready
+
+    status, startup, first = asyncio.run(first_request())
+    print(json.dumps({
+        'status': status,
+        'import_ms': round((imported - started) * 1000, 1),
+        'startup_ms': round(startup * 1000, 1),
+        'first_request_ms': round(first * 1000, 1),
+    }))
+
+
+def slowest_imports(stderr: str, count: int = 10) -> list:
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|').split('|')]
+        timings.append({'module': name, 'self_ms': round(int(self_us) / 1000, 1), 'cumulative_ms': round(int(cumulative_us) / 1000, 1)})
+    return sorted(timings, key=lambda t: -t['self_ms'])[:count]
+
+
+def run_once(importtime: bool) -> dict:
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-m', 'benchmarks.bench_startup', '--child']
+    started = time.perf_counter()
+    process = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if process.returncode != 0:
+        raise SystemExit(f'Startup run failed:\n{process.stderr[-2000:]}')
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    if result['status'] != 200:
+        raise SystemExit(f"First request answered {result['status']}")
+    result['total_ms'] = round(result['import_ms'] + result['startup_ms'] + result['first_request_ms'], 1)
+    result['process_ms'] = round(wall * 1000, 1)
+    if importtime:
+        result['slowest_imports'] = slowest_imports(process.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    # The importtime run is slower, so it only supplies the module breakdown
+    profile = run_once(importtime=True)
+    runs = [run_once(importtime=False) for _ in range(args.runs)]
+    summary = {phase: round(statistics.median(run[phase] for run in runs), 1) for phase in PHASES}
+    print('median over {} runs: '.format(len(runs)) + ', '.join(f'{phase} {summary[phase]}' for phase in PHASES))
+    print('slowest imports: ' + ', '.join(f"{t['module']} {t['self_ms']}ms" for t in profile['slowest_imports'][:5]))
+
+    if args.json:
+        write_results(args.json, {'benchmark': 'startup', 'median': summary, 'runs': runs,
+                                  'slowest_imports': profile['slowest_imports']})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import functools
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Benchmarks import the backend modules directly
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+# mongomock collection methods that stand for one command on a real mongod
+MOCK_COMMANDS = (
+    'find', 'find_one', 'aggregate', 'distinct', 'count_documents', 'estimated_document_count',
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one', 'delete_one', 'delete_many',
+    'find_one_and_update', 'find_one_and_replace', 'find_one_and_delete', 'bulk_write', 'create_index',
+)
+_mock_depth = threading.local()
+
+
+def count_mock_queries():
+    """Report mongomock collection calls to the profiler, which sees no command events from it.
+
+    Each outermost call counts as one command (mongomock's ``find_one`` calls
+    its own ``find``), and a ``find`` counts when its cursor is created. A real
+    mongod also counts a ``getMore`` per extra cursor batch, so results larger
+    than one batch count higher there.
+    """
+    from mongomock.collection import Collection
+    from profiler import record_query
+
+    if getattr(Collection, '_queries_counted', False):
+        return
+    for name in MOCK_COMMANDS:
+        def counted(method, name=name):
+            @functools.wraps(method)
+            def wrapper(self, *args, **kwargs):
+                depth = getattr(_mock_depth, 'value', 0)
+                _mock_depth.value = depth + 1
+                started = time.perf_counter()
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    _mock_depth.value = depth
+                    if depth == 0:
+                        record_query(self.database.name, {name: self.name}, time.perf_counter() - started)
+            return wrapper
+        setattr(Collection, name, counted(getattr(Collection, name)))
+    Collection._queries_counted = True
+
+
+def bench_db(name: str):
+    """A throwaway database: real Mongo when BENCH_MONGO_URL is set, otherwise mongomock-motor."""
+    url = os.environ.get('BENCH_MONGO_URL')
+    if url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        return AsyncIOMotorClient(url)[name]
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit('Set BENCH_MONGO_URL or `pip install mongomock-motor` to run benchmarks')
+    count_mock_queries()
+    return AsyncMongoMockClient()[name]
+
+
+def load_app(db_name: str):
+    """Import the API with its database pointed at a throwaway benchmark database.
+
+    Returns ``(server_module, db)``. With BENCH_MONGO_URL the app's own client
+    is used, so command monitoring counts queries; otherwise every backend
+    module's ``db`` name, and every service bound to the app database, is
+    rebound to mongomock, whose calls are counted by ``count_mock_queries``.
+    """
+    url = os.environ.get('BENCH_MONGO_URL')
+    os.environ['MONGO_URL'] = url or 'mongodb://localhost:27017'
+    os.environ['DB_NAME'] = db_name
+    # Every benchmark client shares one address, which the per-IP budgets would throttle
+    os.environ.setdefault('RATE_LIMITS_ENABLED', '0')
+    import core
+    import server
+
+    if url:
+        return server, core.db
+
+    db = bench_db(db_name)
+    original = core.db
+    for module in list(sys.modules.values()):
+        if not str(getattr(module, '__file__', None) or '').startswith(str(BACKEND_DIR)):
+            continue
+        for name, value in list(vars(module).items()):
+            if value is original:
+                setattr(module, name, db)
+            elif not isinstance(value, type(sys)) and getattr(value, 'db', None) is original:
+                value.db = db
+    return server, db
+
+
+async def drop_db(db):
+    await db.client.drop_database(db.name)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds for samples given in seconds."""
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def write_results(path: str, results: dict):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {path}")
@@ -0,0 +1,143 @@
+"""In-process load benchmark for the Vistagram API.
+
+    cd backend && python -m benchmarks.run --scale small --scenarios chat,feed,login,forum \
+        --concurrency 20 --requests 500 --json results.json [--compare previous.json]
+
+The ASGI app is driven through httpx's ASGITransport, so no network or
+running server is needed. Data lives in mongomock-motor unless
+BENCH_MONGO_URL points at a real (throwaway) mongod. Queries per request are
+counted on both (see ``benchmarks.common.count_mock_queries``).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from benchmarks.common import load_app, drop_db, summarize, write_results
+from benchmarks.scenarios import SCENARIOS
+from benchmarks.seed import SCALES, seed
+from profiler import capture_queries
+
+
+async def run_scenario(client: httpx.AsyncClient, dataset, name: str, concurrency: int, requests: int) -> dict:
+    scenario = SCENARIOS[name]
+    issued = itertools.count()
+    samples, statuses = [], Counter()
+    by_route = defaultdict(list)
+    query_counts = []
+
+    async def worker(worker_id: int):
+        rng = random.Random(worker_id)
+        while next(issued) < requests:
+            with capture_queries() as profile:
+                started = time.perf_counter()
+                route, response = await scenario(client, dataset, rng)
+                elapsed = time.perf_counter() - started
+            samples.append(elapsed)
+            by_route[route].append(elapsed)
+            statuses[response.status_code] += 1
+            query_counts.append(profile.count)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        'requests': len(samples),
+        'concurrency': concurrency,
+        'errors': errors,
+        'status_counts': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput_rps': round(len(samples) / wall, 2) if wall else 0.0,
+        'latency': summarize(samples),
+        'routes': {route: summarize(route_samples) for route, route_samples in sorted(by_route.items())},
+        'queries_per_request': round(sum(query_counts) / len(query_counts), 2) if query_counts else None,
+    }
+
+
+def print_comparison(previous: dict, current: dict):
+    print('\nComparison with previous run:')
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        for label, old, new in (
+            ('throughput', before['throughput_rps'], result['throughput_rps']),
+            ('p50', before['latency']['p50_ms'], result['latency']['p50_ms']),
+            ('p99', before['latency']['p99_ms'], result['latency']['p99_ms']),
+        ):
+            change = f'{(new - old) / old * 100:+.1f}%' if old else 'n/a'
+            print(f'  {name:<6} {label:<10} {old:>10} -> {new:<10} ({change})')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='tiny')
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--servers', type=int)
+    parser.add_argument('--messages-per-channel', type=int)
+    parser.add_argument('--reels', type=int)
+    parser.add_argument('--forum-posts', type=int)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--json')
+    parser.add_argument('--compare')
+    args = parser.parse_args()
+
+    sizes = dict(SCALES[args.scale])
+    for key in ('users', 'servers', 'messages_per_channel', 'reels', 'forum_posts'):
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+    scenario_names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenario_names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    server, db = load_app('vistagram_bench')
+    from core import create_token
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    await drop_db(db)
+    print(f'Seeding {sizes} ...')
+    started = time.perf_counter()
+    dataset = await seed(db, sizes, create_token)
+    print(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+    await server.app.router.startup()
+    results = {
+        'scale': args.scale,
+        'sizes': sizes,
+        'mongo': 'real' if os.environ.get('BENCH_MONGO_URL') else 'mongomock',
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'scenarios': {},
+    }
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for name in scenario_names:
+                result = await run_scenario(client, dataset, name, args.concurrency, args.requests)
+                results['scenarios'][name] = result
+                latency = result['latency']
+                print(f"{name:<6} {result['throughput_rps']:>9} req/s  p50 {latency['p50_ms']}ms  "
+                      f"p95 {latency['p95_ms']}ms  p99 {latency['p99_ms']}ms  errors {result['errors']}  "
+                      f"queries/req {result['queries_per_request']}")
+    finally:
+        await server.app.router.shutdown()
+        await drop_db(db)
+
+    if args.json:
+        write_results(args.json, results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+import random
+
+import httpx
+
+from benchmarks.seed import BENCH_PASSWORD, Dataset
+
+# Each scenario issues one request per call and returns (route label, response)
+
+
+async def chat_mix(client: httpx.AsyncClient, dataset: Dataset, rng: random.Random):
+    channel = rng.choice(dataset.text_channels)
+    user_id = rng.choice(dataset.server_members[channel['server_id']])
+    headers = dataset.headers(user_id)
+    if rng.random() < 0.8:
+        response = await client.get(f"/api/channels/{channel['id']}/messages", headers=headers)
+        return 'GET /api/channels/{id}/messages', response
+    response = await client.post('/api/messages', json={'content': 'bench message', 'channel_id': channel['id']}, headers=headers)
+    return 'POST /api/messages', response
+
+
+async def feed_scroll(client: httpx.AsyncClient, dataset: Dataset, rng: random.Random):
+    headers = dataset.headers(rng.choice(dataset.users)['id'])
+    roll = rng.random()
+    if roll < 0.6:
+        skip = rng.randint(0, 10) * 10
+        return 'GET /api/reels', await client.get('/api/reels', params={'limit': 10, 'skip': skip}, headers=headers)
+    if roll < 0.75:
+        return 'GET /api/reels/following', await client.get('/api/reels/following', headers=headers)
+    reel_id = rng.choice(dataset.reel_ids)
+    if roll < 0.95:
+        return 'GET /api/reels/{id}', await client.get(f'/api/reels/{reel_id}', headers=headers)
+    return 'POST /api/reels/{id}/like', await client.post(f'/api/reels/{reel_id}/like', headers=headers)
+
+
+async def login_storm(client: httpx.AsyncClient, dataset: Dataset, rng: random.Random):
+    user = rng.choice(dataset.users)
+    response = await client.post('/api/auth/login', json={'email': user['email'], 'password': BENCH_PASSWORD})
+    return 'POST /api/auth/login', response
+
+
+async def forum_browse(client: httpx.AsyncClient, dataset: Dataset, rng: random.Random):
+    headers = dataset.headers(rng.choice(dataset.users)['id'])
+    roll = rng.random()
+    if roll < 0.2:
+        return 'GET /api/forum/categories', await client.get('/api/forum/categories', headers=headers)
+    if roll < 0.6:
+        params = {'category_id': rng.choice(dataset.category_ids), 'limit': 20}
+        return 'GET /api/forum/posts', await client.get('/api/forum/posts', params=params, headers=headers)
+    post_id = rng.choice(dataset.post_ids)
+    if roll < 0.85:
+        return 'GET /api/forum/posts/{id}', await client.get(f'/api/forum/posts/{post_id}', headers=headers)
+    return 'GET /api/forum/posts/{id}/replies', await client.get(f'/api/forum/posts/{post_id}/replies', headers=headers)
+
+
+SCENARIOS = {
+    'chat': chat_mix,
+    'feed': feed_scroll,
+    'login': login_storm,
+    'forum': forum_browse,
+}
@@ -0,0 +1,159 @@
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import bcrypt
+
+from ids import new_id, utcnow
+
+BENCH_PASSWORD = 'bench-password'
+
+SCALES = {
+    'tiny': {'users': 50, 'servers': 5, 'channels_per_server': 3, 'messages_per_channel': 50, 'reels': 100, 'forum_posts': 100},
+    'small': {'users': 500, 'servers': 20, 'channels_per_server': 5, 'messages_per_channel': 200, 'reels': 1000, 'forum_posts': 1000},
+    'medium': {'users': 5000, 'servers': 100, 'channels_per_server': 5, 'messages_per_channel': 1000, 'reels': 20000, 'forum_posts': 10000},
+    'large': {'users': 50000, 'servers': 500, 'channels_per_server': 8, 'messages_per_channel': 2000, 'reels': 200000, 'forum_posts': 100000},
+}
+
+FORUM_CATEGORIES = ['Updates', 'Help and Feedback', 'Creations', 'Resources', 'Discussion']
+INSERT_BATCH_SIZE = 5000
+
+
+@dataclass
+class Dataset:
+    sizes: Dict[str, int]
+    users: List[dict] = field(default_factory=list)
+    tokens: Dict[str, str] = field(default_factory=dict)
+    server_members: Dict[str, List[str]] = field(default_factory=dict)
+    text_channels: List[dict] = field(default_factory=list)
+    dms: List[dict] = field(default_factory=list)
+    reel_ids: List[str] = field(default_factory=list)
+    category_ids: List[str] = field(default_factory=list)
+    post_ids: List[str] = field(default_factory=list)
+
+    def headers(self, user_id: str) -> Dict[str, str]:
+        return {'Authorization': f'Bearer {self.tokens[user_id]}'}
+
+
+async def insert_batched(collection, docs: List[dict]):
+    for start in range(0, len(docs), INSERT_BATCH_SIZE):
+        await collection.insert_many(docs[start:start + INSERT_BATCH_SIZE], ordered=False)
+
+
+def timestamps(rng: random.Random, count: int, days: int = 30) -> List[datetime]:
+    # Whole milliseconds, oldest first, like the BSON dates the API writes
+    now = utcnow()
+    offsets = sorted((rng.randint(0, days * 86400 * 1000) for _ in range(count)), reverse=True)
+    return [now - timedelta(milliseconds=offset) for offset in offsets]
+
+
+async def seed(db, sizes: Dict[str, int], create_token, seed_value: int = 42) -> Dataset:
+    """Insert a synthetic dataset shaped like the documents the API writes."""
+    rng = random.Random(seed_value)
+    dataset = Dataset(sizes=dict(sizes))
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD.encode(), bcrypt.gensalt()).decode()
+
+    user_ids = [new_id() for _ in range(sizes['users'])]
+    follows = {user_id: set() for user_id in user_ids}
+    followers = {user_id: set() for user_id in user_ids}
+    for user_id in user_ids:
+        for other in rng.sample(user_ids, min(len(user_ids), 10)):
+            if other != user_id:
+                follows[user_id].add(other)
+                followers[other].add(user_id)
+
+    memberships = {user_id: [] for user_id in user_ids}
+    servers, channels = [], []
+    for i in range(sizes['servers']):
+        server_id = new_id()
+        members = rng.sample(user_ids, max(1, min(len(user_ids), rng.randint(5, max(5, len(user_ids) // 4)))))
+        for member in members:
+            memberships[member].append(server_id)
+        dataset.server_members[server_id] = members
+        servers.append({
+            'id': server_id, 'name': f'Bench Server {i}', 'icon': None, 'banner': None,
+            'description': f'Synthetic server {i}', 'owner_id': members[0], 'members': members,
+            'invite_code': server_id[-8:], 'boost_count': rng.randint(0, 20),
+            'created_at': utcnow(),
+        })
+        for c in range(sizes['channels_per_server']):
+            channel = {
+                'id': new_id(), 'name': f'channel-{c}', 'channel_type': 'text',
+                'server_id': server_id, 'category_id': None, 'created_at': utcnow(),
+            }
+            channels.append(channel)
+            dataset.text_channels.append(channel)
+
+    users = []
+    for i, user_id in enumerate(user_ids):
+        username = f'bench_user_{i}'
+        users.append({
+            'id': user_id, 'username': username, 'email': f'{username}@bench.local', 'password': password_hash,
+            'avatar': None, 'banner': None, 'bio': '', 'status': 'offline', 'is_premium': False,
+            'theme': 'liquid-glass', 'discriminator': f'{i % 10000:04d}', 'servers': memberships[user_id],
+            'friends': [], 'followers': sorted(followers[user_id]), 'following': sorted(follows[user_id]),
+            'robux': 0, 'created_at': utcnow(),
+        })
+        dataset.tokens[user_id] = create_token(user_id)
+    dataset.users = [{'id': u['id'], 'email': u['email']} for u in users]
+    await insert_batched(db.users, users)
+    await insert_batched(db.servers, servers)
+    await insert_batched(db.channels, channels)
+
+    for channel in channels:
+        members = dataset.server_members[channel['server_id']]
+        messages = [
+            {
+                'id': new_id(), 'content': f'Synthetic message {n}', 'channel_id': channel['id'],
+                'author_id': rng.choice(members), 'attachments': [], 'reactions': {}, 'created_at': created_at,
+            }
+            for n, created_at in enumerate(timestamps(rng, sizes['messages_per_channel']))
+        ]
+        await insert_batched(db.messages, messages)
+
+    for _ in range(min(len(user_ids) // 2, 200)):
+        a, b = rng.sample(user_ids, 2)
+        dm = {'id': new_id(), 'participants': [a, b], 'created_at': utcnow()}
+        dataset.dms.append(dm)
+    if dataset.dms:
+        await insert_batched(db.dms, [dict(dm) for dm in dataset.dms])
+
+    reels = []
+    for n, created_at in enumerate(timestamps(rng, sizes['reels'])):
+        likes = rng.sample(user_ids, min(len(user_ids), rng.randint(0, 20)))
+        reels.append({
+            'id': new_id(), 'title': f'Reel {n}', 'description': '', 'video_url': 'https://example.invalid/v.mp4',
+            'thumbnail_url': None, 'author_id': rng.choice(user_ids), 'likes': likes,
+            'views': rng.randint(0, 5000), 'comments_count': 0, 'created_at': created_at,
+        })
+    dataset.reel_ids = [r['id'] for r in reels]
+    await insert_batched(db.reels, reels)
+
+    categories = [
+        {'id': new_id(), 'name': name, 'description': '', 'color': '#ef4444', 'icon': None,
+         'created_at': utcnow()}
+        for name in FORUM_CATEGORIES
+    ]
+    dataset.category_ids = [c['id'] for c in categories]
+    await insert_batched(db.forum_categories, categories)
+
+    posts, replies = [], []
+    for n, created_at in enumerate(timestamps(rng, sizes['forum_posts'])):
+        post_id = new_id()
+        posts.append({
+            'id': post_id, 'title': f'Post {n}', 'content': 'Synthetic post', 'category_id': rng.choice(dataset.category_ids),
+            'author_id': rng.choice(user_ids), 'attachments': [], 'views': rng.randint(0, 1000), 'likes': [],
+            'created_at': created_at,
+        })
+        for _ in range(rng.randint(0, 4)):
+            replies.append({
+                'id': new_id(), 'content': 'Synthetic reply', 'post_id': post_id,
+                'author_id': rng.choice(user_ids), 'attachments': [], 'created_at': created_at,
+            })
+    dataset.post_ids = [p['id'] for p in posts]
+    await insert_batched(db.forum_posts, posts)
+    if replies:
+        await insert_batched(db.forum_replies, replies)
+
+    return dataset
@@ -0,0 +1,296 @@
+"""Settings, the Mongo client, shared services and auth helpers used by every router.
+
+Heavy or rarely needed dependencies (bcrypt, certifi, cloudinary) are
+imported on first use rather than here, to keep cold starts short.
+"""
+from fastapi import HTTPException, Depends, Request
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+import logging
+from pathlib import Path
+from typing import List, Dict, Optional
+from datetime import datetime, timezone, timedelta
+import jwt
+from feed import FeedService
+from trending import TrendingRanker
+from marketplace import ProductCatalog
+from metrics import LoopLagMonitor, mongo_event_listeners
+from profiler import QueryProfiler
+from archive import MessageArchive
+from message_writer import MessageWriter
+from metadata_cache import MetadataCache
+from recent_messages import RecentMessages
+from read_state import ReadState
+from reel_comments import ReelComments
+from asset_store import AssetStore
+from discovery import DiscoveryIndex
+from authz import MembershipCache
+from jobs import JobQueue
+from notifications import NotificationInbox
+from single_flight import SingleFlight
+from rate_limit import RateLimiter, AdmissionControl, ROUTE_CLASSES
+from avatars import identicon_path, initials_path, placeholder_path
+from user_stats import UserStats
+from history_export import iter_history, ndjson_stream
+from pagination import before_clause
+
+ROOT_DIR = Path(__file__).parent
+env_path = ROOT_DIR / '.env'
+if not env_path.exists():
+    env_path = ROOT_DIR.parent / '.env'
+load_dotenv(env_path)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def mongo_client_options(url: str) -> dict:
+    options = {
+        'serverSelectionTimeoutMS': 5000,
+        # Dates come back as aware UTC datetimes, so they serialize with an offset like the old ISO strings
+        'tz_aware': True,
+        'event_listeners': mongo_event_listeners() + [QueryProfiler()],
+    }
+    # Only TLS connections (Atlas uses mongodb+srv) need certifi's CA bundle
+    lowered = url.lower()
+    if lowered.startswith('mongodb+srv://') or 'tls=true' in lowered or 'ssl=true' in lowered:
+        import certifi
+        options['tlsCAFile'] = certifi.where()
+    return options
+
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url, **mongo_client_options(mongo_url))
+db = client[os.environ['DB_NAME']]
+
+# JWT Settings
+JWT_SECRET = os.environ.get('JWT_SECRET', 'vistagram-super-secret-key-2024')
+JWT_ALGORITHM = 'HS256'
+JWT_EXPIRATION_HOURS = 72
+
+# Optional bearer token required to scrape /metrics
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Opt-in per-request query profiling: debug headers plus slow request logging with explain plans
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '500'))
+SLOW_REQUEST_QUERIES = int(os.environ.get('SLOW_REQUEST_QUERIES', '20'))
+
+# Channel messages older than this many days are compacted into buckets (0 disables)
+MESSAGE_ARCHIVE_DAYS = int(os.environ.get('MESSAGE_ARCHIVE_DAYS', '30'))
+MESSAGE_ARCHIVE_COMPRESS = os.environ.get('MESSAGE_ARCHIVE_COMPRESS', '1').lower() in ('1', 'true', 'yes')
+
+# Group commit for message inserts: queue for a few milliseconds, then write with one insert_many
+MESSAGE_WRITE_BATCHING = os.environ.get('MESSAGE_WRITE_BATCHING', '').lower() in ('1', 'true', 'yes')
+MESSAGE_WRITE_DELAY_MS = float(os.environ.get('MESSAGE_WRITE_DELAY_MS', '5'))
+MESSAGE_WRITE_QUEUE_SIZE = int(os.environ.get('MESSAGE_WRITE_QUEUE_SIZE', '10000'))
+
+# Newest messages kept in memory per channel/DM (0 disables; only safe with a single API worker)
+RECENT_MESSAGES_PER_CHANNEL = int(os.environ.get('RECENT_MESSAGES_PER_CHANNEL', '200'))
+
+# Channel read markers are acked in memory and written in bulk this often
+READ_STATE_FLUSH_SECONDS = float(os.environ.get('READ_STATE_FLUSH_SECONDS', '1'))
+
+# Connections opened concurrently at startup so the first requests don't pay for the handshake
+MONGO_PREWARM_CONNECTIONS = int(os.environ.get('MONGO_PREWARM_CONNECTIONS', '4'))
+
+# Notification events for the same recipient and target within this window are written as one
+NOTIFICATION_COALESCE_SECONDS = float(os.environ.get('NOTIFICATION_COALESCE_SECONDS', '5'))
+
+# Per-user profile stats are recomputed from scratch in batches this often, to correct drift
+USER_STATS_RECONCILE_SECONDS = float(os.environ.get('USER_STATS_RECONCILE_SECONDS', '300'))
+
+# Concurrent background job workers (0 runs none in this process; jobs wait for another worker)
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))
+
+# Origin the API is reachable at from browsers, for absolute links to images it renders
+# (empty when the frontend proxies /api on its own origin; Render sets RENDER_EXTERNAL_URL)
+PUBLIC_API_URL = (os.environ.get('PUBLIC_API_URL') or os.environ.get('RENDER_EXTERNAL_URL', '')).rstrip('/')
+
+# Per-user/per-IP budgets and concurrency caps for expensive routes (see rate_limit.py)
+RATE_LIMITS_ENABLED = os.environ.get('RATE_LIMITS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+# Proxies in front of the API that append to X-Forwarded-For; 0 uses the socket address
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '0'))
+
+# Following feed timelines
+feed_service = FeedService(db)
+
+# Precomputed trending reels and forum posts
+trending_ranker = TrendingRanker(db)
+
+# Marketplace browse queries and facet counts
+product_catalog = ProductCatalog(db)
+
+# Event loop lag sampling for /metrics
+loop_lag_monitor = LoopLagMonitor()
+
+# Hot messages plus compacted cold buckets
+message_archive = MessageArchive(db, archive_after_days=MESSAGE_ARCHIVE_DAYS, compress=MESSAGE_ARCHIVE_COMPRESS)
+
+# Message inserts, optionally group-committed
+message_writer = MessageWriter(db, batching=MESSAGE_WRITE_BATCHING, delay_ms=MESSAGE_WRITE_DELAY_MS, max_queue=MESSAGE_WRITE_QUEUE_SIZE)
+
+# Server documents and channel lists, versioned per server
+metadata_cache = MetadataCache(db)
+
+# Hydrated recent messages for active channels and DMs
+recent_messages = RecentMessages(capacity=RECENT_MESSAGES_PER_CHANNEL)
+
+# Channel read markers and unread counts
+read_state = ReadState(db, flush_seconds=READ_STATE_FLUSH_SECONDS)
+
+# Threaded reel comments and each reel's precomputed top comments
+reel_comments = ReelComments(db)
+
+# Chunked, versioned studio project files
+asset_store = AssetStore(db)
+
+# Ranked server discovery snapshot
+discovery_index = DiscoveryIndex(db)
+
+# Per-user server memberships for read checks; channels resolve through the metadata cache
+membership_cache = MembershipCache(db, metadata_cache)
+
+# Durable background jobs; handlers are registered below
+job_queue = JobQueue(db, workers=JOB_WORKERS)
+
+# Coalesced per-user notifications and unread counters
+notification_inbox = NotificationInbox(db, window_seconds=NOTIFICATION_COALESCE_SECONDS)
+
+# Materialized profile counters
+user_stats = UserStats(db, reconcile_seconds=USER_STATS_RECONCILE_SECONDS)
+
+# Concurrent identical reads of hot documents share one load
+hot_reads = SingleFlight()
+
+# Token buckets (in memory) and admission control for login, signup, uploads, search and messages
+rate_limiter = RateLimiter(enabled=RATE_LIMITS_ENABLED)
+admission = AdmissionControl(enabled=RATE_LIMITS_ENABLED)
+
+# Security
+security = HTTPBearer()
+
+# ================== AUTH HELPERS ==================
+
+def hash_password(password: str) -> str:
+    import bcrypt
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+def verify_password(password: str, hashed: str) -> bool:
+    import bcrypt
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+def create_token(user_id: str) -> str:
+    payload = {
+        'user_id': user_id,
+        'exp': datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS),
+        'iat': datetime.now(timezone.utc)
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    # Sub-requests dispatched by /api/batch carry the caller resolved once by the batch itself
+    batch_user = request.scope.get('batch_user')
+    if batch_user is not None:
+        return dict(batch_user)
+    
+    try:
+        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        user = await db.users.find_one({'id': payload['user_id']}, {'_id': 0, 'password': 0})
+        if not user:
+            raise HTTPException(status_code=401, detail='User not found')
+        return user
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail='Token expired')
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail='Invalid token')
+
+# ================== RATE LIMITING ==================
+
+def client_ip(request: Request) -> str:
+    if TRUSTED_PROXY_HOPS:
+        forwarded = [hop.strip() for hop in request.headers.get('x-forwarded-for', '').split(',') if hop.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            # Entries left of what our own proxies appended are client-controlled
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else ''
+
+def throttled(route: str):
+    """Dependency for signed-in routes: ``route``'s budgets, then a slot for its route class held until it returns."""
+    async def dependency(request: Request, current_user: dict = Depends(get_current_user)):
+        await rate_limiter.check(route, client_ip(request), current_user['id'])
+        async with admission.slot(ROUTE_CLASSES[route]):
+            yield
+    return dependency
+
+# ================== DEFAULT IMAGES ==================
+
+def default_avatar_url(seed: str) -> str:
+    return PUBLIC_API_URL + identicon_path(seed)
+
+def default_icon_url(seed: str) -> str:
+    return PUBLIC_API_URL + initials_path(seed)
+
+def placeholder_url(width: int, height: int, text: Optional[str] = None) -> str:
+    return PUBLIC_API_URL + placeholder_path(width, height, text)
+
+# ================== SHARED QUERIES ==================
+
+async def get_author_map(user_ids: List[str], fields: tuple = ('id', 'username', 'avatar')) -> Dict[str, dict]:
+    ids = list(set(user_ids))
+    if not ids:
+        return {}
+    authors = await db.users.find({'id': {'$in': ids}}, {'_id': 0, **{field: 1 for field in fields}}).to_list(len(ids))
+    return {author['id']: author for author in authors}
+
+CHANNEL_AUTHOR_FIELDS = ('id', 'username', 'avatar', 'discriminator')
+
+async def attach_authors(messages: List[dict], fields: tuple = ('id', 'username', 'avatar')):
+    authors = await get_author_map([m['author_id'] for m in messages], fields=fields)
+    for message in messages:
+        author = authors.get(message['author_id'])
+        if author:
+            message['author'] = author
+
+async def get_messages_since(collection: str, parent_field: str, parent_id: str, since: str, limit: int) -> List[dict]:
+    anchor = await db[collection].find_one({'id': since, parent_field: parent_id}, {'_id': 0, 'id': 1, 'created_at': 1})
+    if not anchor and collection == 'messages':
+        # A client that last polled before compaction still holds an archived message as its anchor
+        archived = await message_archive.find(parent_id, since)
+        if archived:
+            return await message_archive.read_after(parent_id, limit, [archived['created_at'], archived['id']])
+    if not anchor:
+        raise HTTPException(status_code=404, detail='Message not found')
+    query = {parent_field: parent_id, **before_clause('created_at', anchor['created_at'], 'id', anchor['id'], descending=False)}
+    return await db[collection].find(query, {'_id': 0}).sort([('created_at', 1), ('id', 1)]).limit(limit).to_list(limit)
+
+def history_response(kind: str, parent_id: str, compress: bool) -> StreamingResponse:
+    filename = f"{kind}-{parent_id}.ndjson" + ('.gz' if compress else '')
+    return StreamingResponse(
+        ndjson_stream(iter_history(db, kind, parent_id), compress=compress),
+        media_type='application/gzip' if compress else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+# ================== BACKGROUND JOBS ==================
+
+@job_queue.handler('feed.fan_out')
+async def fan_out_reel(payload: dict):
+    reel = await db.reels.find_one({'id': payload['reel_id']}, {'_id': 0, 'id': 1, 'author_id': 1, 'created_at': 1})
+    if not reel:
+        return
+    author = await db.users.find_one({'id': reel['author_id']}, {'_id': 0, 'followers': 1})
+    await feed_service.fan_out(reel, (author or {}).get('followers', []))
+
+@job_queue.handler('feed.backfill')
+async def backfill_feed(payload: dict):
+    await feed_service.backfill(payload['follower_id'], payload['author_id'])
+
+@job_queue.handler('reel_comments.count')
+async def count_reel_comment(payload: dict):
+    await reel_comments.count(payload['comment_id'])
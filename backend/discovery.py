@@ -0,0 +1,196 @@
+import asyncio
+import bisect
+import heapq
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from ids import new_id, utcnow
+from pagination import time_clause
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_REFRESH_SECONDS = 300
+DISCOVERY_MAX_SERVERS = 10000
+# Messages sent in this window count as recent activity
+DISCOVERY_ACTIVITY_DAYS = 7
+DISCOVERY_DESCRIPTION_LENGTH = 300
+# Score = weighted log(members) + weighted log(recent messages) + weighted boosts
+DISCOVERY_WEIGHTS = {'members': 1.0, 'activity': 1.5, 'boosts': 0.5}
+DISCOVERY_MAX_BOOSTS = 14
+# Snapshot entries written per insert
+DISCOVERY_WRITE_BATCH = 1000
+
+DISCOVERY_CATEGORIES = ('gaming', 'music', 'education', 'science', 'entertainment', 'art', 'technology', 'community')
+
+SNAPSHOT_FIELDS = ('id', 'name', 'description', 'icon', 'banner', 'invite_code', 'category', 'boost_count', 'member_count', 'created_at')
+
+
+def discovery_score(member_count: int, activity: int, boost_count: int) -> float:
+    return round(
+        DISCOVERY_WEIGHTS['members'] * math.log1p(member_count)
+        + DISCOVERY_WEIGHTS['activity'] * math.log1p(activity)
+        + DISCOVERY_WEIGHTS['boosts'] * min(boost_count, DISCOVERY_MAX_BOOSTS),
+        6,
+    )
+
+
+def rank_key(entry: dict) -> Tuple[float, str]:
+    return (-entry['discovery_score'], entry['id'])
+
+
+class DiscoveryIndex:
+    """Ranked, searchable snapshot of servers for the discovery page.
+
+    A background loop rebuilds the snapshot every DISCOVERY_REFRESH_SECONDS
+    from member counts (computed in the aggregation, so members arrays never
+    leave Mongo), messages sent in the last DISCOVERY_ACTIVITY_DAYS and
+    boosts, and persists it so a restart can serve the last snapshot
+    straight away: one ``discovery_servers`` document per entry, tagged with
+    its build, and a ``discovery`` document naming the current build, which
+    is switched once every entry is written. Requests only read the in-memory
+    snapshot: name/description search and category filters scan it in rank
+    order, and pages continue from a ``(score, id)`` cursor, which stays
+    valid across rebuilds.
+
+    Servers are streamed from the aggregation and trimmed to the best
+    DISCOVERY_MAX_SERVERS as they arrive, so a rebuild holds at most twice
+    the snapshot size however many servers exist.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.servers: List[dict] = []
+        self.keys: List[Tuple[float, str]] = []
+        self.search_text: List[str] = []
+        self.categories: Dict[str, int] = {}
+        self.built_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        await self.db.discovery_servers.create_index([('build', 1), ('rank', 1)])
+
+    async def load(self):
+        await self.ensure_indexes()
+        snapshot = await self.db.discovery.find_one({'id': 'servers'}, {'_id': 0})
+        items = []
+        if snapshot and snapshot.get('build'):
+            items = await self.db.discovery_servers.find(
+                {'build': snapshot['build']}, {'_id': 0, 'build': 0, 'rank': 0}).sort('rank', 1).to_list(None)
+        if items:
+            self._install(items, snapshot['built_at'])
+        else:
+            await self.rebuild()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(DISCOVERY_REFRESH_SECONDS)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Discovery rebuild failed: {str(e)}")
+
+    # ---------- rebuild ----------
+
+    async def rebuild(self):
+        now = utcnow()
+        activity = await self._recent_activity(now - timedelta(days=DISCOVERY_ACTIVITY_DAYS))
+        servers = self.db.servers.aggregate([
+            {'$project': {
+                '_id': 0, 'id': 1, 'name': 1, 'description': 1, 'icon': 1, 'banner': 1, 'invite_code': 1,
+                'category': 1, 'boost_count': 1, 'created_at': 1,
+                'member_count': {'$size': {'$ifNull': ['$members', []]}},
+            }},
+        ])
+
+        # Streamed and trimmed to the best DISCOVERY_MAX_SERVERS whenever twice that many are held
+        items = []
+        async for server in servers:
+            entry = {field: server.get(field) for field in SNAPSHOT_FIELDS}
+            entry['description'] = (entry['description'] or '')[:DISCOVERY_DESCRIPTION_LENGTH]
+            entry['boost_count'] = entry['boost_count'] or 0
+            entry['recent_messages'] = activity.get(server['id'], 0)
+            entry['discovery_score'] = discovery_score(entry['member_count'], entry['recent_messages'], entry['boost_count'])
+            items.append(entry)
+            if len(items) >= 2 * DISCOVERY_MAX_SERVERS:
+                items = heapq.nsmallest(DISCOVERY_MAX_SERVERS, items, key=rank_key)
+        items = heapq.nsmallest(DISCOVERY_MAX_SERVERS, items, key=rank_key)
+
+        await self._save(items, now)
+        self._install(items, now)
+
+    async def _save(self, items: List[dict], built_at: datetime):
+        build = new_id()
+        for start in range(0, len(items), DISCOVERY_WRITE_BATCH):
+            await self.db.discovery_servers.insert_many([
+                {**entry, 'build': build, 'rank': start + offset}
+                for offset, entry in enumerate(items[start:start + DISCOVERY_WRITE_BATCH])
+            ])
+        await self.db.discovery.update_one(
+            {'id': 'servers'},
+            {'$set': {'id': 'servers', 'build': build, 'built_at': built_at}, '$unset': {'items': ''}},
+            upsert=True
+        )
+        # Build ids are time ordered, so this never drops a newer build another process is writing
+        await self.db.discovery_servers.delete_many({'build': {'$lt': build}})
+
+    async def _recent_activity(self, since: datetime) -> Dict[str, int]:
+        per_channel = await self.db.messages.aggregate([
+            {'$match': time_clause('created_at', '$gte', since)},
+            {'$group': {'_id': '$channel_id', 'count': {'$sum': 1}}},
+        ]).to_list(None)
+        if not per_channel:
+            return {}
+        channels = await self.db.channels.find(
+            {'id': {'$in': [c['_id'] for c in per_channel]}}, {'_id': 0, 'id': 1, 'server_id': 1}).to_list(None)
+        channel_servers = {c['id']: c['server_id'] for c in channels}
+        activity: Dict[str, int] = {}
+        for channel in per_channel:
+            server_id = channel_servers.get(channel['_id'])
+            if server_id:
+                activity[server_id] = activity.get(server_id, 0) + channel['count']
+        return activity
+
+    def _install(self, items: List[dict], built_at: datetime):
+        # Swapped in one step, so a request never sees half a snapshot
+        categories: Dict[str, int] = {}
+        for entry in items:
+            if entry.get('category'):
+                categories[entry['category']] = categories.get(entry['category'], 0) + 1
+        self.servers, self.keys = items, [rank_key(entry) for entry in items]
+        self.search_text = [f"{entry['name'] or ''}\n{entry['description']}".lower() for entry in items]
+        self.categories, self.built_at = categories, built_at
+
+    # ---------- reads ----------
+
+    def search(self, query: Optional[str], category: Optional[str], limit: int,
+               position: Optional[list]) -> Tuple[List[dict], Optional[list]]:
+        """Ranked servers matching every query term and the category, after ``position``."""
+        servers, keys, texts = self.servers, self.keys, self.search_text
+        terms = (query or '').lower().split()
+        start = bisect.bisect_right(keys, (-position[0], position[1])) if position else 0
+
+        matches = []
+        for index in range(start, len(servers)):
+            entry = servers[index]
+            if category and entry.get('category') != category:
+                continue
+            if terms and not all(term in texts[index] for term in terms):
+                continue
+            matches.append(entry)
+            if len(matches) > limit:
+                break
+
+        page = [dict(entry) for entry in matches[:limit]]
+        next_position = [page[-1]['discovery_score'], page[-1]['id']] if len(matches) > limit else None
+        return page, next_position
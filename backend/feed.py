@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from ids import parse_timestamp
+from pagination import before_clause
+
+logger = logging.getLogger(__name__)
+
+# Followers written per insert_many while fanning a reel out
+FANOUT_BATCH_SIZE = 1000
+# Authors with at least this many followers are merged in at read time instead
+FANOUT_READ_THRESHOLD = 50000
+# Recent reels copied into a timeline when a user follows someone
+FOLLOW_BACKFILL_LIMIT = 20
+# How often the fan-out-on-read authors are reloaded, to pick up flags set by other processes
+FANOUT_AUTHORS_REFRESH_SECONDS = 60
+
+
+class FeedService:
+    """Per-follower reel timelines, written when a reel is created.
+
+    Timeline entries live in ``reel_timelines`` as
+    ``{user_id, reel_id, author_id, created_at}`` so the following feed is a
+    single indexed range read. Authors above ``FANOUT_READ_THRESHOLD`` are
+    flagged ``fanout_on_read`` and their reels are pulled from ``reels`` on
+    read and merged with the timeline page. The flagged authors are held in
+    memory and reloaded every FANOUT_AUTHORS_REFRESH_SECONDS, so an author
+    flagged by another API process is pulled here within that interval.
+    """
+
+    def __init__(self, db, refresh_seconds: float = FANOUT_AUTHORS_REFRESH_SECONDS):
+        self.db = db
+        self.refresh_seconds = refresh_seconds
+        self.read_fanout_authors = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        await self.db.reel_timelines.create_index([('user_id', 1), ('created_at', -1), ('reel_id', -1)])
+        await self.db.reel_timelines.create_index([('user_id', 1), ('reel_id', 1)], unique=True)
+        await self.db.reels.create_index([('author_id', 1), ('created_at', -1), ('id', -1)])
+        await self.db.users.create_index('fanout_on_read', partialFilterExpression={'fanout_on_read': True})
+
+    async def load(self):
+        authors = await self.db.users.find({'fanout_on_read': True}, {'_id': 0, 'id': 1}).to_list(None)
+        self.read_fanout_authors = {a['id'] for a in authors}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Fan-out author refresh failed: {str(e)}")
+
+    async def fan_out(self, reel: dict, follower_ids: List[str]):
+        # Runs as a background job: errors propagate so the job is retried, and re-inserted entries are skipped
+        author_id = reel['author_id']
+        if author_id in self.read_fanout_authors:
+            # Merged in at read time, which skips timeline entries by this author anyway
+            return
+        if len(follower_ids) >= FANOUT_READ_THRESHOLD:
+            await self.db.users.update_one({'id': author_id}, {'$set': {'fanout_on_read': True}})
+            self.read_fanout_authors.add(author_id)
+            return
+        
+        for start in range(0, len(follower_ids), FANOUT_BATCH_SIZE):
+            entries = [
+                {'user_id': follower_id, 'reel_id': reel['id'], 'author_id': author_id, 'created_at': reel['created_at']}
+                for follower_id in follower_ids[start:start + FANOUT_BATCH_SIZE]
+            ]
+            await self._insert_entries(entries)
+            # Let request handlers run between batches
+            await asyncio.sleep(0)
+
+    async def backfill(self, follower_id: str, author_id: str):
+        if author_id in self.read_fanout_authors:
+            return
+        reels = await self.db.reels.find(
+            {'author_id': author_id}, {'_id': 0, 'id': 1, 'created_at': 1}
+        ).sort([('created_at', -1), ('id', -1)]).limit(FOLLOW_BACKFILL_LIMIT).to_list(FOLLOW_BACKFILL_LIMIT)
+        entries = [
+            {'user_id': follower_id, 'reel_id': r['id'], 'author_id': author_id, 'created_at': r['created_at']}
+            for r in reels
+        ]
+        await self._insert_entries(entries)
+
+    async def _insert_entries(self, entries: List[dict]):
+        if not entries:
+            return
+        try:
+            await self.db.reel_timelines.insert_many(entries, ordered=False)
+        except Exception as e:
+            # Duplicate (user_id, reel_id) pairs from retries or backfills are expected
+            if 'E11000' not in str(e):
+                raise
+
+    async def get_page(self, user: dict, limit: int, position: Optional[list]) -> Tuple[List[dict], Optional[list]]:
+        """Return up to ``limit`` timeline entries newest first, plus the position of the next page."""
+        following = set(user.get('following', []))
+        query = {'user_id': user['id']}
+        if position:
+            query.update(before_clause('created_at', position[0], 'reel_id', position[1]))
+        
+        # Over-fetch slightly so entries from unfollowed authors don't shorten the page
+        fetch = limit + 10
+        timeline = await self.db.reel_timelines.find(
+            query, {'_id': 0, 'reel_id': 1, 'author_id': 1, 'created_at': 1}
+        ).sort([('created_at', -1), ('reel_id', -1)]).limit(fetch).to_list(fetch)
+        # Reels of read-time authors are always pulled, even if older entries were fanned out
+        pulled_authors = list(self.read_fanout_authors & following)
+        entries = [e for e in timeline if e['author_id'] in following and e['author_id'] not in self.read_fanout_authors]
+        
+        if pulled_authors:
+            reel_query = {'author_id': {'$in': pulled_authors}}
+            if position:
+                reel_query.update(before_clause('created_at', position[0], 'id', position[1]))
+            pulled = await self.db.reels.find(
+                reel_query, {'_id': 0, 'id': 1, 'author_id': 1, 'created_at': 1}
+            ).sort([('created_at', -1), ('id', -1)]).limit(limit + 1).to_list(limit + 1)
+            entries += [{'reel_id': r['id'], 'author_id': r['author_id'], 'created_at': r['created_at']} for r in pulled]
+        
+        def sort_key(e):
+            return (parse_timestamp(e['created_at']), e['reel_id'])
+        
+        entries.sort(key=sort_key, reverse=True)
+        if len(timeline) == fetch:
+            # Pulled reels older than the fetched timeline window belong to a later page
+            boundary = sort_key(timeline[-1])
+            entries = [e for e in entries if sort_key(e) >= boundary]
+            next_entry = entries[limit - 1] if len(entries) > limit else timeline[-1]
+        else:
+            next_entry = entries[limit - 1] if len(entries) > limit else None
+        
+        page = entries[:limit]
+        return page, ([next_entry['created_at'], next_entry['reel_id']] if next_entry else None)
@@ -0,0 +1,222 @@
+"""Streaming export and bulk import of channel and DM message history.
+
+Exports walk a Motor cursor in batches, hydrate authors once per batch and
+yield NDJSON (optionally gzip-compressed), so memory stays flat no matter how
+long the history is. Imports read NDJSON line by line and write
+``insert_many(ordered=False)`` batches, skipping messages that already exist.
+
+CLI (uses MONGO_URL / DB_NAME like the server):
+
+    python history_export.py export channel <channel_id> history.ndjson.gz
+    python history_export.py import channel <channel_id> history.ndjson.gz
+"""
+import asyncio
+import gzip
+import json
+import logging
+import zlib
+from typing import AsyncIterator, Iterable, List, Optional, Set
+
+from pymongo.errors import BulkWriteError
+
+from archive import iter_archived
+from ids import format_timestamp, parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+
+# kind -> (collection, parent field)
+HISTORY_KINDS = {
+    'channel': ('messages', 'channel_id'),
+    'dm': ('dm_messages', 'dm_id'),
+}
+
+# Fields kept when importing; hydrated fields such as ``author`` are dropped
+IMPORT_FIELDS = ('id', 'content', 'author_id', 'attachments', 'reactions', 'created_at')
+
+
+async def ensure_history_indexes(db):
+    for collection, parent_field in HISTORY_KINDS.values():
+        await db[collection].create_index([(parent_field, 1), ('created_at', 1)])
+        await db[collection].create_index('id', unique=True)
+
+
+async def iter_history(db, kind: str, parent_id: str, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[dict]]:
+    """Yield oldest-first batches of messages with ``author`` hydrated."""
+    batch = []
+    async for message in iter_messages(db, kind, parent_id, batch_size):
+        batch.append(message)
+        if len(batch) >= batch_size:
+            yield await hydrate_batch(db, batch)
+            batch = []
+    if batch:
+        yield await hydrate_batch(db, batch)
+
+
+async def iter_messages(db, kind: str, parent_id: str, batch_size: int) -> AsyncIterator[dict]:
+    collection, parent_field = HISTORY_KINDS[kind]
+    if kind == 'channel':
+        # Compaction always moves the oldest messages, so archived history comes first
+        async for message in iter_archived(db, parent_id):
+            yield message
+    cursor = db[collection].find({parent_field: parent_id}, {'_id': 0}).sort('created_at', 1).batch_size(batch_size)
+    async for message in cursor:
+        yield message
+
+
+async def hydrate_batch(db, messages: List[dict]) -> List[dict]:
+    author_ids = list({m['author_id'] for m in messages})
+    authors = await db.users.find({'id': {'$in': author_ids}}, {'_id': 0, 'id': 1, 'username': 1}).to_list(len(author_ids))
+    authors_by_id = {a['id']: a for a in authors}
+    for message in messages:
+        message['author'] = authors_by_id.get(message['author_id'])
+    return messages
+
+
+async def ndjson_stream(batches: AsyncIterator[List[dict]], compress: bool = False) -> AsyncIterator[bytes]:
+    # wbits=31 writes a gzip container around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    async for batch in batches:
+        chunk = ''.join(json.dumps(message, default=format_timestamp) + '\n' for message in batch).encode()
+        if compressor:
+            chunk = compressor.compress(chunk)
+            if not chunk:
+                continue
+        yield chunk
+    if compressor:
+        yield compressor.flush()
+
+
+def import_document(line: str, kind: str, parent_id: str, authors: Optional[Set[str]] = None) -> Optional[dict]:
+    line = line.strip()
+    if not line:
+        return None
+    message = json.loads(line)
+    _, parent_field = HISTORY_KINDS[kind]
+    doc = {field: message[field] for field in IMPORT_FIELDS if field in message}
+    if 'id' not in doc or 'author_id' not in doc or 'created_at' not in doc:
+        raise ValueError('Each message needs an id, an author_id and a created_at')
+    if authors is not None and doc['author_id'] not in authors:
+        raise ValueError(f"Message {doc['id']} is by {doc['author_id']}, who is not a member")
+    try:
+        doc['created_at'] = parse_timestamp(doc['created_at'])
+    except (TypeError, ValueError):
+        raise ValueError(f"Message {doc['id']} has an invalid created_at")
+    doc[parent_field] = parent_id
+    if kind == 'channel':
+        doc.setdefault('attachments', [])
+        doc.setdefault('reactions', {})
+    return doc
+
+
+async def import_history(db, kind: str, parent_id: str, lines, batch_size: int = IMPORT_BATCH_SIZE,
+                         authors: Optional[Set[str]] = None) -> dict:
+    """Insert NDJSON messages from a sync or async line iterable; duplicates by id are skipped.
+
+    With ``authors``, a message by anyone else is rejected (ValueError), so an
+    import can't put words in a non-member's mouth.
+    """
+    collection, _ = HISTORY_KINDS[kind]
+    stats = {'inserted': 0, 'skipped': 0}
+    batch = []
+
+    async def flush():
+        try:
+            result = await db[collection].insert_many(batch, ordered=False)
+            stats['inserted'] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if any(err.get('code') != 11000 for err in errors):
+                raise
+            stats['inserted'] += e.details.get('nInserted', 0)
+            stats['skipped'] += len(errors)
+        batch.clear()
+
+    async for line in _aiter(lines):
+        doc = import_document(line, kind, parent_id, authors)
+        if doc is None:
+            continue
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return stats
+
+
+async def _aiter(lines):
+    if hasattr(lines, '__aiter__'):
+        async for line in lines:
+            yield line
+    else:
+        for line in lines:
+            yield line
+
+
+async def iter_upload_lines(upload, chunk_size: int = 1 << 16) -> AsyncIterator[str]:
+    """Lines of an UploadFile, transparently gunzipped, read in fixed-size chunks."""
+    head = await upload.read(2)
+    decompressor = zlib.decompressobj(31) if head == b'\x1f\x8b' else None
+    pending = b''
+    chunk = head
+    while chunk:
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.decode()
+        chunk = await upload.read(chunk_size)
+    if pending:
+        yield pending.decode()
+
+
+def _open_history_file(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+async def _cli(argv: Iterable[str]):
+    import argparse
+    import os
+    from pathlib import Path
+
+    import certifi
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description='Export or import channel/DM message history as NDJSON.')
+    parser.add_argument('action', choices=['export', 'import'])
+    parser.add_argument('kind', choices=sorted(HISTORY_KINDS))
+    parser.add_argument('parent_id', help='Channel or DM id')
+    parser.add_argument('path', help='NDJSON file; a .gz suffix means gzip')
+    args = parser.parse_args(list(argv))
+
+    root_dir = Path(__file__).parent
+    env_path = root_dir / '.env'
+    load_dotenv(env_path if env_path.exists() else root_dir.parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tlsCAFile=certifi.where(), serverSelectionTimeoutMS=5000, tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        if args.action == 'export':
+            count = 0
+            with _open_history_file(args.path, 'wb') as f:
+                async for batch in iter_history(db, args.kind, args.parent_id):
+                    f.write(''.join(json.dumps(m, default=format_timestamp) + '\n' for m in batch).encode())
+                    count += len(batch)
+            print(f'Exported {count} messages to {args.path}')
+        else:
+            with _open_history_file(args.path, 'rt') as f:
+                stats = await import_history(db, args.kind, args.parent_id, f)
+            print(f"Imported {stats['inserted']} messages, skipped {stats['skipped']} existing")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    import sys
+    asyncio.run(_cli(sys.argv[1:]))
@@ -0,0 +1,67 @@
+"""Time-ordered document ids and native timestamps.
+
+``new_id`` returns UUIDv7 strings: a 48-bit millisecond timestamp leads, so
+ids sort (as strings or as UUIDs) in creation order and new documents land
+at the right edge of the ``id`` index instead of at random pages. Within one
+millisecond a 12-bit counter keeps ids from this process increasing.
+
+Timestamps are stored as BSON dates (``utcnow``). Documents written before
+the switch hold ISO strings until ``migrate_timestamps.py`` rewrites them,
+so readers go through ``parse_timestamp``, which accepts both.
+"""
+import secrets
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Union
+
+_last_ms = 0
+_counter = 0
+
+
+def new_id() -> str:
+    global _last_ms, _counter
+    now_ms = time.time_ns() // 1_000_000
+    if now_ms > _last_ms:
+        # A random start leaves most of the counter free for ids in the same millisecond
+        _last_ms, _counter = now_ms, secrets.randbits(11)
+    else:
+        _counter += 1
+        if _counter > 0xFFF:
+            _last_ms, _counter = _last_ms + 1, 0
+    value = (_last_ms << 80) | (0x7 << 76) | (_counter << 64) | (0b10 << 62) | secrets.randbits(62)
+    return str(uuid.UUID(int=value))
+
+
+def id_timestamp(value: str) -> Optional[datetime]:
+    """Creation time encoded in a UUIDv7 id; None for random (v4) ids."""
+    try:
+        parsed = uuid.UUID(value)
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if parsed.version != 7:
+        return None
+    return datetime.fromtimestamp((parsed.int >> 80) / 1000, tz=timezone.utc)
+
+
+def utcnow() -> datetime:
+    # BSON dates keep milliseconds; truncating here keeps in-memory copies equal to what Mongo returns
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def parse_timestamp(value: Union[datetime, str]) -> datetime:
+    """A stored timestamp (BSON date or legacy ISO string) as an aware UTC datetime."""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.replace(microsecond=moment.microsecond // 1000 * 1000)
+
+
+def format_timestamp(value) -> str:
+    """``json.dumps`` default for documents holding datetimes."""
+    if isinstance(value, datetime):
+        return parse_timestamp(value).astimezone(timezone.utc).isoformat()
+    return str(value)
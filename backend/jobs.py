@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from ids import new_id, parse_timestamp, utcnow
+from metrics import JOB_DURATION, JOB_QUEUE_DEPTH, JOB_QUEUE_WAIT, JOBS
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = 4
+# A claimed job is invisible to other workers this long; past it, the job is assumed lost and runs again
+JOB_VISIBILITY_SECONDS = 60
+JOB_MAX_ATTEMPTS = 5
+# Retry n waits about JOB_BACKOFF_SECONDS * 2 ** (n - 1), capped, with jitter
+JOB_BACKOFF_SECONDS = 2.0
+JOB_BACKOFF_MAX_SECONDS = 600.0
+# Idle workers poll this often; enqueues in this process wake them straight away
+JOB_POLL_SECONDS = 1.0
+# Finished jobs, and their idempotency keys, are kept this long; failed jobs are kept until removed
+JOB_RETENTION_SECONDS = 24 * 3600
+JOB_DEPTH_INTERVAL_SECONDS = 15
+# In-flight jobs get this long to finish on shutdown before they are cancelled (and later retried)
+JOB_SHUTDOWN_GRACE_SECONDS = 5
+
+JOB_STATES = ('queued', 'running', 'failed')
+
+JobHandler = Callable[[dict], Awaitable[None]]
+
+
+def backoff_seconds(attempts: int) -> float:
+    delay = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class JobQueue:
+    """Durable background jobs for work a request shouldn't wait on.
+
+    Jobs are documents in ``jobs``: ``{id, kind, payload, key, state,
+    attempts, run_at, ...}``. ``enqueue`` inserts one and returns; asyncio
+    workers claim due jobs with ``find_one_and_update`` and run the handler
+    registered for the kind. A claimed job's ``run_at`` becomes its lease
+    expiry, so a job whose worker died is due again after
+    JOB_VISIBILITY_SECONDS and the one ``(state, run_at)`` index serves both
+    cases. Failures are retried with exponential backoff up to
+    JOB_MAX_ATTEMPTS, then left ``failed``. Delivery is at least once:
+    handlers must be idempotent.
+
+    An idempotency ``key`` makes enqueue return the existing job instead of
+    adding another while that job is retained. Finished jobs expire after
+    JOB_RETENTION_SECONDS through a TTL index.
+    """
+
+    def __init__(self, db, workers: int = JOB_WORKERS, visibility_seconds: float = JOB_VISIBILITY_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, poll_seconds: float = JOB_POLL_SECONDS):
+        self.db = db
+        self.workers = workers
+        self.visibility_seconds = visibility_seconds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.handlers: Dict[str, JobHandler] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks: List[asyncio.Task] = []
+        self._depth_task: Optional[asyncio.Task] = None
+
+    def handler(self, kind: str) -> Callable[[JobHandler], JobHandler]:
+        def register(handler: JobHandler) -> JobHandler:
+            self.handlers[kind] = handler
+            return handler
+        return register
+
+    async def ensure_indexes(self):
+        await self.db.jobs.create_index('id', unique=True)
+        await self.db.jobs.create_index([('state', 1), ('run_at', 1)])
+        await self.db.jobs.create_index('key', unique=True, partialFilterExpression={'key': {'$type': 'string'}})
+        await self.db.jobs.create_index('expires_at', expireAfterSeconds=0)
+
+    # ---------- producers ----------
+
+    async def enqueue(self, kind: str, payload: dict, key: Optional[str] = None, delay_seconds: float = 0) -> str:
+        """Persist a job and return its id; with a ``key``, an existing job for that key is returned instead."""
+        if kind not in self.handlers:
+            raise ValueError(f'No handler registered for job kind {kind}')
+        now = utcnow()
+        job = {
+            'id': new_id(),
+            'kind': kind,
+            'payload': payload,
+            'state': 'queued',
+            'attempts': 0,
+            'run_at': now + timedelta(seconds=delay_seconds),
+            'created_at': now,
+        }
+        if key is not None:
+            job['key'] = key
+        try:
+            await self.db.jobs.insert_one(job)
+        except DuplicateKeyError:
+            existing = await self.db.jobs.find_one({'key': key}, {'id': 1})
+            if existing is None:
+                # Expired between the insert and the lookup
+                return await self.enqueue(kind, payload, key, delay_seconds)
+            return existing['id']
+        JOBS.inc(kind, 'enqueued')
+        self._wakeup.set()
+        return job['id']
+
+    # ---------- workers ----------
+
+    def start(self):
+        if not self._tasks:
+            self._stopping = False
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+            self._depth_task = asyncio.create_task(self._sample_depth())
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._depth_task is not None:
+            self._depth_task.cancel()
+            self._depth_task = None
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=JOB_SHUTDOWN_GRACE_SECONDS)
+            for task in pending:
+                task.cancel()
+            self._tasks = []
+
+    async def _work(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Job claim failed: {str(e)}")
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._execute(job)
+            except Exception as e:
+                # Only bookkeeping writes get here; the lease runs out and the job runs again
+                logger.error(f"Job {job['id']} bookkeeping failed: {str(e)}")
+
+    async def _claim(self) -> Optional[dict]:
+        now = utcnow()
+        lease = new_id()
+        job = await self.db.jobs.find_one_and_update(
+            {'state': {'$in': ['queued', 'running']}, 'run_at': {'$lte': now}},
+            {'$set': {'state': 'running', 'run_at': now + timedelta(seconds=self.visibility_seconds), 'lease': lease},
+             '$inc': {'attempts': 1}},
+            sort=[('run_at', 1)],
+            return_document=ReturnDocument.BEFORE,
+        )
+        if job is None:
+            return None
+        # The document as claimed, keeping the due time it had for the wait metric
+        JOB_QUEUE_WAIT.observe(max(0.0, (now - parse_timestamp(job['run_at'])).total_seconds()), job['kind'])
+        job.update(attempts=job['attempts'] + 1, lease=lease)
+        return job
+
+    async def _execute(self, job: dict):
+        kind = job['kind']
+        started = time.perf_counter()
+        try:
+            if job['attempts'] > self.max_attempts:
+                # Its previous worker never finished it within the visibility timeout
+                raise TimeoutError('Job lease expired too many times')
+            handler = self.handlers.get(kind)
+            if handler is None:
+                raise LookupError(f'No handler registered for job kind {kind}')
+            await asyncio.wait_for(handler(job['payload']), timeout=self.visibility_seconds)
+        except Exception as e:
+            JOB_DURATION.observe(time.perf_counter() - started, kind)
+            await self._failed(job, e)
+            return
+        JOB_DURATION.observe(time.perf_counter() - started, kind)
+        now = utcnow()
+        await self.db.jobs.update_one(
+            {'id': job['id'], 'lease': job['lease']},
+            {'$set': {'state': 'done', 'finished_at': now, 'expires_at': now + timedelta(seconds=JOB_RETENTION_SECONDS)},
+             '$unset': {'lease': '', 'last_error': ''}}
+        )
+        JOBS.inc(kind, 'done')
+
+    async def _failed(self, job: dict, error: Exception):
+        error_text = f'{type(error).__name__}: {error}'
+        if job['attempts'] >= self.max_attempts:
+            logger.error(f"Job {job['id']} ({job['kind']}) failed for good after {job['attempts']} attempts: {error_text}")
+            update = {'$set': {'state': 'failed', 'finished_at': utcnow(), 'last_error': error_text}, '$unset': {'lease': ''}}
+            outcome = 'failed'
+        else:
+            logger.warning(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed, retrying: {error_text}")
+            run_at = utcnow() + timedelta(seconds=backoff_seconds(job['attempts']))
+            update = {'$set': {'state': 'queued', 'run_at': run_at, 'last_error': error_text}, '$unset': {'lease': ''}}
+            outcome = 'retried'
+        try:
+            await self.db.jobs.update_one({'id': job['id'], 'lease': job['lease']}, update)
+        except Exception as e:
+            # The lease runs out and the job is picked up again
+            logger.error(f"Recording the failure of job {job['id']} failed: {str(e)}")
+        JOBS.inc(job['kind'], outcome)
+
+    # ---------- depth ----------
+
+    async def depth(self) -> Dict[str, Dict[str, int]]:
+        """kind -> state -> number of jobs, for queued, running and failed jobs."""
+        groups = await self.db.jobs.aggregate([
+            {'$match': {'state': {'$in': list(JOB_STATES)}}},
+            {'$group': {'_id': {'kind': '$kind', 'state': '$state'}, 'count': {'$sum': 1}}},
+        ]).to_list(None)
+        counts: Dict[str, Dict[str, int]] = {kind: {state: 0 for state in JOB_STATES} for kind in self.handlers}
+        for group in groups:
+            counts.setdefault(group['_id']['kind'], {state: 0 for state in JOB_STATES})[group['_id']['state']] = group['count']
+        return counts
+
+    async def _sample_depth(self):
+        while True:
+            try:
+                for kind, states in (await self.depth()).items():
+                    for state, count in states.items():
+                        JOB_QUEUE_DEPTH.set(kind, state, value=count)
+            except Exception as e:
+                logger.error(f"Job queue depth sampling failed: {str(e)}")
+            await asyncio.sleep(JOB_DEPTH_INTERVAL_SECONDS)
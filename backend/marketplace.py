@@ -0,0 +1,85 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from pagination import before_clause
+
+# Full facet recount interval; create_product keeps the counts current in between
+FACET_RECONCILE_SECONDS = 600
+
+# sort name -> (field, descending)
+PRODUCT_SORTS = {
+    'newest': ('created_at', True),
+    'price_asc': ('price', False),
+    'price_desc': ('price', True),
+    'best_selling': ('sales_count', True),
+}
+
+
+class ProductCatalog:
+    """Marketplace browse queries and cached category facet counts.
+
+    Every sort is keyset-paginated on ``(field, id)`` and backed by a compound
+    index, with and without a leading ``category``. Facet counts come from one
+    ``$group`` aggregation, are cached in memory and bumped by ``record``.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.category_counts: Optional[Dict[str, int]] = None
+        self.counted_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def ensure_indexes(self):
+        for field in {field for field, _ in PRODUCT_SORTS.values()}:
+            await self.db.products.create_index([(field, -1), ('id', -1)])
+            await self.db.products.create_index([('category', 1), (field, -1), ('id', -1)])
+        await self.db.products.create_index('id', unique=True)
+
+    def browse_query(self, category: Optional[str], min_price: Optional[float], max_price: Optional[float],
+                     sort: str, position: Optional[list]) -> dict:
+        if sort not in PRODUCT_SORTS:
+            raise HTTPException(status_code=400, detail=f"Invalid sort, expected one of: {', '.join(PRODUCT_SORTS)}")
+        field, descending = PRODUCT_SORTS[sort]
+
+        query = {}
+        if category:
+            query['category'] = category
+        price = {}
+        if min_price is not None:
+            price['$gte'] = min_price
+        if max_price is not None:
+            price['$lte'] = max_price
+        if price:
+            query['price'] = price
+        if position:
+            query.update(before_clause(field, position[0], 'id', position[1], descending=descending))
+        return query
+
+    def sort_spec(self, sort: str) -> List[tuple]:
+        field, descending = PRODUCT_SORTS[sort]
+        direction = -1 if descending else 1
+        return [(field, direction), ('id', direction)]
+
+    def cursor_values(self, product: dict, sort: str) -> list:
+        field, _ = PRODUCT_SORTS[sort]
+        return [product.get(field), product['id']]
+
+    async def get_category_counts(self) -> List[dict]:
+        if self.category_counts is None or time.monotonic() - self.counted_at > FACET_RECONCILE_SECONDS:
+            async with self._lock:
+                if self.category_counts is None or time.monotonic() - self.counted_at > FACET_RECONCILE_SECONDS:
+                    groups = await self.db.products.aggregate([
+                        {'$group': {'_id': '$category', 'count': {'$sum': 1}}},
+                    ]).to_list(None)
+                    self.category_counts = {g['_id']: g['count'] for g in groups if g['_id'] is not None}
+                    self.counted_at = time.monotonic()
+
+        counts = sorted(self.category_counts.items(), key=lambda item: (-item[1], item[0]))
+        return [{'category': category, 'count': count} for category, count in counts]
+
+    def record(self, category: str, delta: int = 1):
+        if self.category_counts is not None:
+            self.category_counts[category] = self.category_counts.get(category, 0) + delta
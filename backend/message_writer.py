@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# How long a queued insert may wait for others to join its batch
+WRITE_BATCH_DELAY_MS = 5
+WRITE_BATCH_MAX_SIZE = 500
+# Queued inserts beyond this make callers wait, then fail with 503
+WRITE_QUEUE_MAX_SIZE = 10000
+WRITE_QUEUE_WAIT_SECONDS = 2.0
+
+
+class MessageWriter:
+    """Group commit for message inserts.
+
+    With batching enabled, ``insert`` queues the document and waits; a single
+    flusher task collects whatever arrives within WRITE_BATCH_DELAY_MS (up to
+    WRITE_BATCH_MAX_SIZE documents) and writes it with one unordered
+    ``insert_many``. Each caller resumes only once its own document is
+    acknowledged, or gets its own write error. A full queue blocks callers for
+    up to WRITE_QUEUE_WAIT_SECONDS before they are turned away with a 503.
+    """
+
+    def __init__(self, db, batching: bool = False, delay_ms: float = WRITE_BATCH_DELAY_MS,
+                 max_batch: int = WRITE_BATCH_MAX_SIZE, max_queue: int = WRITE_QUEUE_MAX_SIZE):
+        self.db = db
+        self.batching = batching
+        self.delay = delay_ms / 1000
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.batching and self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush what is already queued, then stop the flusher."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        self._task = None
+
+    async def insert(self, collection: str, doc: dict):
+        if self._task is None:
+            await self.db[collection].insert_one(doc)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._queue.put((collection, doc, future)), WRITE_QUEUE_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail='Message queue is full, try again shortly',
+                                headers={'Retry-After': '1'})
+        await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[Tuple[str, dict, asyncio.Future]]):
+        by_collection = {}
+        for item in batch:
+            by_collection.setdefault(item[0], []).append(item)
+
+        for collection, items in by_collection.items():
+            errors = {}
+            try:
+                await self.db[collection].insert_many([doc for _, doc, _ in items], ordered=False)
+            except BulkWriteError as e:
+                for err in e.details.get('writeErrors', []):
+                    errors[err['index']] = err
+            except Exception as e:
+                logger.error(f"Batched insert into {collection} failed: {str(e)}")
+                errors = {index: e for index in range(len(items))}
+
+            for index, (_, _, future) in enumerate(items):
+                if future.done():
+                    continue
+                error = errors.get(index)
+                if error is None:
+                    future.set_result(None)
+                elif isinstance(error, Exception):
+                    future.set_exception(error)
+                else:
+                    future.set_exception(BulkWriteError({'writeErrors': [error]}))
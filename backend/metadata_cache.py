@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from metrics import METADATA_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+METADATA_CACHE_SERVERS = 5000
+METADATA_CACHE_CHANNELS = 50000
+# Entries are served as-is while fresh, then served stale while a background reload runs
+METADATA_FRESH_SECONDS = 30
+METADATA_STALE_SECONDS = 300
+
+
+class ServerEntry:
+    __slots__ = ('server', 'channels', 'version', 'loaded_at')
+
+    def __init__(self, server: dict, channels: List[dict], version: int):
+        self.server = server
+        self.channels = channels
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+
+class MetadataCache:
+    """In-process cache of server documents and their channel lists.
+
+    Every server has a version stamp that ``bump`` increments whenever this
+    process changes the server or its channels; an entry loaded under an
+    older version is never served again, and a load that raced with a bump
+    is discarded. Entries older than METADATA_FRESH_SECONDS are still served
+    while one background reload per server refreshes them, which covers
+    changes made by other processes. Loads are single-flight, so a read
+    spike on a cold server costs one pair of queries.
+    """
+
+    def __init__(self, db, max_servers: int = METADATA_CACHE_SERVERS, max_channels: int = METADATA_CACHE_CHANNELS,
+                 fresh_seconds: float = METADATA_FRESH_SECONDS, stale_seconds: float = METADATA_STALE_SECONDS):
+        self.db = db
+        self.max_servers = max_servers
+        self.max_channels = max_channels
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.entries: 'OrderedDict[str, ServerEntry]' = OrderedDict()
+        # channel id -> server id
+        self.channel_servers: 'OrderedDict[str, str]' = OrderedDict()
+        self.versions: Dict[str, int] = {}
+        # server id -> (version the load started under, future)
+        self._loading: Dict[str, Tuple[int, asyncio.Future]] = {}
+
+    def bump(self, server_id: str):
+        self.entries.pop(server_id, None)
+        if server_id in self._loading:
+            self.versions[server_id] = self.versions.get(server_id, 0) + 1
+        else:
+            # Stamps only need to outlive cached entries and in-flight loads
+            self.versions.pop(server_id, None)
+
+    async def get_server(self, server_id: str) -> Optional[dict]:
+        entry = await self._entry(server_id)
+        return dict(entry.server) if entry else None
+
+    async def get_channels(self, server_id: str) -> List[dict]:
+        entry = await self._entry(server_id)
+        return [dict(channel) for channel in entry.channels] if entry else []
+
+    async def get_channel(self, channel_id: str) -> Optional[dict]:
+        server_id = self.channel_servers.get(channel_id)
+        if server_id is not None:
+            channel = self._find_channel(await self._entry(server_id), channel_id)
+            if channel is not None:
+                return channel
+            self.channel_servers.pop(channel_id, None)
+
+        found = await self.db.channels.find_one({'id': channel_id}, {'_id': 0, 'server_id': 1})
+        if found is None:
+            return None
+        channel = self._find_channel(await self._entry(found['server_id']), channel_id)
+        if channel is None:
+            # Created by another process after the entry was loaded
+            self.bump(found['server_id'])
+            channel = self._find_channel(await self._entry(found['server_id']), channel_id)
+        return channel
+
+    def _find_channel(self, entry: Optional[ServerEntry], channel_id: str) -> Optional[dict]:
+        for channel in entry.channels if entry else []:
+            if channel['id'] == channel_id:
+                self._remember_channel(channel_id, entry.server['id'])
+                return dict(channel)
+        return None
+
+    async def _entry(self, server_id: str) -> Optional[ServerEntry]:
+        entry = self.entries.get(server_id)
+        if entry is not None and entry.version == self.versions.get(server_id, 0):
+            age = time.monotonic() - entry.loaded_at
+            if age < self.fresh_seconds + self.stale_seconds:
+                self.entries.move_to_end(server_id)
+                if age < self.fresh_seconds:
+                    METADATA_CACHE_LOOKUPS.inc('hit')
+                else:
+                    METADATA_CACHE_LOOKUPS.inc('stale')
+                    self._load(server_id)
+                return entry
+
+        METADATA_CACHE_LOOKUPS.inc('miss')
+        # Shielded so a cancelled request doesn't cancel the load other requests share
+        return await asyncio.shield(self._load(server_id))
+
+    def _load(self, server_id: str) -> asyncio.Future:
+        version = self.versions.get(server_id, 0)
+        loading = self._loading.get(server_id)
+        # A load that started before the latest bump can't be shared with readers after it
+        if loading is not None and loading[0] == version:
+            return loading[1]
+        future = asyncio.ensure_future(self._fetch(server_id, version))
+        self._loading[server_id] = (version, future)
+        future.add_done_callback(lambda f: self._loaded(server_id, f))
+        return future
+
+    def _loaded(self, server_id: str, future: asyncio.Future):
+        loading = self._loading.get(server_id)
+        if loading is not None and loading[1] is future:
+            del self._loading[server_id]
+            if server_id not in self.entries:
+                self.versions.pop(server_id, None)
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Metadata load for server {server_id} failed: {str(future.exception())}")
+
+    async def _fetch(self, server_id: str, version: int) -> Optional[ServerEntry]:
+        server = await self.db.servers.find_one({'id': server_id}, {'_id': 0})
+        if server is None:
+            self.entries.pop(server_id, None)
+            return None
+        channels = await self.db.channels.find({'server_id': server_id}, {'_id': 0}).to_list(100)
+
+        entry = ServerEntry(server, channels, version)
+        if version != self.versions.get(server_id, 0):
+            # Bumped while loading; serve this caller but don't cache what may predate the change
+            return entry
+        self.entries[server_id] = entry
+        self.entries.move_to_end(server_id)
+        for channel in channels:
+            self._remember_channel(channel['id'], server_id)
+        while len(self.entries) > self.max_servers:
+            evicted, _ = self.entries.popitem(last=False)
+            if evicted not in self._loading:
+                self.versions.pop(evicted, None)
+        return entry
+
+    def _remember_channel(self, channel_id: str, server_id: str):
+        self.channel_servers[channel_id] = server_id
+        self.channel_servers.move_to_end(channel_id)
+        while len(self.channel_servers) > self.max_channels:
+            self.channel_servers.popitem(last=False)
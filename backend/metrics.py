@@ -0,0 +1,291 @@
+import asyncio
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Background jobs wait and run far longer than requests
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+LOOP_LAG_INTERVAL_SECONDS = 0.5
+
+
+def escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self.values.items())
+        return self.header() + [f'{self.name}{format_labels(self.label_names, labels)} {value}' for labels, value in items]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, *labels: str, value: float):
+        with self._lock:
+            self.values[labels] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self.series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(series[0]), series[1], series[2]) for labels, series in self.series.items()]
+        lines = self.header()
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{format_labels(self.label_names, labels, ("le", le))} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.label_names, labels)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.label_names, labels)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template.', ('method', 'route')))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'http_requests_total', 'HTTP responses by route template and status code.', ('method', 'route', 'status')))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    'http_requests_in_flight', 'HTTP requests currently being served.'))
+MONGO_COMMAND_DURATION = REGISTRY.register(Histogram(
+    'mongo_command_duration_seconds', 'MongoDB command latency by collection and command.', ('collection', 'command')))
+MONGO_COMMAND_FAILURES = REGISTRY.register(Counter(
+    'mongo_command_failures_total', 'Failed MongoDB commands by collection and command.', ('collection', 'command')))
+MONGO_POOL_CHECKOUT_WAIT = REGISTRY.register(Histogram(
+    'mongo_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.', ('address',)))
+MONGO_POOL_CHECKED_OUT = REGISTRY.register(Gauge(
+    'mongo_pool_connections_checked_out', 'Pooled connections currently checked out.', ('address',)))
+MONGO_POOL_CHECKOUT_FAILURES = REGISTRY.register(Counter(
+    'mongo_pool_checkout_failures_total', 'Connection checkouts that failed, by reason.', ('address', 'reason')))
+EVENT_LOOP_LAG = REGISTRY.register(Histogram(
+    'event_loop_lag_seconds', 'Delay between a scheduled wakeup and the loop running it.'))
+METADATA_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'metadata_cache_lookups_total', 'Server metadata cache lookups by result (hit, stale, miss).', ('result',)))
+AUTHZ_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'authz_cache_lookups_total', 'Membership cache lookups by result (hit, miss, recheck).', ('result',)))
+JOBS = REGISTRY.register(Counter(
+    'jobs_total', 'Background jobs by kind and outcome (enqueued, done, retried, failed).', ('kind', 'outcome')))
+JOB_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'job_queue_depth', 'Background jobs by kind and state (queued, running, failed), sampled periodically.', ('kind', 'state')))
+JOB_QUEUE_WAIT = REGISTRY.register(Histogram(
+    'job_queue_wait_seconds', 'Time from a job being due to a worker claiming it.', ('kind',), buckets=JOB_BUCKETS))
+JOB_DURATION = REGISTRY.register(Histogram(
+    'job_duration_seconds', 'Background job run time by kind.', ('kind',), buckets=JOB_BUCKETS))
+SINGLE_FLIGHT_CALLS = REGISTRY.register(Counter(
+    'single_flight_calls_total', 'Coalesced reads by name and role (leader ran the load, shared awaited it).', ('name', 'role')))
+REQUESTS_SHED = REGISTRY.register(Counter(
+    'requests_shed_total', 'Requests turned away by route and reason (rate_user, rate_ip, concurrency).', ('route', 'reason')))
+ADMISSION_IN_FLIGHT = REGISTRY.register(Gauge(
+    'admission_in_flight', 'Requests holding an admission slot, by route class.', ('route_class',)))
+
+
+def command_collection(command_name: str, command: dict) -> str:
+    if command_name == 'getMore':
+        return command.get('collection', '')
+    target = command.get(command_name)
+    return target if isinstance(target, str) else ''
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Per-collection, per-command timings taken from pymongo command events."""
+
+    def __init__(self):
+        # (connection_id, request_id) -> collection, from started until finished
+        self.in_flight: Dict[tuple, str] = {}
+
+    def started(self, event):
+        self.in_flight[(event.connection_id, event.request_id)] = command_collection(event.command_name, event.command)
+
+    def succeeded(self, event):
+        collection = self.in_flight.pop((event.connection_id, event.request_id), '')
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, collection, event.command_name)
+
+    def failed(self, event):
+        collection = self.in_flight.pop((event.connection_id, event.request_id), '')
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, collection, event.command_name)
+        MONGO_COMMAND_FAILURES.inc(collection, event.command_name)
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection checkout waits; pymongo checks out on the calling executor thread."""
+
+    def __init__(self):
+        self.local = threading.local()
+        self.checked_out: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _address(self, event) -> str:
+        return '%s:%s' % event.address
+
+    def _adjust(self, address: str, delta: int):
+        with self._lock:
+            count = self.checked_out.get(address, 0) + delta
+            self.checked_out[address] = count
+            MONGO_POOL_CHECKED_OUT.set(address, value=count)
+
+    def connection_check_out_started(self, event):
+        self.local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self.local, 'started', None)
+        if started is not None:
+            MONGO_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, self._address(event))
+            self.local.started = None
+        self._adjust(self._address(event), 1)
+
+    def connection_check_out_failed(self, event):
+        self.local.started = None
+        MONGO_POOL_CHECKOUT_FAILURES.inc(self._address(event), str(event.reason))
+
+    def connection_checked_in(self, event):
+        self._adjust(self._address(event), -1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+
+def mongo_event_listeners() -> list:
+    return [MongoCommandMetrics(), MongoPoolMetrics()]
+
+
+class MetricsMiddleware:
+    """Per-route latency and status counts, labelled by route template to bound cardinality."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(amount=1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.inc(amount=-1)
+            route = scope.get('route')
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            HTTP_REQUEST_DURATION.observe(elapsed, scope['method'], route_path)
+            HTTP_REQUESTS.inc(scope['method'], route_path, str(status))
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG.observe(max(0.0, loop.time() - started - self.interval))
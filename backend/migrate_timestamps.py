@@ -0,0 +1,164 @@
+"""Online migration of ISO string timestamps to native BSON dates.
+
+Documents written before ``ids.py`` store ``created_at`` and friends as ISO
+strings. This rewrites them in place, a batch at a time, while the API keeps
+running: readers accept both forms, and each update is guarded on the old
+value so a concurrent write is never overwritten.
+
+Each field is converted newest first. Mongo sorts all strings before all
+dates, so as long as every string is older than every date (new writes are
+dates, and the migration eats into the strings from the newest end) mixed
+collections still sort in time order. Re-running continues where a previous
+run stopped; values that can't be parsed are left as they are and reported.
+
+Document ids are not rewritten: they are referenced across collections and
+by clients, and only new documents get time-ordered ids.
+
+CLI (uses MONGO_URL / DB_NAME like the server):
+
+    python migrate_timestamps.py [--collections messages,reels] [--batch-size 500] [--pause 0.05] [--dry-run]
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from ids import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = 500
+# Pause between batches, so the migration doesn't crowd out API traffic
+MIGRATION_PAUSE_SECONDS = 0.05
+# Name of the temporary index used to walk a field newest first
+MIGRATION_INDEX_PREFIX = 'migrate_timestamps_'
+
+# collection -> timestamp fields
+TIMESTAMP_FIELDS = {
+    'messages': ('created_at',),
+    'dm_messages': ('created_at',),
+    'message_buckets': ('first_created_at', 'last_created_at', 'window_start'),
+    'dms': ('created_at',),
+    'users': ('created_at',),
+    'servers': ('created_at',),
+    'channels': ('created_at',),
+    'read_states': ('last_read_at', 'updated_at'),
+    'reels': ('created_at',),
+    'reel_timelines': ('created_at',),
+    'reel_comments': ('created_at',),
+    'forum_categories': ('created_at',),
+    'forum_posts': ('created_at',),
+    'forum_replies': ('created_at',),
+    'products': ('created_at',),
+    'studio_projects': ('created_at', 'updated_at'),
+    'asset_versions': ('created_at',),
+    'asset_chunks': ('created_at',),
+    'trending': ('updated_at',),
+    'discovery': ('built_at',),
+}
+
+
+async def count_pending(db, collection: str, field: str) -> int:
+    return await db[collection].count_documents({field: {'$type': 'string'}})
+
+
+async def _walk_index(db, collection: str, field: str) -> Optional[str]:
+    """Create a descending index on ``field`` unless one already leads with it; returns the name to drop after."""
+    for index in (await db[collection].index_information()).values():
+        if index['key'][0][0] == field:
+            return None
+    name = MIGRATION_INDEX_PREFIX + field
+    await db[collection].create_index([(field, -1)], name=name)
+    return name
+
+
+async def migrate_field(db, collection: str, field: str, batch_size: int = MIGRATION_BATCH_SIZE,
+                        pause: float = MIGRATION_PAUSE_SECONDS) -> Dict[str, int]:
+    """Convert every string ``field`` of a collection, newest first."""
+    stats = {'converted': 0, 'unparseable': 0}
+    skipped: List = []
+    temporary_index = await _walk_index(db, collection, field)
+    try:
+        while True:
+            query = {field: {'$type': 'string'}}
+            if skipped:
+                query['_id'] = {'$nin': skipped}
+            docs = await db[collection].find(query, {'_id': 1, field: 1}).sort(field, -1).limit(batch_size).to_list(batch_size)
+            if not docs:
+                return stats
+
+            operations = []
+            for doc in docs:
+                try:
+                    moment = parse_timestamp(doc[field])
+                except ValueError:
+                    skipped.append(doc['_id'])
+                    stats['unparseable'] += 1
+                    logger.warning(f"{collection}.{field} of {doc['_id']} is not a timestamp: {doc[field]!r}")
+                    continue
+                # Guarded on the old value, so a document rewritten since the read is left alone
+                operations.append(UpdateOne({'_id': doc['_id'], field: doc[field]}, {'$set': {field: moment}}))
+            if operations:
+                result = await db[collection].bulk_write(operations, ordered=False)
+                stats['converted'] += result.modified_count
+            await asyncio.sleep(pause)
+    finally:
+        if temporary_index:
+            await db[collection].drop_index(temporary_index)
+
+
+async def migrate(db, collections: Optional[Iterable[str]] = None, batch_size: int = MIGRATION_BATCH_SIZE,
+                  pause: float = MIGRATION_PAUSE_SECONDS, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+    results = {}
+    for collection in collections or TIMESTAMP_FIELDS:
+        for field in TIMESTAMP_FIELDS[collection]:
+            key = f'{collection}.{field}'
+            if dry_run:
+                results[key] = {'pending': await count_pending(db, collection, field)}
+                continue
+            results[key] = await migrate_field(db, collection, field, batch_size, pause)
+            if results[key]['converted'] or results[key]['unparseable']:
+                logger.info(f"{key}: converted {results[key]['converted']}, unparseable {results[key]['unparseable']}")
+    return results
+
+
+async def _cli(argv: Iterable[str]):
+    import argparse
+    import os
+    from pathlib import Path
+
+    import certifi
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description='Rewrite ISO string timestamps as native dates, newest first.')
+    parser.add_argument('--collections', help=f"Comma separated subset of: {', '.join(TIMESTAMP_FIELDS)}")
+    parser.add_argument('--batch-size', type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=MIGRATION_PAUSE_SECONDS, help='Seconds to sleep between batches')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the string timestamps left')
+    args = parser.parse_args(list(argv))
+
+    collections = args.collections.split(',') if args.collections else None
+    unknown = [c for c in collections or [] if c not in TIMESTAMP_FIELDS]
+    if unknown:
+        parser.error(f"Unknown collections: {', '.join(unknown)}")
+
+    root_dir = Path(__file__).parent
+    env_path = root_dir / '.env'
+    load_dotenv(env_path if env_path.exists() else root_dir.parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tlsCAFile=certifi.where(), serverSelectionTimeoutMS=5000, tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        results = await migrate(db, collections, args.batch_size, args.pause, args.dry_run)
+        for key, stats in results.items():
+            print(f"{key}: {', '.join(f'{name} {count}' for name, count in stats.items())}")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    import sys
+    asyncio.run(_cli(sys.argv[1:]))
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ids import new_id, utcnow
+from pagination import before_clause
+
+logger = logging.getLogger(__name__)
+
+# Events for the same recipient and target within this window become one write
+NOTIFICATION_COALESCE_SECONDS = 5.0
+# Pending groups that trigger a flush before the window is up
+NOTIFICATION_PENDING_MAX = 10000
+# Most recent actors kept on a notification ("alice, bob and 10 others")
+NOTIFICATION_ACTORS_SHOWN = 3
+NOTIFICATION_PREVIEW_LENGTH = 140
+
+AUTHOR_FIELDS = {'_id': 0, 'id': 1, 'username': 1, 'avatar': 1}
+
+
+def notification_group(kind: str, target: dict) -> str:
+    return f"{kind}:{target['type']}:{target['id']}"
+
+
+class NotificationInbox:
+    """Per-user notification inbox with coalesced writes and an unread counter.
+
+    ``notify`` only touches memory: events are grouped by recipient, kind and
+    target, so twelve likes on a reel inside one NOTIFICATION_COALESCE_SECONDS
+    window become one pending entry with twelve actors. A flusher upserts the
+    pending groups with one unordered bulk write into ``notifications``. A
+    group that still has an unread notification is merged into it (actor
+    count bumped, moved back to the top); otherwise a new one is created and
+    the recipient's counter in ``notification_counters`` is incremented, so
+    the unread badge is a single document read.
+
+    Inboxes page newest first on ``(updated_at, id)``. ``actor_count``
+    counts distinct actors per window, so someone who likes, unlikes and
+    likes again in different windows is counted twice.
+    """
+
+    def __init__(self, db, window_seconds: float = NOTIFICATION_COALESCE_SECONDS):
+        self.db = db
+        self.window_seconds = window_seconds
+        # (recipient id, group) -> coalesced events not yet written
+        self.pending: Dict[Tuple[str, str], dict] = {}
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        await self.db.notifications.create_index([('user_id', 1), ('updated_at', -1), ('id', -1)])
+        # At most one unread notification per group, which new events merge into
+        await self.db.notifications.create_index(
+            [('user_id', 1), ('group', 1)], unique=True, partialFilterExpression={'read': False})
+        await self.db.notifications.create_index('id', unique=True)
+        await self.db.notification_counters.create_index('user_id', unique=True)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write what is still pending, then stop the flusher."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.window_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Notification flush failed: {str(e)}")
+
+    # ---------- writes ----------
+
+    def notify(self, user_id: str, kind: str, actor_id: str, target: dict, preview: Optional[str] = None):
+        """Queue a notification for ``user_id``; ``target`` is ``{'type', 'id', ...}`` and identifies the group."""
+        if not user_id or user_id == actor_id:
+            return
+        group = notification_group(kind, target)
+        now = utcnow()
+        entry = self.pending.get((user_id, group))
+        if entry is None:
+            entry = self.pending[(user_id, group)] = {
+                'user_id': user_id, 'kind': kind, 'group': group, 'target': target,
+                'actor_ids': [], 'first_at': now,
+            }
+            if len(self.pending) >= NOTIFICATION_PENDING_MAX:
+                self._full.set()
+        if actor_id in entry['actor_ids']:
+            entry['actor_ids'].remove(actor_id)
+        entry['actor_ids'].append(actor_id)
+        entry['last_at'] = now
+        if preview is not None:
+            entry['preview'] = preview[:NOTIFICATION_PREVIEW_LENGTH]
+
+    async def flush(self) -> int:
+        if not self.pending:
+            return 0
+        entries, self.pending = list(self.pending.values()), {}
+        operations = [self._upsert(entry) for entry in entries]
+        upserted: List[int] = []
+        try:
+            result = await self.db.notifications.bulk_write(operations, ordered=False)
+            upserted = list(result.upserted_ids)
+        except BulkWriteError as e:
+            # Another process created the group's unread notification first; merge into it next time
+            retry = {err['index'] for err in e.details.get('writeErrors', []) if err.get('code') == 11000}
+            if len(retry) < len(e.details.get('writeErrors', [])):
+                logger.error(f"Notification flush lost {len(e.details['writeErrors']) - len(retry)} groups")
+            for index in retry:
+                self._requeue(entries[index])
+            upserted = [u['index'] for u in e.details.get('upserted', [])]
+        except BaseException:
+            for entry in entries:
+                self._requeue(entry)
+            raise
+
+        created: Dict[str, int] = {}
+        for index in upserted:
+            user_id = entries[index]['user_id']
+            created[user_id] = created.get(user_id, 0) + 1
+        if created:
+            await self.db.notification_counters.bulk_write([
+                UpdateOne({'user_id': user_id}, {'$inc': {'unread': count}}, upsert=True)
+                for user_id, count in created.items()
+            ], ordered=False)
+        return len(entries)
+
+    def _upsert(self, entry: dict) -> UpdateOne:
+        update = {
+            '$setOnInsert': {
+                'id': new_id(), 'kind': entry['kind'], 'target': entry['target'], 'created_at': entry['first_at'],
+            },
+            '$set': {'updated_at': entry['last_at']},
+            '$inc': {'actor_count': len(entry['actor_ids'])},
+            '$push': {'actor_ids': {
+                '$each': list(reversed(entry['actor_ids'])), '$position': 0, '$slice': NOTIFICATION_ACTORS_SHOWN}},
+        }
+        if 'preview' in entry:
+            update['$set']['preview'] = entry['preview']
+        return UpdateOne({'user_id': entry['user_id'], 'group': entry['group'], 'read': False}, update, upsert=True)
+
+    def _requeue(self, entry: dict):
+        key = (entry['user_id'], entry['group'])
+        newer = self.pending.get(key)
+        if newer is None:
+            self.pending[key] = entry
+            return
+        # Events that arrived during the flush go after the requeued ones
+        newer['actor_ids'] = [a for a in entry['actor_ids'] if a not in newer['actor_ids']] + newer['actor_ids']
+        newer['first_at'] = entry['first_at']
+        if 'preview' in entry:
+            newer.setdefault('preview', entry['preview'])
+
+    async def mark_read(self, user_id: str, notification_ids: Optional[List[str]] = None) -> int:
+        """Mark the given notifications (or all of them) read; returns the new unread count."""
+        query = {'user_id': user_id, 'read': False}
+        if notification_ids is not None:
+            query['id'] = {'$in': notification_ids}
+        result = await self.db.notifications.update_many(query, {'$set': {'read': True}})
+        if notification_ids is None:
+            await self.db.notification_counters.update_one({'user_id': user_id}, {'$set': {'unread': 0}}, upsert=True)
+        elif result.modified_count:
+            await self.db.notification_counters.update_one({'user_id': user_id}, {'$inc': {'unread': -result.modified_count}})
+            await self.db.notification_counters.update_one({'user_id': user_id, 'unread': {'$lt': 0}}, {'$set': {'unread': 0}})
+        return await self.unread_count(user_id)
+
+    # ---------- reads ----------
+
+    async def unread_count(self, user_id: str) -> int:
+        counter = await self.db.notification_counters.find_one({'user_id': user_id}, {'_id': 0, 'unread': 1})
+        return counter['unread'] if counter else 0
+
+    async def page(self, user_id: str, limit: int, position: Optional[list]) -> Tuple[List[dict], Optional[list]]:
+        """Newest-first notifications with their latest actors hydrated, plus the next page position."""
+        query = {'user_id': user_id}
+        if position:
+            query.update(before_clause('updated_at', position[0], 'id', position[1]))
+        notifications = await self.db.notifications.find(query, {'_id': 0, 'user_id': 0, 'group': 0}).sort(
+            [('updated_at', -1), ('id', -1)]).limit(limit + 1).to_list(limit + 1)
+        next_position = None
+        if len(notifications) > limit:
+            notifications = notifications[:limit]
+            next_position = [notifications[-1]['updated_at'], notifications[-1]['id']]
+
+        actor_ids = list({actor_id for n in notifications for actor_id in n.get('actor_ids', [])})
+        actors = {a['id']: a for a in await self.db.users.find({'id': {'$in': actor_ids}}, AUTHOR_FIELDS).to_list(len(actor_ids))}
+        for notification in notifications:
+            shown = list(dict.fromkeys(notification.pop('actor_ids', [])))
+            notification['actors'] = [actors[actor_id] for actor_id in shown if actor_id in actors]
+        return notifications, next_position
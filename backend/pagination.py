@@ -0,0 +1,61 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi import HTTPException
+
+from ids import format_timestamp, parse_timestamp
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(list(values), separators=(',', ':'), default=format_timestamp).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    return values
+
+
+def is_time_field(field: str) -> bool:
+    return field.endswith('_at')
+
+
+def time_bounds(value: Any) -> tuple:
+    """(BSON date, ISO string) forms of a timestamp, for fields that may still hold either."""
+    try:
+        moment = parse_timestamp(value)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    return moment, value if isinstance(value, str) else format_timestamp(moment)
+
+
+def time_clause(field: str, op: str, value: Any) -> dict:
+    # Mongo only compares values of the same type, so a bound has to be given as a date and as a string
+    moment, text = time_bounds(value)
+    return {'$or': [{field: {op: moment}}, {field: {op: text}}]}
+
+
+def before_clause(field: str, value: Any, tie_field: str, tie_value: Any, descending: bool = True) -> dict:
+    # Keyset condition for a (field, tie_field) sort, strictly after the cursor position
+    op = '$lt' if descending else '$gt'
+    if isinstance(value, datetime) or is_time_field(field):
+        moment, text = time_bounds(value)
+        return {'$or': [
+            {field: {op: moment}},
+            {field: {op: text}},
+            {field: {'$in': [moment, text]}, tie_field: {op: tie_value}},
+        ]}
+    return {'$or': [
+        {field: {op: value}},
+        {field: value, tie_field: {op: tie_value}},
+    ]}
@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Commands that can be wrapped in an explain when they turn out to be the slowest
+EXPLAINABLE_COMMANDS = {'find', 'aggregate', 'count', 'distinct', 'update', 'delete', 'findAndModify'}
+
+_current_profile: ContextVar[Optional['QueryProfile']] = ContextVar('query_profile', default=None)
+_recorded = itertools.count()
+
+
+class QueryProfile:
+    """Mongo commands issued within one request (or one ``capture_queries`` block).
+
+    Motor copies the context into its executor threads, so command events are
+    attributed through a ContextVar. Profiles nest: a command counts towards
+    the active profile and every profile enclosing it.
+    """
+
+    def __init__(self, parent: Optional['QueryProfile'] = None):
+        self.parent = parent
+        self.count = 0
+        self.db_time = 0.0
+        self.slowest: Optional[Tuple[float, str, dict]] = None
+        self.pending: Dict[tuple, Tuple[str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, key: tuple, database: str, command: dict):
+        with self._lock:
+            self.pending[key] = (database, command)
+        if self.parent:
+            self.parent.started(key, database, command)
+
+    def finished(self, key: tuple, seconds: float):
+        with self._lock:
+            database, command = self.pending.pop(key, ('', {}))
+            self.count += 1
+            self.db_time += seconds
+            if self.slowest is None or seconds > self.slowest[0]:
+                self.slowest = (seconds, database, command)
+        if self.parent:
+            self.parent.finished(key, seconds)
+
+
+class QueryProfiler(monitoring.CommandListener):
+    def started(self, event):
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.started((event.connection_id, event.request_id), event.database_name, event.command)
+
+    def succeeded(self, event):
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.finished((event.connection_id, event.request_id), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+
+def record_query(database: str, command: dict, seconds: float = 0.0):
+    """Count one command on the active profile, for clients without command monitoring (mongomock)."""
+    profile = _current_profile.get()
+    if profile is not None:
+        key = ('recorded', next(_recorded))
+        profile.started(key, database, command)
+        profile.finished(key, seconds)
+
+
+@contextmanager
+def capture_queries():
+    """Collect the Mongo commands issued inside the block into a QueryProfile."""
+    profile = QueryProfile(parent=_current_profile.get())
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = ''):
+    """Fail when the block issues more than ``limit`` Mongo commands.
+
+        with assert_max_queries(3, 'GET /api/reels'):
+            await client.get('/api/reels', headers=headers)
+
+    Counting relies on pymongo command monitoring, or on ``record_query`` for
+    mongomock (see ``benchmarks.common.bench_db``).
+    """
+    with capture_queries() as profile:
+        yield profile
+    if profile.count > limit:
+        raise AssertionError(f"{label or 'Block'} issued {profile.count} queries, expected at most {limit}")
+
+
+def explain_command(command: dict) -> Optional[dict]:
+    name = next(iter(command), None)
+    if name not in EXPLAINABLE_COMMANDS:
+        return None
+    # Session, cluster time and other driver-added fields aren't accepted inside explain
+    inner = {k: v for k, v in command.items() if not k.startswith('$') and k not in ('lsid', 'txnNumber')}
+    return {'explain': inner, 'verbosity': 'queryPlanner'}
+
+
+class ProfilingMiddleware:
+    """Opt-in per-request query counts, exposed as X-Query-Count and X-DB-Time headers.
+
+    Requests slower than ``slow_ms`` or issuing more than ``slow_queries``
+    commands are logged together with the explain plan of their slowest query.
+    """
+
+    def __init__(self, app, client, slow_ms: float = 500, slow_queries: int = 20):
+        self.app = app
+        self.client = client
+        self.slow_ms = slow_ms
+        self.slow_queries = slow_queries
+        self._explain_tasks = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile(parent=_current_profile.get())
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                headers = list(message.get('headers', []))
+                headers.append((b'x-query-count', str(profile.count).encode()))
+                headers.append((b'x-db-time', f'{profile.db_time * 1000:.3f}'.encode()))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms > self.slow_ms or profile.count > self.slow_queries:
+                task = asyncio.create_task(self._log_slow_request(scope, elapsed_ms, profile))
+                self._explain_tasks.add(task)
+                task.add_done_callback(self._explain_tasks.discard)
+
+    async def _log_slow_request(self, scope, elapsed_ms: float, profile: QueryProfile):
+        route = getattr(scope.get('route'), 'path', scope.get('path'))
+        message = (f"Slow request {scope['method']} {route}: {elapsed_ms:.1f}ms, "
+                   f"{profile.count} queries, {profile.db_time * 1000:.1f}ms in Mongo")
+        if profile.slowest is None:
+            logger.warning(message)
+            return
+
+        seconds, database, command = profile.slowest
+        explain = explain_command(command)
+        plan = None
+        if explain and database:
+            try:
+                result = await self.client[database].command(explain)
+                plan = result.get('queryPlanner', {}).get('winningPlan', result.get('queryPlanner'))
+            except Exception as e:
+                plan = f'explain failed: {str(e)}'
+        logger.warning(f"{message}; slowest query {seconds * 1000:.1f}ms {command!r:.500}; plan: {plan}")
@@ -0,0 +1,160 @@
+import asyncio
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+
+from metrics import ADMISSION_IN_FLIGHT, REQUESTS_SHED
+
+
+class Limit(NamedTuple):
+    # Requests allowed back to back, then one more every ``per_seconds``
+    burst: int
+    per_seconds: float
+
+
+# route -> scope ('user' or 'ip') -> budget. For login, 'user' is the account being logged into.
+ROUTE_LIMITS: Dict[str, Dict[str, Limit]] = {
+    'login': {'user': Limit(10, 6), 'ip': Limit(20, 3)},
+    'signup': {'ip': Limit(5, 120)},
+    'upload': {'user': Limit(20, 3), 'ip': Limit(60, 1)},
+    'search': {'user': Limit(30, 0.5), 'ip': Limit(120, 0.1)},
+    'message': {'user': Limit(30, 0.2), 'ip': Limit(300, 0.02)},
+}
+
+# route class -> requests of that class running at once in this process
+ADMISSION_LIMITS: Dict[str, int] = {
+    'auth': 16,
+    'upload': 8,
+    'search': 32,
+    'message': 256,
+}
+ROUTE_CLASSES: Dict[str, str] = {'login': 'auth', 'signup': 'auth', 'upload': 'upload', 'search': 'search', 'message': 'message'}
+# How long a request may wait for a slot before it is turned away
+ADMISSION_WAIT_SECONDS = 0.25
+
+# Buckets kept by the in-memory backend; the least recently used are dropped (and start full again)
+RATE_LIMIT_MAX_KEYS = 100000
+
+
+class RateLimitBackend(ABC):
+    """Where token buckets live.
+
+    ``take`` spends ``cost`` tokens from the bucket for ``key`` (created full,
+    holding up to ``burst`` tokens and refilling at ``rate`` per second) and
+    returns 0, or leaves the bucket alone and returns the seconds until
+    enough tokens are back. A shared backend (Redis, Mongo) implements the
+    same call atomically, so limits hold across API processes.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        ...
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Buckets in a dict, per process: with N API workers a client gets up to N times the budget."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> (tokens, monotonic time they were counted)
+        self.buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        tokens, counted_at = self.buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - counted_at) * rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return wait
+
+
+class RateLimiter:
+    """Per-user and per-IP token buckets with route-specific budgets (ROUTE_LIMITS).
+
+    ``check`` raises a 429 with ``Retry-After`` when either bucket is empty,
+    before the route does any work.
+    """
+
+    def __init__(self, backend: Optional[RateLimitBackend] = None, limits: Dict[str, Dict[str, Limit]] = ROUTE_LIMITS,
+                 enabled: bool = True):
+        self.backend = backend or MemoryRateLimitBackend()
+        self.limits = limits
+        self.enabled = enabled
+
+    async def check(self, route: str, ip: Optional[str] = None, user_id: Optional[str] = None):
+        if not self.enabled:
+            return
+        for scope, identity in (('user', user_id), ('ip', ip)):
+            limit = self.limits[route].get(scope)
+            if limit is None or not identity:
+                continue
+            wait = await self.backend.take(f'{route}:{scope}:{identity}', 1 / limit.per_seconds, limit.burst)
+            if wait > 0:
+                REQUESTS_SHED.inc(route, f'rate_{scope}')
+                raise HTTPException(status_code=429, detail='Too many requests, slow down',
+                                    headers={'Retry-After': str(math.ceil(wait))})
+
+
+class AdmissionControl:
+    """Caps how many requests of each route class (ADMISSION_LIMITS) run at once.
+
+    Past the cap a request waits up to ADMISSION_WAIT_SECONDS for a slot,
+    with at most as many waiting as running; anything beyond that gets an
+    immediate 503 instead of piling onto a saturated event loop, thread
+    pool or Mongo pool.
+    """
+
+    def __init__(self, limits: Dict[str, int] = ADMISSION_LIMITS, wait_seconds: float = ADMISSION_WAIT_SECONDS,
+                 enabled: bool = True):
+        self.limits = limits
+        self.wait_seconds = wait_seconds
+        self.enabled = enabled
+        self.in_flight: Dict[str, int] = {}
+        self.waiting: Dict[str, int] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    @asynccontextmanager
+    async def slot(self, route_class: str):
+        if not self.enabled:
+            yield
+            return
+        limit = self.limits[route_class]
+        slots = self._slots.get(route_class)
+        if slots is None:
+            slots = self._slots[route_class] = asyncio.Semaphore(limit)
+        if slots.locked():
+            if self.waiting.get(route_class, 0) >= limit:
+                self._shed(route_class)
+            self.waiting[route_class] = self.waiting.get(route_class, 0) + 1
+            try:
+                await asyncio.wait_for(slots.acquire(), self.wait_seconds)
+            except asyncio.TimeoutError:
+                self._shed(route_class)
+            finally:
+                self.waiting[route_class] -= 1
+        else:
+            await slots.acquire()
+
+        self.in_flight[route_class] = self.in_flight.get(route_class, 0) + 1
+        ADMISSION_IN_FLIGHT.set(route_class, value=self.in_flight[route_class])
+        try:
+            yield
+        finally:
+            slots.release()
+            self.in_flight[route_class] -= 1
+            ADMISSION_IN_FLIGHT.set(route_class, value=self.in_flight[route_class])
+
+    def _shed(self, route_class: str):
+        REQUESTS_SHED.inc(route_class, 'concurrency')
+        raise HTTPException(status_code=503, detail='Server busy, try again shortly', headers={'Retry-After': '1'})
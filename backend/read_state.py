@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ids import parse_timestamp, utcnow
+from pagination import before_clause
+
+logger = logging.getLogger(__name__)
+
+# Acks are held in memory and written at most this often
+READ_STATE_FLUSH_SECONDS = 1.0
+READ_STATE_FLUSH_BATCH = 1000
+# Badges stop counting here; clients show "99+"
+UNREAD_COUNT_CAP = 100
+
+MENTION_PATTERN = re.compile(r'@([A-Za-z0-9_.]{1,32})')
+
+
+def mentioned_usernames(content: str) -> List[str]:
+    return list(dict.fromkeys(MENTION_PATTERN.findall(content or '')))
+
+
+def marker_key(marker: dict) -> Tuple[datetime, str]:
+    return (parse_timestamp(marker['last_read_at']), marker['last_read_id'])
+
+
+class ReadState:
+    """Per-user, per-channel read markers and unread/mention counts.
+
+    A marker is the (created_at, id) of the newest message a user has read
+    in a channel, stored in ``read_states``. ``ack`` only moves a marker
+    forward and only touches memory; a flusher writes the pending markers
+    every READ_STATE_FLUSH_SECONDS with one unordered bulk upsert that is
+    guarded the same way, so a burst of acks while scrolling costs one write
+    per channel. Pending markers overlay the stored ones on reads, so badges
+    clear immediately.
+
+    Unread counts for all requested channels come from one aggregation over
+    the hot ``messages`` collection: each channel keeps a window of its
+    UNREAD_COUNT_CAP + 1 newest unread messages, and mentions are counted
+    within that window. New members get markers at each channel's newest
+    message (``seed``), so joining a busy server isn't a wall of unread
+    history. Archived messages are never counted as unread, which also
+    bounds how much a stale marker can match.
+    """
+
+    def __init__(self, db, flush_seconds: float = READ_STATE_FLUSH_SECONDS):
+        self.db = db
+        self.flush_seconds = flush_seconds
+        # (user id, channel id) -> marker not yet written
+        self.pending: Dict[Tuple[str, str], dict] = {}
+        self._flushing: Dict[Tuple[str, str], dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        await self.db.read_states.create_index([('user_id', 1), ('channel_id', 1)], unique=True)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write what is still pending, then stop the flusher."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Read state flush failed: {str(e)}")
+
+    # ---------- writes ----------
+
+    def ack(self, user_id: str, channel_id: str, server_id: str, message: dict) -> dict:
+        """Mark ``message`` and everything before it as read; returns the pending marker.
+
+        Only pending markers are compared here; an older ack that slips past
+        them is dropped by the guarded upsert when it is flushed.
+        """
+        marker = {
+            'user_id': user_id,
+            'channel_id': channel_id,
+            'server_id': server_id,
+            'last_read_at': message['created_at'],
+            'last_read_id': message['id'],
+        }
+        key = (user_id, channel_id)
+        current = self.pending.get(key) or self._flushing.get(key)
+        if current is not None and marker_key(current) >= marker_key(marker):
+            return current
+        self.pending[key] = marker
+        return marker
+
+    async def seed(self, user_id: str, server_id: str, channel_ids: Iterable[str]):
+        """Start a new member's markers at each channel's newest message, so history isn't unread."""
+        channel_ids = list(channel_ids)
+        if not channel_ids:
+            return
+        # Sorted like the channel index, so each group's first message is the channel's newest
+        newest = await self.db.messages.aggregate([
+            {'$match': {'channel_id': {'$in': channel_ids}}},
+            {'$sort': {'channel_id': 1, 'created_at': -1, 'id': -1}},
+            {'$group': {'_id': '$channel_id', 'id': {'$first': '$id'}, 'created_at': {'$first': '$created_at'}}},
+        ]).to_list(len(channel_ids))
+        for found in newest:
+            self.ack(user_id, found['_id'], server_id, found)
+
+    async def flush(self) -> int:
+        if not self.pending:
+            return 0
+        self._flushing, self.pending = self.pending, {}
+        try:
+            markers = list(self._flushing.values())
+            for start in range(0, len(markers), READ_STATE_FLUSH_BATCH):
+                await self._write(markers[start:start + READ_STATE_FLUSH_BATCH])
+        except BaseException:
+            # Put unwritten markers back unless a newer ack replaced them meanwhile
+            for key, marker in self._flushing.items():
+                self.pending.setdefault(key, marker)
+            raise
+        finally:
+            written, self._flushing = len(self._flushing), {}
+        return written
+
+    async def _write(self, markers: List[dict]):
+        now = utcnow()
+        operations = [
+            UpdateOne(
+                {'user_id': m['user_id'], 'channel_id': m['channel_id'],
+                 **before_clause('last_read_at', m['last_read_at'], 'last_read_id', m['last_read_id'])},
+                {'$set': {**m, 'updated_at': now}},
+                upsert=True,
+            )
+            for m in markers
+        ]
+        try:
+            await self.db.read_states.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # A duplicate key means the stored marker is already newer (another worker got there first)
+            if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+                raise
+
+    # ---------- reads ----------
+
+    async def markers(self, user_id: str, channel_ids: Iterable[str]) -> Dict[str, dict]:
+        channel_ids = list(channel_ids)
+        if not channel_ids:
+            return {}
+        stored = await self.db.read_states.find(
+            {'user_id': user_id, 'channel_id': {'$in': channel_ids}},
+            {'_id': 0, 'channel_id': 1, 'server_id': 1, 'last_read_at': 1, 'last_read_id': 1},
+        ).to_list(len(channel_ids))
+        found = {m['channel_id']: m for m in stored}
+        for channel_id in channel_ids:
+            key = (user_id, channel_id)
+            for overlay in (self._flushing.get(key), self.pending.get(key)):
+                if overlay and (channel_id not in found or marker_key(overlay) > marker_key(found[channel_id])):
+                    found[channel_id] = overlay
+        return found
+
+    async def unread_counts(self, user_id: str, channel_ids: Iterable[str]) -> Dict[str, dict]:
+        """channel id -> {'last_read_id', 'unread_count', 'mention_count'} for every requested channel."""
+        channel_ids = list(channel_ids)
+        markers = await self.markers(user_id, channel_ids)
+        counts = {
+            channel_id: {
+                'last_read_id': markers[channel_id]['last_read_id'] if channel_id in markers else None,
+                'unread_count': 0,
+                'mention_count': 0,
+            }
+            for channel_id in channel_ids
+        }
+        if not channel_ids:
+            return counts
+
+        unread = []
+        for channel_id in channel_ids:
+            marker = markers.get(channel_id)
+            if marker is None:
+                unread.append({'channel_id': channel_id})
+            else:
+                unread.append({'channel_id': channel_id, **before_clause(
+                    'created_at', marker['last_read_at'], 'id', marker['last_read_id'], descending=False)})
+
+        # Newest first per channel, keeping one past the cap, so badges can show "99+"
+        windows = await self.db.messages.aggregate([
+            {'$match': {'channel_id': {'$in': channel_ids}, 'author_id': {'$ne': user_id}, '$or': unread}},
+            {'$sort': {'channel_id': 1, 'created_at': -1, 'id': -1}},
+            {'$group': {
+                '_id': '$channel_id',
+                'mentioned': {'$push': {'$in': [user_id, {'$ifNull': ['$mentions', []]}]}},
+            }},
+            {'$project': {'mentioned': {'$slice': ['$mentioned', UNREAD_COUNT_CAP + 1]}}},
+        ]).to_list(len(channel_ids))
+        for window in windows:
+            counts[window['_id']]['unread_count'] = min(len(window['mentioned']), UNREAD_COUNT_CAP)
+            counts[window['_id']]['mention_count'] = min(sum(window['mentioned']), UNREAD_COUNT_CAP)
+        return counts
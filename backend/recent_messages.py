@@ -0,0 +1,159 @@
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, List, Optional, Tuple
+
+from ids import parse_timestamp
+
+# Messages kept per channel or DM; pages are capped at 100, so one full page plus new arrivals fit
+RECENT_MESSAGES_PER_CHANNEL = 200
+RECENT_MESSAGES_CHANNELS = 2000
+# Channels whose last write sequence is remembered, to reject primes that raced with a write
+RECENT_WRITES_TRACKED = 20000
+
+
+def message_key(message: dict) -> Tuple[datetime, str]:
+    return (parse_timestamp(message['created_at']), message['id'])
+
+
+class RecentBuffer:
+    __slots__ = ('messages', 'complete')
+
+    def __init__(self, capacity: int, complete: bool):
+        # Oldest first, contiguous: nothing newer than messages[0] is missing
+        self.messages: Deque[dict] = deque(maxlen=capacity)
+        # The buffer holds the whole history, so running out of messages means there are no more
+        self.complete = complete
+
+
+class RecentMessages:
+    """Per-channel ring buffers of the newest messages, already hydrated.
+
+    Keys are ``'channel:<id>'`` or ``'dm:<id>'``. A buffer is primed from the
+    first newest-page read of a channel and kept current by ``append`` and
+    ``update``; writes to channels without a buffer are ignored, since an
+    unprimed buffer can't tell what came before. Every write bumps a sequence
+    number, and a prime whose Mongo read started before the channel's last
+    write is dropped. The least recently read channels are evicted once
+    RECENT_MESSAGES_CHANNELS buffers exist.
+
+    Buffers only see writes made by this process, so the cache assumes a
+    single API worker and can be disabled with ``capacity=0``.
+    """
+
+    def __init__(self, capacity: int = RECENT_MESSAGES_PER_CHANNEL, max_channels: int = RECENT_MESSAGES_CHANNELS):
+        self.capacity = capacity
+        self.max_channels = max_channels
+        self.buffers: 'OrderedDict[str, RecentBuffer]' = OrderedDict()
+        self.sequence = 0
+        # key -> sequence of its last write; keys dropped from here count as written at ``forgotten``
+        self.writes: 'OrderedDict[str, int]' = OrderedDict()
+        self.forgotten = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def token(self) -> int:
+        """Taken before reading a newest page from Mongo and handed back to ``prime``."""
+        return self.sequence
+
+    def prime(self, key: str, newest_first: List[dict], complete: bool, token: int):
+        """Seed (or replace) a buffer from a newest page read from Mongo after ``token`` was taken."""
+        if not self.enabled or self.writes.get(key, self.forgotten) > token:
+            return
+        buffer = RecentBuffer(self.capacity, complete and len(newest_first) <= self.capacity)
+        for message in reversed(newest_first[:self.capacity]):
+            buffer.messages.append(dict(message))
+        self.buffers[key] = buffer
+        self.buffers.move_to_end(key)
+        while len(self.buffers) > self.max_channels:
+            self.buffers.popitem(last=False)
+
+    def _written(self, key: str):
+        self.sequence += 1
+        self.writes[key] = self.sequence
+        self.writes.move_to_end(key)
+        while len(self.writes) > RECENT_WRITES_TRACKED:
+            _, sequence = self.writes.popitem(last=False)
+            self.forgotten = max(self.forgotten, sequence)
+
+    def append(self, key: str, message: dict):
+        self._written(key)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            return
+        # Concurrent posts can finish out of order; keep the buffer sorted
+        position = len(buffer.messages)
+        while position > 0 and message_key(buffer.messages[position - 1]) > message_key(message):
+            position -= 1
+        full = len(buffer.messages) == buffer.messages.maxlen
+        if position == 0 and buffer.messages and (full or not buffer.complete):
+            # Older than everything buffered: it would fall straight out, or leave a gap
+            buffer.complete = False
+            return
+        if full:
+            buffer.messages.popleft()
+            buffer.complete = False
+            position -= 1
+        buffer.messages.insert(position, dict(message))
+
+    def update(self, key: str, message_id: str, fields: dict):
+        self._written(key)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            return
+        for message in reversed(buffer.messages):
+            if message['id'] == message_id:
+                message.update(fields)
+                return
+
+    def invalidate(self, key: str):
+        self._written(key)
+        self.buffers.pop(key, None)
+
+    def forget_author(self, author_id: str):
+        """Drop buffers holding messages by this author, e.g. after a profile change."""
+        stale = [key for key, buffer in self.buffers.items() if any(m['author_id'] == author_id for m in buffer.messages)]
+        for key in stale:
+            self.invalidate(key)
+
+    def page(self, key: str, limit: int, position: Optional[list]) -> Optional[Tuple[List[dict], Optional[list]]]:
+        """Newest-first page older than ``position``, or None when the buffer can't answer it."""
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            return None
+        messages = list(buffer.messages)
+        if position:
+            before = (parse_timestamp(position[0]), position[1])
+            messages = [m for m in messages if message_key(m) < before]
+        if len(messages) <= limit and not buffer.complete:
+            return None
+
+        self.buffers.move_to_end(key)
+        page = [dict(m) for m in reversed(messages[-limit:])]
+        has_more = len(messages) > limit or not buffer.complete
+        return page, ([page[-1]['created_at'], page[-1]['id']] if has_more and page else None)
+
+    def get(self, key: str, message_id: Optional[str] = None) -> Optional[dict]:
+        """A buffered message by id, or the newest one; None when it isn't buffered."""
+        buffer = self.buffers.get(key)
+        if buffer is None or not buffer.messages:
+            return None
+        if message_id is None:
+            return dict(buffer.messages[-1])
+        for message in reversed(buffer.messages):
+            if message['id'] == message_id:
+                return dict(message)
+        return None
+
+    def since(self, key: str, message_id: str, limit: int) -> Optional[List[dict]]:
+        """Up to ``limit`` messages newer than ``message_id``, oldest first, or None when it isn't buffered."""
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            return None
+        for index in range(len(buffer.messages) - 1, -1, -1):
+            if buffer.messages[index]['id'] == message_id:
+                self.buffers.move_to_end(key)
+                newer = list(buffer.messages)[index + 1:index + 1 + limit]
+                return [dict(m) for m in newer]
+        return None
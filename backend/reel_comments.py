@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from typing import List, Optional, Set, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+from pagination import before_clause
+
+logger = logging.getLogger(__name__)
+
+# Comments precomputed onto each reel document as ``top_comments``
+TOP_COMMENTS_PER_REEL = 3
+# Reels whose likes or comments changed are re-ranked at most this often
+TOP_COMMENTS_REFRESH_SECONDS = 5
+COMMENT_FIELDS = {'_id': 0, 'likes': 0, 'counted': 0}
+AUTHOR_FIELDS = {'_id': 0, 'id': 1, 'username': 1, 'avatar': 1}
+
+
+class ReelComments:
+    """Threaded reel comments with keyset pages and precomputed top comments.
+
+    Comments are one level deep: a reply to a reply is attached to the
+    top-level comment. Top-level comments page newest first and replies
+    oldest first, each with an ``(created_at, id)`` cursor over the
+    ``(reel_id, parent_id, created_at, id)`` index. Every comment keeps
+    ``reply_count`` and ``likes_count`` counters; likes are counted with
+    ``$inc`` alongside the write, while ``count`` (run as a background job
+    after ``add``) adds a new comment to its parent's ``reply_count`` and
+    its reel's ``comments_count``. A comment is stored with ``counted``
+    false, and ``count`` skips comments already flagged and sets the flag
+    after both increments. A finished job never counts its comment again;
+    a job that dies before the flag is written is retried and counts it
+    once more, rather than leaving it out of the counters.
+
+    Each reel carries the TOP_COMMENTS_PER_REEL most liked top-level
+    comments, hydrated with their authors, in ``top_comments``. Likes and new
+    comments only mark a reel dirty; a background loop re-ranks dirty reels
+    every TOP_COMMENTS_REFRESH_SECONDS, so a like storm on a popular reel
+    costs one ranking query per interval.
+    """
+
+    def __init__(self, db, refresh_seconds: float = TOP_COMMENTS_REFRESH_SECONDS):
+        self.db = db
+        self.refresh_seconds = refresh_seconds
+        self.dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        await self.db.reel_comments.create_index([('reel_id', 1), ('parent_id', 1), ('created_at', -1), ('id', -1)])
+        await self.db.reel_comments.create_index([('reel_id', 1), ('parent_id', 1), ('likes_count', -1), ('created_at', -1)])
+        await self.db.reel_comments.create_index('id', unique=True)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Top comments refresh failed: {str(e)}")
+
+    # ---------- reads ----------
+
+    async def page(self, reel_id: str, parent_id: Optional[str], user_id: str, limit: int,
+                   position: Optional[list]) -> Tuple[List[dict], Optional[list]]:
+        """Top-level comments (newest first) or the replies to ``parent_id`` (oldest first)."""
+        descending = parent_id is None
+        query = {'reel_id': reel_id, 'parent_id': parent_id}
+        if position:
+            query.update(before_clause('created_at', position[0], 'id', position[1], descending=descending))
+        direction = -1 if descending else 1
+        comments = await self.db.reel_comments.find(query, COMMENT_FIELDS).sort(
+            [('created_at', direction), ('id', direction)]).limit(limit + 1).to_list(limit + 1)
+
+        next_position = None
+        if len(comments) > limit:
+            comments = comments[:limit]
+            next_position = [comments[-1]['created_at'], comments[-1]['id']]
+        await self.hydrate(comments, user_id)
+        return comments, next_position
+
+    async def hydrate(self, comments: List[dict], user_id: str):
+        """Attach authors, counters and ``is_liked`` with one query each."""
+        if not comments:
+            return
+        comment_ids = [c['id'] for c in comments]
+        author_ids = list({c['author_id'] for c in comments})
+        authors = {a['id']: a for a in await self.db.users.find({'id': {'$in': author_ids}}, AUTHOR_FIELDS).to_list(len(author_ids))}
+        liked = await self.db.reel_comments.find({'id': {'$in': comment_ids}, 'likes': user_id}, {'_id': 0, 'id': 1}).to_list(len(comment_ids))
+        liked_ids = {c['id'] for c in liked}
+        for comment in comments:
+            comment.setdefault('parent_id', None)
+            comment.setdefault('reply_count', 0)
+            comment.setdefault('likes_count', 0)
+            comment['is_liked'] = comment['id'] in liked_ids
+            author = authors.get(comment['author_id'])
+            if author:
+                comment['author'] = author
+
+    # ---------- writes ----------
+
+    async def add(self, comment_doc: dict):
+        await self.db.reel_comments.insert_one({**comment_doc, 'counted': False})
+        self.dirty.add(comment_doc['reel_id'])
+
+    async def count(self, comment_id: str):
+        comment = await self.db.reel_comments.find_one({'id': comment_id, 'counted': False}, {'reel_id': 1, 'parent_id': 1})
+        if comment is None:
+            return
+        # Flagged only once both counters moved: a crash in between means the retry counts it again, never that it's lost
+        if comment.get('parent_id'):
+            await self.db.reel_comments.update_one({'id': comment['parent_id']}, {'$inc': {'reply_count': 1}})
+        await self.db.reels.update_one({'id': comment['reel_id']}, {'$inc': {'comments_count': 1}})
+        await self.db.reel_comments.update_one({'id': comment_id, 'counted': False}, {'$set': {'counted': True}})
+
+    async def toggle_like(self, reel_id: str, comment_id: str, user_id: str) -> Optional[Tuple[bool, int]]:
+        """Like or unlike a comment; returns (liked, likes_count), or None when the comment doesn't exist."""
+        comment = await self.db.reel_comments.find_one_and_update(
+            {'id': comment_id, 'reel_id': reel_id, 'likes': {'$ne': user_id}},
+            {'$push': {'likes': user_id}, '$inc': {'likes_count': 1}},
+            projection={'likes_count': 1}, return_document=ReturnDocument.AFTER)
+        liked = comment is not None
+        if not liked:
+            comment = await self.db.reel_comments.find_one_and_update(
+                {'id': comment_id, 'reel_id': reel_id, 'likes': user_id},
+                {'$pull': {'likes': user_id}, '$inc': {'likes_count': -1}},
+                projection={'likes_count': 1}, return_document=ReturnDocument.AFTER)
+            if comment is None:
+                return None
+        self.dirty.add(reel_id)
+        return liked, comment['likes_count']
+
+    # ---------- top comments ----------
+
+    async def refresh(self) -> int:
+        if not self.dirty:
+            return 0
+        reel_ids, self.dirty = list(self.dirty), set()
+        try:
+            tops = await asyncio.gather(*(
+                self.db.reel_comments.find({'reel_id': reel_id, 'parent_id': None}, COMMENT_FIELDS)
+                .sort([('likes_count', -1), ('created_at', -1)]).limit(TOP_COMMENTS_PER_REEL).to_list(TOP_COMMENTS_PER_REEL)
+                for reel_id in reel_ids
+            ))
+            author_ids = list({c['author_id'] for top in tops for c in top})
+            authors = {a['id']: a for a in await self.db.users.find({'id': {'$in': author_ids}}, AUTHOR_FIELDS).to_list(len(author_ids))}
+            operations = []
+            for reel_id, top in zip(reel_ids, tops):
+                for comment in top:
+                    comment.setdefault('parent_id', None)
+                    comment.setdefault('reply_count', 0)
+                    comment.setdefault('likes_count', 0)
+                    comment['author'] = authors.get(comment['author_id'])
+                operations.append(UpdateOne({'id': reel_id}, {'$set': {'top_comments': top}}))
+            await self.db.reels.bulk_write(operations, ordered=False)
+        except BaseException:
+            self.dirty.update(reel_ids)
+            raise
+        return len(reel_ids)
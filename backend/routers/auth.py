@@ -0,0 +1,158 @@
+"""Signup, login, profiles, follows and user search."""
+from fastapi import APIRouter, HTTPException, Depends, Request
+from pydantic import BaseModel
+from typing import Optional
+import asyncio
+import uuid
+from ids import new_id, utcnow
+from core import (db, hash_password, verify_password, create_token, get_current_user, recent_messages, job_queue,
+                  notification_inbox, rate_limiter, admission, client_ip, throttled, default_avatar_url, user_stats)
+
+router = APIRouter(tags=['auth'])
+
+# ================== MODELS ==================
+
+class UserCreate(BaseModel):
+    username: str
+    email: str
+    password: str
+
+class UserLogin(BaseModel):
+    email: str
+    password: str
+
+class UserUpdate(BaseModel):
+    username: Optional[str] = None
+    avatar: Optional[str] = None
+    banner: Optional[str] = None
+    bio: Optional[str] = None
+    status: Optional[str] = None
+    theme: Optional[str] = None
+
+# ================== AUTH ENDPOINTS ==================
+
+@router.post("/auth/signup")
+async def signup(user_data: UserCreate, request: Request):
+    await rate_limiter.check('signup', client_ip(request))
+    existing = await db.users.find_one({'$or': [{'email': user_data.email}, {'username': user_data.username}]})
+    if existing:
+        raise HTTPException(status_code=400, detail='User already exists')
+    
+    user_id = new_id()
+    discriminator = str(uuid.uuid4().int)[:4]
+    # bcrypt is deliberately slow, so it runs in a worker thread and only so many hashes run at once
+    async with admission.slot('auth'):
+        password_hash = await asyncio.to_thread(hash_password, user_data.password)
+    
+    user_doc = {
+        'id': user_id,
+        'username': user_data.username,
+        'email': user_data.email,
+        'password': password_hash,
+        'avatar': default_avatar_url(user_data.username),
+        'banner': None,
+        'bio': '',
+        'status': 'online',
+        'is_premium': False,
+        'theme': 'liquid-glass',
+        'discriminator': discriminator,
+        'servers': [],
+        'friends': [],
+        'followers': [],
+        'following': [],
+        'robux': 0,
+        'created_at': utcnow()
+    }
+    
+    await db.users.insert_one(user_doc)
+    await user_stats.create(user_id)
+    token = create_token(user_id)
+    
+    user_response = {k: v for k, v in user_doc.items() if k not in ['_id', 'password']}
+    return {'token': token, 'user': user_response}
+
+@router.post("/auth/login")
+async def login(credentials: UserLogin, request: Request):
+    await rate_limiter.check('login', client_ip(request), credentials.email.lower())
+    user = await db.users.find_one({'email': credentials.email})
+    if not user:
+        raise HTTPException(status_code=401, detail='Invalid credentials')
+    async with admission.slot('auth'):
+        valid = await asyncio.to_thread(verify_password, credentials.password, user['password'])
+    if not valid:
+        raise HTTPException(status_code=401, detail='Invalid credentials')
+    
+    await db.users.update_one({'id': user['id']}, {'$set': {'status': 'online'}})
+    token = create_token(user['id'])
+    
+    user_response = {k: v for k, v in user.items() if k not in ['_id', 'password']}
+    return {'token': token, 'user': user_response}
+
+@router.get("/auth/me")
+async def get_me(current_user: dict = Depends(get_current_user)):
+    return current_user
+
+@router.put("/auth/profile")
+async def update_profile(updates: UserUpdate, current_user: dict = Depends(get_current_user)):
+    update_data = {k: v for k, v in updates.model_dump().items() if v is not None}
+    
+    if update_data:
+        await db.users.update_one({'id': current_user['id']}, {'$set': update_data})
+        if 'username' in update_data or 'avatar' in update_data:
+            recent_messages.forget_author(current_user['id'])
+    
+    updated_user = await db.users.find_one({'id': current_user['id']}, {'_id': 0, 'password': 0})
+    return updated_user
+
+@router.get("/users/{user_id}")
+async def get_user_profile(user_id: str, current_user: dict = Depends(get_current_user)):
+    # Follower lists can be huge; the counts come from the stats document instead
+    user = await db.users.find_one({'id': user_id}, {'_id': 0, 'password': 0, 'email': 0, 'followers': 0, 'following': 0})
+    if not user:
+        raise HTTPException(status_code=404, detail='User not found')
+    
+    stats = await user_stats.get(user_id)
+    user['reels_count'] = stats['reels']
+    user['posts_count'] = stats['posts']
+    user['followers_count'] = stats['followers']
+    user['following_count'] = stats['following']
+    user['reel_views'] = stats['reel_views']
+    user['reel_likes'] = stats['reel_likes']
+    user['is_following'] = user_id in current_user.get('following', [])
+    
+    return user
+
+@router.post("/users/{user_id}/follow")
+async def follow_user(user_id: str, current_user: dict = Depends(get_current_user)):
+    if user_id == current_user['id']:
+        raise HTTPException(status_code=400, detail='Cannot follow yourself')
+    
+    target_user = await db.users.find_one({'id': user_id})
+    if not target_user:
+        raise HTTPException(status_code=404, detail='User not found')
+    
+    # Add to following/followers
+    following = await db.users.update_one({'id': current_user['id']}, {'$addToSet': {'following': user_id}})
+    followed = await db.users.update_one({'id': user_id}, {'$addToSet': {'followers': current_user['id']}})
+    await job_queue.enqueue('feed.backfill', {'follower_id': current_user['id'], 'author_id': user_id})
+    await user_stats.increment(current_user['id'], following=following.modified_count)
+    await user_stats.increment(user_id, followers=followed.modified_count)
+    if followed.modified_count:
+        notification_inbox.notify(user_id, 'follow', current_user['id'], {'type': 'user', 'id': user_id})
+    
+    return {'message': 'Followed successfully'}
+
+@router.delete("/users/{user_id}/follow")
+async def unfollow_user(user_id: str, current_user: dict = Depends(get_current_user)):
+    following = await db.users.update_one({'id': current_user['id']}, {'$pull': {'following': user_id}})
+    followed = await db.users.update_one({'id': user_id}, {'$pull': {'followers': current_user['id']}})
+    await user_stats.increment(current_user['id'], following=-following.modified_count)
+    await user_stats.increment(user_id, followers=-followed.modified_count)
+    return {'message': 'Unfollowed successfully'}
+
+# ================== SEARCH ==================
+
+@router.get("/search/users", dependencies=[Depends(throttled('search'))])
+async def search_users(q: str, current_user: dict = Depends(get_current_user)):
+    users = await db.users.find({'username': {'$regex': q, '$options': 'i'}}, {'_id': 0, 'password': 0}).limit(20).to_list(20)
+    return users
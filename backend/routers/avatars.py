@@ -0,0 +1,38 @@
+"""Locally rendered default avatars, server icons and placeholder images."""
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from typing import Optional
+from avatars import render, AVATAR_SEED_MAX_LENGTH, PLACEHOLDER_MAX_SIZE, PLACEHOLDER_TEXT_MAX_LENGTH, IMAGE_CACHE_CONTROL
+
+router = APIRouter(tags=['avatars'])
+
+# ================== HELPERS ==================
+
+def image_response(request: Request, kind: str, seed: str = '', width: int = 0, height: int = 0) -> Response:
+    # No auth: these are <img> sources, and every one is a pure function of its URL
+    body, etag = render(kind, seed, width, height)
+    headers = {'Cache-Control': IMAGE_CACHE_CONTROL, 'ETag': etag}
+    if etag in request.headers.get('if-none-match', '').replace('W/', '').split(', '):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type='image/svg+xml', headers=headers)
+
+def check_seed(seed: str) -> str:
+    if not seed or len(seed) > AVATAR_SEED_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f'Seed must be 1 to {AVATAR_SEED_MAX_LENGTH} characters')
+    return seed
+
+# ================== IMAGE ENDPOINTS ==================
+
+@router.get("/avatars/identicon/{seed:path}.svg")
+async def get_identicon(seed: str, request: Request):
+    return image_response(request, 'identicon', check_seed(seed))
+
+@router.get("/avatars/initials/{seed:path}.svg")
+async def get_initials_icon(seed: str, request: Request):
+    return image_response(request, 'initials', check_seed(seed))
+
+@router.get("/placeholders/{width:int}x{height:int}.svg")
+async def get_placeholder(width: int, height: int, request: Request, text: Optional[str] = None):
+    if not (1 <= width <= PLACEHOLDER_MAX_SIZE and 1 <= height <= PLACEHOLDER_MAX_SIZE):
+        raise HTTPException(status_code=400, detail=f'Width and height must be 1 to {PLACEHOLDER_MAX_SIZE}')
+    return image_response(request, 'placeholder', (text or '')[:PLACEHOLDER_TEXT_MAX_LENGTH], width, height)
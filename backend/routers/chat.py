@@ -0,0 +1,342 @@
+"""Servers, channels, channel messages, channel history export/import and server discovery."""
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi.responses import Response
+from pydantic import BaseModel
+from typing import List, Optional
+import uuid
+from ids import new_id, utcnow
+from core import (db, get_current_user, attach_authors, get_messages_since, history_response, CHANNEL_AUTHOR_FIELDS,
+                  message_archive, message_writer, metadata_cache, recent_messages, read_state, discovery_index,
+                  membership_cache, notification_inbox, throttled, default_icon_url)
+from history_export import import_history, iter_upload_lines
+from pagination import encode_cursor, decode_cursor
+from read_state import mentioned_usernames
+from discovery import DISCOVERY_CATEGORIES
+
+router = APIRouter(tags=['chat'])
+
+# ================== MODELS ==================
+
+class ServerCreate(BaseModel):
+    name: str
+    icon: Optional[str] = None
+    description: Optional[str] = ""
+    category: Optional[str] = None
+
+class ChannelCreate(BaseModel):
+    name: str
+    channel_type: str = "text"
+    server_id: str
+    category_id: Optional[str] = None
+
+class MessageCreate(BaseModel):
+    content: str
+    channel_id: str
+    attachments: Optional[List[str]] = []
+
+class ReadAck(BaseModel):
+    message_id: Optional[str] = None
+
+# ================== AUTHORIZATION ==================
+
+async def require_server_member(server_id: str, current_user: dict):
+    if not await membership_cache.is_member(current_user['id'], server_id):
+        raise HTTPException(status_code=403, detail='Not a member of this server')
+
+async def require_channel_member(channel_id: str, current_user: dict) -> str:
+    server_id, allowed = await membership_cache.can_read_channel(current_user['id'], channel_id)
+    if server_id is None:
+        raise HTTPException(status_code=404, detail='Channel not found')
+    if not allowed:
+        raise HTTPException(status_code=403, detail='Not a member of this server')
+    return server_id
+
+# ================== SERVER ENDPOINTS ==================
+
+@router.post("/servers")
+async def create_server(server_data: ServerCreate, current_user: dict = Depends(get_current_user)):
+    if server_data.category and server_data.category not in DISCOVERY_CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"Category must be one of: {', '.join(DISCOVERY_CATEGORIES)}")
+    
+    server_id = new_id()
+    invite_code = str(uuid.uuid4())[:8]
+    
+    server_doc = {
+        'id': server_id,
+        'name': server_data.name,
+        'icon': server_data.icon or default_icon_url(server_data.name),
+        'banner': None,
+        'description': server_data.description,
+        'category': server_data.category,
+        'owner_id': current_user['id'],
+        'members': [current_user['id']],
+        'invite_code': invite_code,
+        'boost_count': 0,
+        'created_at': utcnow()
+    }
+    
+    await db.servers.insert_one(server_doc)
+    await db.users.update_one({'id': current_user['id']}, {'$addToSet': {'servers': server_id}})
+    
+    # Create default channels
+    channels = [
+        {'id': new_id(), 'name': 'general', 'channel_type': 'text', 'server_id': server_id, 'category_id': None, 'created_at': utcnow()},
+        {'id': new_id(), 'name': 'General Voice', 'channel_type': 'voice', 'server_id': server_id, 'category_id': None, 'created_at': utcnow()}
+    ]
+    await db.channels.insert_many(channels)
+    metadata_cache.bump(server_id)
+    membership_cache.joined(current_user['id'], server_id)
+    
+    server_doc['member_count'] = 1
+    return {k: v for k, v in server_doc.items() if k != '_id' and k != 'members'}
+
+@router.get("/servers")
+async def get_user_servers(current_user: dict = Depends(get_current_user)):
+    servers = await db.servers.find({'members': current_user['id']}, {'_id': 0}).to_list(100)
+    channels = await db.channels.find(
+        {'server_id': {'$in': [server['id'] for server in servers]}, 'channel_type': 'text'},
+        {'_id': 0, 'id': 1, 'server_id': 1}
+    ).to_list(None)
+    counts = await read_state.unread_counts(current_user['id'], [channel['id'] for channel in channels])
+    
+    totals = {server['id']: {'unread_count': 0, 'mention_count': 0} for server in servers}
+    for channel in channels:
+        for field in ('unread_count', 'mention_count'):
+            totals[channel['server_id']][field] += counts[channel['id']][field]
+    
+    for server in servers:
+        server['member_count'] = len(server.get('members', []))
+        server.pop('members', None)
+        server.update(totals[server['id']])
+    return servers
+
+@router.get("/servers/{server_id}")
+async def get_server(server_id: str, current_user: dict = Depends(get_current_user)):
+    await require_server_member(server_id, current_user)
+    server = await metadata_cache.get_server(server_id)
+    if not server:
+        raise HTTPException(status_code=404, detail='Server not found')
+    server['member_count'] = len(server.get('members', []))
+    return server
+
+@router.post("/servers/join/{invite_code}")
+async def join_server(invite_code: str, current_user: dict = Depends(get_current_user)):
+    server = await db.servers.find_one({'invite_code': invite_code})
+    if not server:
+        raise HTTPException(status_code=404, detail='Invalid invite code')
+    
+    if current_user['id'] in server.get('members', []):
+        raise HTTPException(status_code=400, detail='Already a member')
+    
+    await db.servers.update_one({'id': server['id']}, {'$push': {'members': current_user['id']}})
+    await db.users.update_one({'id': current_user['id']}, {'$addToSet': {'servers': server['id']}})
+    metadata_cache.bump(server['id'])
+    membership_cache.joined(current_user['id'], server['id'])
+    channels = await metadata_cache.get_channels(server['id'])
+    await read_state.seed(current_user['id'], server['id'], [c['id'] for c in channels if c.get('channel_type') == 'text'])
+    
+    return {'message': 'Joined server successfully', 'server_id': server['id']}
+
+@router.get("/servers/{server_id}/members")
+async def get_server_members(server_id: str, current_user: dict = Depends(get_current_user)):
+    await require_server_member(server_id, current_user)
+    server = await metadata_cache.get_server(server_id)
+    if not server:
+        raise HTTPException(status_code=404, detail='Server not found')
+    
+    members = await db.users.find({'id': {'$in': server.get('members', [])}}, {'_id': 0, 'password': 0}).to_list(100)
+    return members
+
+# ================== CHANNEL ENDPOINTS ==================
+
+@router.post("/channels")
+async def create_channel(channel_data: ChannelCreate, current_user: dict = Depends(get_current_user)):
+    server = await metadata_cache.get_server(channel_data.server_id)
+    if not server or server['owner_id'] != current_user['id']:
+        raise HTTPException(status_code=403, detail='Not authorized to create channels')
+    
+    channel_doc = {
+        'id': new_id(),
+        'name': channel_data.name.lower().replace(' ', '-'),
+        'channel_type': channel_data.channel_type,
+        'server_id': channel_data.server_id,
+        'category_id': channel_data.category_id,
+        'created_at': utcnow()
+    }
+    
+    await db.channels.insert_one(channel_doc)
+    metadata_cache.bump(channel_data.server_id)
+    return {k: v for k, v in channel_doc.items() if k != '_id'}
+
+@router.get("/servers/{server_id}/channels")
+async def get_server_channels(server_id: str, current_user: dict = Depends(get_current_user)):
+    await require_server_member(server_id, current_user)
+    channels = await metadata_cache.get_channels(server_id)
+    counts = await read_state.unread_counts(current_user['id'], [c['id'] for c in channels if c.get('channel_type') == 'text'])
+    for channel in channels:
+        channel.update(counts.get(channel['id'], {'last_read_id': None, 'unread_count': 0, 'mention_count': 0}))
+    return channels
+
+@router.post("/channels/{channel_id}/ack")
+async def ack_channel(channel_id: str, ack: ReadAck, current_user: dict = Depends(get_current_user)):
+    server_id = await require_channel_member(channel_id, current_user)
+    
+    # Without a message id the channel is read up to its newest message
+    key = f"channel:{channel_id}"
+    message = recent_messages.get(key, ack.message_id)
+    if message is None:
+        query = {'channel_id': channel_id, **({'id': ack.message_id} if ack.message_id else {})}
+        found = await db.messages.find(query, {'_id': 0, 'id': 1, 'created_at': 1}).sort([('created_at', -1), ('id', -1)]).limit(1).to_list(1)
+        message = found[0] if found else None
+    if message is None:
+        if ack.message_id:
+            raise HTTPException(status_code=404, detail='Message not found')
+        return {'channel_id': channel_id, 'last_read_id': None}
+    
+    marker = read_state.ack(current_user['id'], channel_id, server_id, message)
+    return {'channel_id': channel_id, 'last_read_id': marker['last_read_id']}
+
+# ================== MESSAGE ENDPOINTS ==================
+
+@router.post("/messages", dependencies=[Depends(throttled('message'))])
+async def create_message(message_data: MessageCreate, current_user: dict = Depends(get_current_user)):
+    server_id = await require_channel_member(message_data.channel_id, current_user)
+    
+    # Mentions are resolved once here so unread badges can count them without scanning content
+    mentions = []
+    usernames = mentioned_usernames(message_data.content)
+    if usernames:
+        mentioned = await db.users.find({'username': {'$in': usernames}}, {'_id': 0, 'id': 1}).to_list(len(usernames))
+        mentions = [user['id'] for user in mentioned]
+    
+    message_doc = {
+        'id': new_id(),
+        'content': message_data.content,
+        'channel_id': message_data.channel_id,
+        'author_id': current_user['id'],
+        'attachments': message_data.attachments or [],
+        'reactions': {},
+        'mentions': mentions,
+        'created_at': utcnow()
+    }
+    
+    await message_writer.insert('messages', message_doc)
+    read_state.ack(current_user['id'], message_data.channel_id, server_id, message_doc)
+    target = {'type': 'message', 'id': message_doc['id'], 'channel_id': message_data.channel_id, 'server_id': server_id}
+    for user_id in mentions:
+        # Mentioning someone outside the server mustn't leak the message to them
+        if await membership_cache.is_member(user_id, server_id):
+            notification_inbox.notify(user_id, 'mention', current_user['id'], target, preview=message_data.content)
+    
+    message_response = {k: v for k, v in message_doc.items() if k != '_id'}
+    message_response['author'] = {
+        'id': current_user['id'],
+        'username': current_user['username'],
+        'avatar': current_user.get('avatar'),
+        'discriminator': current_user.get('discriminator')
+    }
+    recent_messages.append(f"channel:{message_data.channel_id}", message_response)
+    
+    return message_response
+
+@router.get("/channels/{channel_id}/messages")
+async def get_channel_messages(channel_id: str, response: Response, limit: int = 50, cursor: Optional[str] = None,
+                               since: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    await require_channel_member(channel_id, current_user)
+    limit = max(1, min(limit, 100))
+    key = f"channel:{channel_id}"
+    if since:
+        # Polling delta: messages newer than `since`, oldest first
+        messages = recent_messages.since(key, since, limit)
+        if messages is None:
+            messages = await get_messages_since('messages', 'channel_id', channel_id, since, limit)
+            await attach_authors(messages, CHANNEL_AUTHOR_FIELDS)
+        return messages
+    
+    position = decode_cursor(cursor, 2)
+    cached = recent_messages.page(key, limit, position)
+    if cached:
+        messages, next_position = cached
+    else:
+        token = recent_messages.token()
+        messages, next_position = await message_archive.read_page(channel_id, limit, position)
+        await attach_authors(messages, CHANNEL_AUTHOR_FIELDS)
+        if position is None:
+            recent_messages.prime(key, messages, next_position is None, token)
+    if next_position:
+        response.headers['X-Next-Cursor'] = encode_cursor(*next_position)
+    
+    return list(reversed(messages))
+
+@router.post("/messages/{message_id}/reactions/{emoji}")
+async def add_reaction(message_id: str, emoji: str, current_user: dict = Depends(get_current_user)):
+    # Archived messages are read-only, so they are not found here
+    message = await db.messages.find_one({'id': message_id})
+    if not message:
+        raise HTTPException(status_code=404, detail='Message not found')
+    await require_channel_member(message['channel_id'], current_user)
+    
+    reactions = message.get('reactions', {})
+    if emoji not in reactions:
+        reactions[emoji] = []
+    added = current_user['id'] not in reactions[emoji]
+    if added:
+        reactions[emoji].append(current_user['id'])
+    
+    await db.messages.update_one({'id': message_id}, {'$set': {'reactions': reactions}})
+    recent_messages.update(f"channel:{message['channel_id']}", message_id, {'reactions': reactions})
+    if added:
+        notification_inbox.notify(message['author_id'], 'reaction', current_user['id'],
+                                  {'type': 'message', 'id': message_id, 'channel_id': message['channel_id']}, preview=emoji)
+    return {'message': 'Reaction added'}
+
+# ================== HISTORY EXPORT ==================
+
+async def get_owned_channel(channel_id: str, current_user: dict) -> dict:
+    channel = await metadata_cache.get_channel(channel_id)
+    if not channel:
+        raise HTTPException(status_code=404, detail='Channel not found')
+    server = await metadata_cache.get_server(channel['server_id'])
+    if not server or server['owner_id'] != current_user['id']:
+        raise HTTPException(status_code=403, detail='Only the server owner can export or import channel history')
+    return channel
+
+@router.get("/channels/{channel_id}/export")
+async def export_channel_messages(channel_id: str, compress: bool = False, current_user: dict = Depends(get_current_user)):
+    await get_owned_channel(channel_id, current_user)
+    return history_response('channel', channel_id, compress)
+
+@router.post("/channels/{channel_id}/import")
+async def import_channel_messages(channel_id: str, file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+    channel = await get_owned_channel(channel_id, current_user)
+    server = await metadata_cache.get_server(channel['server_id'])
+    try:
+        # Only current members can appear as authors, so an owner can't forge messages from anyone else
+        stats = await import_history(db, 'channel', channel_id, iter_upload_lines(file), authors=set(server.get('members', [])))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f'Invalid import file: {str(e)}')
+    finally:
+        recent_messages.invalidate(f"channel:{channel_id}")
+    return stats
+
+# ================== DISCOVERY ==================
+
+@router.get("/discover/servers")
+async def discover_servers(response: Response, q: Optional[str] = None, category: Optional[str] = None, limit: int = 50,
+                           cursor: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    # Served from the ranked snapshot; the servers collection is only read by the background rebuild
+    limit = max(1, min(limit, 100))
+    position = decode_cursor(cursor, 2)
+    if position and (isinstance(position[0], bool) or not isinstance(position[0], (int, float)) or not isinstance(position[1], str)):
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    servers, next_position = discovery_index.search(q, category, limit, position)
+    joined = set(current_user.get('servers', []))
+    for server in servers:
+        server['is_member'] = server['id'] in joined
+    if next_position:
+        response.headers['X-Next-Cursor'] = encode_cursor(*next_position)
+    return servers
+
+@router.get("/discover/categories")
+async def get_discovery_categories(current_user: dict = Depends(get_current_user)):
+    return [{'id': category, 'server_count': discovery_index.categories.get(category, 0)} for category in DISCOVERY_CATEGORIES]
@@ -0,0 +1,107 @@
+"""Direct message conversations, their messages and history export."""
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel
+from typing import Optional
+from ids import new_id, utcnow
+from core import db, get_current_user, attach_authors, get_messages_since, history_response, recent_messages
+
+router = APIRouter(tags=['dms'])
+
+# ================== MODELS ==================
+
+class DMCreate(BaseModel):
+    recipient_id: str
+
+class DMMessageCreate(BaseModel):
+    content: str
+    dm_id: str
+
+# ================== DM ENDPOINTS ==================
+
+@router.post("/dms")
+async def create_dm(dm_data: DMCreate, current_user: dict = Depends(get_current_user)):
+    existing = await db.dms.find_one({
+        '$or': [
+            {'participants': [current_user['id'], dm_data.recipient_id]},
+            {'participants': [dm_data.recipient_id, current_user['id']]}
+        ]
+    })
+    
+    if existing:
+        return {k: v for k, v in existing.items() if k != '_id'}
+    
+    dm_doc = {
+        'id': new_id(),
+        'participants': [current_user['id'], dm_data.recipient_id],
+        'created_at': utcnow()
+    }
+    
+    await db.dms.insert_one(dm_doc)
+    return {k: v for k, v in dm_doc.items() if k != '_id'}
+
+@router.get("/dms")
+async def get_user_dms(current_user: dict = Depends(get_current_user)):
+    dms = await db.dms.find({'participants': current_user['id']}, {'_id': 0}).to_list(100)
+    
+    for dm in dms:
+        other_ids = [p for p in dm['participants'] if p != current_user['id']]
+        others = await db.users.find({'id': {'$in': other_ids}}, {'_id': 0, 'password': 0}).to_list(10)
+        dm['participants_info'] = others
+        
+        last_msg = await db.dm_messages.find({'dm_id': dm['id']}, {'_id': 0}).sort('created_at', -1).limit(1).to_list(1)
+        dm['last_message'] = last_msg[0] if last_msg else None
+    
+    return dms
+
+@router.post("/dms/messages")
+async def send_dm_message(message_data: DMMessageCreate, current_user: dict = Depends(get_current_user)):
+    dm = await db.dms.find_one({'id': message_data.dm_id, 'participants': current_user['id']})
+    if not dm:
+        raise HTTPException(status_code=404, detail='DM not found')
+    
+    message_doc = {
+        'id': new_id(),
+        'content': message_data.content,
+        'dm_id': message_data.dm_id,
+        'author_id': current_user['id'],
+        'created_at': utcnow()
+    }
+    
+    await db.dm_messages.insert_one(message_doc)
+    
+    message_response = {k: v for k, v in message_doc.items() if k != '_id'}
+    message_response['author'] = {'id': current_user['id'], 'username': current_user['username'], 'avatar': current_user.get('avatar')}
+    recent_messages.append(f"dm:{message_data.dm_id}", message_response)
+    
+    return message_response
+
+@router.get("/dms/{dm_id}/messages")
+async def get_dm_messages(dm_id: str, limit: int = 50, since: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    limit = max(1, min(limit, 100))
+    key = f"dm:{dm_id}"
+    if since:
+        messages = recent_messages.since(key, since, limit)
+        if messages is None:
+            messages = await get_messages_since('dm_messages', 'dm_id', dm_id, since, limit)
+            await attach_authors(messages)
+        return messages
+    
+    cached = recent_messages.page(key, limit, None)
+    if cached:
+        return list(reversed(cached[0]))
+    
+    token = recent_messages.token()
+    messages = await db.dm_messages.find({'dm_id': dm_id}, {'_id': 0}).sort([('created_at', -1), ('id', -1)]).limit(limit).to_list(limit)
+    await attach_authors(messages)
+    recent_messages.prime(key, messages, len(messages) < limit, token)
+    
+    return list(reversed(messages))
+
+# ================== HISTORY EXPORT ==================
+
+@router.get("/dms/{dm_id}/export")
+async def export_dm_messages(dm_id: str, compress: bool = False, current_user: dict = Depends(get_current_user)):
+    dm = await db.dms.find_one({'id': dm_id, 'participants': current_user['id']}, {'_id': 0, 'id': 1})
+    if not dm:
+        raise HTTPException(status_code=404, detail='DM not found')
+    return history_response('dm', dm_id, compress)
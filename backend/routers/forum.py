@@ -0,0 +1,175 @@
+"""Forum categories, posts, replies and default category seeding."""
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel
+from typing import List, Optional
+from ids import new_id, utcnow
+from core import db, get_current_user, trending_ranker, notification_inbox, hot_reads, user_stats
+from trending import TRENDING_TOP_K
+
+router = APIRouter(tags=['forum'])
+
+# ================== MODELS ==================
+
+class ForumCategoryCreate(BaseModel):
+    name: str
+    description: Optional[str] = ""
+    color: Optional[str] = "#ef4444"
+    icon: Optional[str] = None
+
+class ForumPostCreate(BaseModel):
+    title: str
+    content: str
+    category_id: str
+    attachments: Optional[List[str]] = []
+
+class ForumReplyCreate(BaseModel):
+    content: str
+    post_id: str
+    attachments: Optional[List[str]] = []
+
+# ================== SHARED READS ==================
+
+async def load_categories() -> List[dict]:
+    categories = await db.forum_categories.find({}, {'_id': 0}).to_list(50)
+    
+    for cat in categories:
+        cat['posts_count'] = await db.forum_posts.count_documents({'category_id': cat['id']})
+        latest = await db.forum_posts.find({'category_id': cat['id']}, {'_id': 0}).sort('created_at', -1).limit(1).to_list(1)
+        cat['latest_post'] = latest[0] if latest else None
+    
+    return categories
+
+async def load_post(post_id: str) -> Optional[dict]:
+    post = await db.forum_posts.find_one({'id': post_id}, {'_id': 0})
+    if post:
+        author = await db.users.find_one({'id': post['author_id']}, {'_id': 0, 'id': 1, 'username': 1, 'avatar': 1})
+        if author:
+            post['author'] = author
+    return post
+
+# ================== FORUM ENDPOINTS ==================
+
+@router.get("/forum/categories")
+async def get_forum_categories(current_user: dict = Depends(get_current_user)):
+    # One count per category, so a burst of forum home page loads shares a single pass
+    return await hot_reads.do(('forum_categories',), load_categories)
+
+@router.post("/forum/categories")
+async def create_forum_category(category_data: ForumCategoryCreate, current_user: dict = Depends(get_current_user)):
+    category_doc = {
+        'id': new_id(),
+        'name': category_data.name,
+        'description': category_data.description,
+        'color': category_data.color,
+        'icon': category_data.icon,
+        'created_at': utcnow()
+    }
+    
+    await db.forum_categories.insert_one(category_doc)
+    return {k: v for k, v in category_doc.items() if k != '_id'}
+
+@router.get("/forum/posts")
+async def get_forum_posts(category_id: Optional[str] = None, limit: int = 20, skip: int = 0, current_user: dict = Depends(get_current_user)):
+    query = {'category_id': category_id} if category_id else {}
+    posts = await db.forum_posts.find(query, {'_id': 0}).sort('created_at', -1).skip(skip).limit(limit).to_list(limit)
+    
+    for post in posts:
+        author = await db.users.find_one({'id': post['author_id']}, {'_id': 0, 'password': 0})
+        if author:
+            post['author'] = {'id': author['id'], 'username': author['username'], 'avatar': author.get('avatar')}
+        post['replies_count'] = await db.forum_replies.count_documents({'post_id': post['id']})
+    
+    return posts
+
+@router.post("/forum/posts")
+async def create_forum_post(post_data: ForumPostCreate, current_user: dict = Depends(get_current_user)):
+    post_doc = {
+        'id': new_id(),
+        'title': post_data.title,
+        'content': post_data.content,
+        'category_id': post_data.category_id,
+        'author_id': current_user['id'],
+        'attachments': post_data.attachments,
+        'views': 0,
+        'likes': [],
+        'created_at': utcnow()
+    }
+    
+    await db.forum_posts.insert_one(post_doc)
+    await user_stats.increment(current_user['id'], posts=1)
+    trending_ranker.touch('forum_posts', post_doc['id'], post_doc)
+    
+    post_response = {k: v for k, v in post_doc.items() if k != '_id'}
+    post_response['author'] = {'id': current_user['id'], 'username': current_user['username'], 'avatar': current_user.get('avatar')}
+    
+    return post_response
+
+@router.get("/forum/trending")
+async def get_trending_posts(limit: int = 20, current_user: dict = Depends(get_current_user)):
+    return trending_ranker.get_top('forum_posts', max(1, min(limit, TRENDING_TOP_K)))
+
+@router.get("/forum/posts/{post_id}")
+async def get_forum_post(post_id: str, current_user: dict = Depends(get_current_user)):
+    post = await hot_reads.do(('forum_post', post_id), lambda: load_post(post_id))
+    if not post:
+        raise HTTPException(status_code=404, detail='Post not found')
+    
+    await db.forum_posts.update_one({'id': post_id}, {'$inc': {'views': 1}})
+    # No reply count on the post document, so an untracked post is loaded by the ranker
+    trending_ranker.touch('forum_posts', post_id, views=1)
+    
+    return post
+
+@router.get("/forum/posts/{post_id}/replies")
+async def get_post_replies(post_id: str, current_user: dict = Depends(get_current_user)):
+    replies = await db.forum_replies.find({'post_id': post_id}, {'_id': 0}).sort('created_at', 1).to_list(100)
+    
+    for reply in replies:
+        author = await db.users.find_one({'id': reply['author_id']}, {'_id': 0, 'password': 0})
+        if author:
+            reply['author'] = {'id': author['id'], 'username': author['username'], 'avatar': author.get('avatar')}
+    
+    return replies
+
+@router.post("/forum/posts/{post_id}/replies")
+async def create_post_reply(post_id: str, reply_data: ForumReplyCreate, current_user: dict = Depends(get_current_user)):
+    reply_doc = {
+        'id': new_id(),
+        'content': reply_data.content,
+        'post_id': post_id,
+        'author_id': current_user['id'],
+        'attachments': reply_data.attachments,
+        'created_at': utcnow()
+    }
+    
+    await db.forum_replies.insert_one(reply_doc)
+    trending_ranker.touch('forum_posts', post_id, comments=1)
+    post = await db.forum_posts.find_one({'id': post_id}, {'_id': 0, 'author_id': 1})
+    if post:
+        notification_inbox.notify(post['author_id'], 'reply', current_user['id'], {'type': 'forum_post', 'id': post_id},
+                                  preview=reply_data.content)
+    
+    reply_response = {k: v for k, v in reply_doc.items() if k != '_id'}
+    reply_response['author'] = {'id': current_user['id'], 'username': current_user['username'], 'avatar': current_user.get('avatar')}
+    
+    return reply_response
+
+# ================== SEED DEFAULT DATA ==================
+
+@router.post("/seed/forum")
+async def seed_forum_data(current_user: dict = Depends(get_current_user)):
+    # Check if categories already exist
+    existing = await db.forum_categories.count_documents({})
+    if existing > 0:
+        return {'message': 'Forum already seeded'}
+    
+    categories = [
+        {'id': new_id(), 'name': 'Updates', 'description': 'Product announcements, news, and updates', 'color': '#ef4444', 'icon': 'megaphone', 'created_at': utcnow()},
+        {'id': new_id(), 'name': 'Help and Feedback', 'description': 'Get help and share feedback', 'color': '#3b82f6', 'icon': 'help-circle', 'created_at': utcnow()},
+        {'id': new_id(), 'name': 'Creations', 'description': 'Share your creations', 'color': '#22c55e', 'icon': 'sparkles', 'created_at': utcnow()},
+        {'id': new_id(), 'name': 'Resources', 'description': 'Tutorials and resources', 'color': '#f59e0b', 'icon': 'book', 'created_at': utcnow()},
+        {'id': new_id(), 'name': 'Discussion', 'description': 'General discussion', 'color': '#8b5cf6', 'icon': 'message-circle', 'created_at': utcnow()},
+    ]
+    
+    await db.forum_categories.insert_many(categories)
+    return {'message': 'Forum seeded successfully', 'categories': len(categories)}
@@ -0,0 +1,88 @@
+"""Marketplace product listings and browsing."""
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import Response
+from pydantic import BaseModel
+from typing import List, Optional
+from ids import new_id, utcnow
+from core import db, get_current_user, get_author_map, product_catalog
+from pagination import encode_cursor, decode_cursor
+
+router = APIRouter(tags=['marketplace'])
+
+# ================== MODELS ==================
+
+class ProductCreate(BaseModel):
+    name: str
+    description: str
+    price: float
+    category: str
+    images: List[str] = []
+    file_url: Optional[str] = None
+
+# ================== SALES/MARKETPLACE ENDPOINTS ==================
+
+@router.get("/marketplace/products")
+async def get_products(
+    response: Response,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort: str = 'newest',
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    limit = max(1, min(limit, 100))
+    query = product_catalog.browse_query(category, min_price, max_price, sort, decode_cursor(cursor, 2))
+    products = await db.products.find(query, {'_id': 0}).sort(product_catalog.sort_spec(sort)).limit(limit + 1).to_list(limit + 1)
+    
+    if len(products) > limit:
+        products = products[:limit]
+        response.headers['X-Next-Cursor'] = encode_cursor(*product_catalog.cursor_values(products[-1], sort))
+    
+    sellers = await get_author_map([p['seller_id'] for p in products])
+    for product in products:
+        seller = sellers.get(product['seller_id'])
+        if seller:
+            product['seller'] = seller
+    
+    return products
+
+@router.get("/marketplace/categories")
+async def get_product_categories(current_user: dict = Depends(get_current_user)):
+    return await product_catalog.get_category_counts()
+
+@router.post("/marketplace/products")
+async def create_product(product_data: ProductCreate, current_user: dict = Depends(get_current_user)):
+    product_doc = {
+        'id': new_id(),
+        'name': product_data.name,
+        'description': product_data.description,
+        'price': product_data.price,
+        'category': product_data.category,
+        'images': product_data.images,
+        'file_url': product_data.file_url,
+        'seller_id': current_user['id'],
+        'sales_count': 0,
+        'created_at': utcnow()
+    }
+    
+    await db.products.insert_one(product_doc)
+    product_catalog.record(product_doc['category'])
+    
+    product_response = {k: v for k, v in product_doc.items() if k != '_id'}
+    product_response['seller'] = {'id': current_user['id'], 'username': current_user['username'], 'avatar': current_user.get('avatar')}
+    
+    return product_response
+
+@router.get("/marketplace/products/{product_id}")
+async def get_product(product_id: str, current_user: dict = Depends(get_current_user)):
+    product = await db.products.find_one({'id': product_id}, {'_id': 0})
+    if not product:
+        raise HTTPException(status_code=404, detail='Product not found')
+    
+    seller = await db.users.find_one({'id': product['seller_id']}, {'_id': 0, 'password': 0})
+    if seller:
+        product['seller'] = {'id': seller['id'], 'username': seller['username'], 'avatar': seller.get('avatar')}
+    
+    return product
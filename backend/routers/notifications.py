@@ -0,0 +1,34 @@
+"""The notification inbox: newest-first pages, unread count and read receipts."""
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+from typing import List, Optional
+from core import get_current_user, notification_inbox
+from pagination import encode_cursor, decode_cursor
+
+router = APIRouter(tags=['notifications'])
+
+# ================== MODELS ==================
+
+class NotificationsRead(BaseModel):
+    # Omitted: mark every notification read
+    ids: Optional[List[str]] = None
+
+# ================== NOTIFICATION ENDPOINTS ==================
+
+@router.get("/notifications")
+async def get_notifications(limit: int = 20, cursor: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    limit = max(1, min(limit, 100))
+    notifications, next_position = await notification_inbox.page(current_user['id'], limit, decode_cursor(cursor, 2))
+    return {
+        'notifications': notifications,
+        'unread_count': await notification_inbox.unread_count(current_user['id']),
+        'next_cursor': encode_cursor(*next_position) if next_position else None,
+    }
+
+@router.get("/notifications/unread-count")
+async def get_unread_notification_count(current_user: dict = Depends(get_current_user)):
+    return {'unread_count': await notification_inbox.unread_count(current_user['id'])}
+
+@router.post("/notifications/read")
+async def mark_notifications_read(read: NotificationsRead, current_user: dict = Depends(get_current_user)):
+    return {'unread_count': await notification_inbox.mark_read(current_user['id'], read.ids)}
@@ -0,0 +1,218 @@
+"""Reels: creation, the global, following and trending feeds, likes and threaded comments."""
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import Response
+from pydantic import BaseModel
+from typing import Optional
+from ids import new_id, utcnow
+from core import (db, get_current_user, get_author_map, feed_service, trending_ranker, reel_comments, job_queue,
+                  notification_inbox, hot_reads, user_stats)
+from trending import TRENDING_TOP_K
+from pagination import encode_cursor, decode_cursor
+
+router = APIRouter(tags=['reels'])
+
+# ================== MODELS ==================
+
+class ReelCreate(BaseModel):
+    title: str
+    description: Optional[str] = ""
+    video_url: str
+    thumbnail_url: Optional[str] = None
+
+class CommentCreate(BaseModel):
+    content: str
+    reel_id: str
+    parent_id: Optional[str] = None
+
+# ================== SHARED READS ==================
+
+async def load_reel(reel_id: str) -> Optional[dict]:
+    # Shared by every concurrent get_reel for this id, so nothing per-user goes in here
+    reel = await db.reels.find_one({'id': reel_id}, {'_id': 0})
+    if reel:
+        author = await db.users.find_one({'id': reel['author_id']}, {'_id': 0, 'id': 1, 'username': 1, 'avatar': 1})
+        if author:
+            reel['author'] = author
+        reel['likes_count'] = len(reel.get('likes', []))
+    return reel
+
+# ================== REELS ENDPOINTS ==================
+
+@router.post("/reels")
+async def create_reel(reel_data: ReelCreate, current_user: dict = Depends(get_current_user)):
+    reel_doc = {
+        'id': new_id(),
+        'title': reel_data.title,
+        'description': reel_data.description,
+        'video_url': reel_data.video_url,
+        'thumbnail_url': reel_data.thumbnail_url,
+        'author_id': current_user['id'],
+        'likes': [],
+        'views': 0,
+        'comments_count': 0,
+        'created_at': utcnow()
+    }
+    
+    await db.reels.insert_one(reel_doc)
+    await user_stats.increment(current_user['id'], reels=1)
+    await job_queue.enqueue('feed.fan_out', {'reel_id': reel_doc['id']}, key=f"fan-out:{reel_doc['id']}")
+    trending_ranker.touch('reels', reel_doc['id'], reel_doc)
+    
+    reel_response = {k: v for k, v in reel_doc.items() if k != '_id'}
+    reel_response['author'] = {'id': current_user['id'], 'username': current_user['username'], 'avatar': current_user.get('avatar')}
+    reel_response['likes_count'] = 0
+    reel_response['is_liked'] = False
+    
+    return reel_response
+
+@router.get("/reels")
+async def get_reels(limit: int = 20, skip: int = 0, current_user: dict = Depends(get_current_user)):
+    reels = await db.reels.find({}, {'_id': 0}).sort('created_at', -1).skip(skip).limit(limit).to_list(limit)
+    authors = await get_author_map([reel['author_id'] for reel in reels])
+    
+    for reel in reels:
+        author = authors.get(reel['author_id'])
+        if author:
+            reel['author'] = {'id': author['id'], 'username': author['username'], 'avatar': author.get('avatar')}
+        reel['likes_count'] = len(reel.get('likes', []))
+        reel['is_liked'] = current_user['id'] in reel.get('likes', [])
+    
+    return reels
+
+@router.get("/reels/following")
+async def get_following_reels(limit: int = 20, cursor: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    limit = max(1, min(limit, 50))
+    entries, next_position = await feed_service.get_page(current_user, limit, decode_cursor(cursor, 2))
+    
+    reel_ids = [e['reel_id'] for e in entries]
+    reels_by_id = {r['id']: r for r in await db.reels.find({'id': {'$in': reel_ids}}, {'_id': 0}).to_list(len(reel_ids))}
+    authors = await get_author_map([r['author_id'] for r in reels_by_id.values()])
+    
+    reels = []
+    for reel_id in reel_ids:
+        reel = reels_by_id.get(reel_id)
+        if not reel:
+            continue
+        reel['author'] = authors.get(reel['author_id'])
+        reel['likes_count'] = len(reel.get('likes', []))
+        reel['is_liked'] = current_user['id'] in reel.get('likes', [])
+        reels.append(reel)
+    
+    return {'reels': reels, 'next_cursor': encode_cursor(*next_position) if next_position else None}
+
+@router.get("/reels/trending")
+async def get_trending_reels(limit: int = 20, current_user: dict = Depends(get_current_user)):
+    reels = trending_ranker.get_top('reels', max(1, min(limit, TRENDING_TOP_K)))
+    
+    reel_ids = [r['id'] for r in reels]
+    liked = await db.reels.find({'id': {'$in': reel_ids}, 'likes': current_user['id']}, {'_id': 0, 'id': 1}).to_list(len(reel_ids))
+    liked_ids = {r['id'] for r in liked}
+    for reel in reels:
+        reel['is_liked'] = reel['id'] in liked_ids
+    
+    return reels
+
+@router.get("/reels/{reel_id}")
+async def get_reel(reel_id: str, current_user: dict = Depends(get_current_user)):
+    reel = await hot_reads.do(('reel', reel_id), lambda: load_reel(reel_id))
+    if not reel:
+        raise HTTPException(status_code=404, detail='Reel not found')
+    reel = dict(reel)
+    
+    # Increment views
+    await db.reels.update_one({'id': reel_id}, {'$inc': {'views': 1}})
+    trending_ranker.touch('reels', reel_id, reel, views=1)
+    user_stats.count_view(reel['author_id'])
+    
+    reel['is_liked'] = current_user['id'] in reel.get('likes', [])
+    
+    return reel
+
+@router.post("/reels/{reel_id}/like")
+async def like_reel(reel_id: str, current_user: dict = Depends(get_current_user)):
+    reel = await db.reels.find_one({'id': reel_id})
+    if not reel:
+        raise HTTPException(status_code=404, detail='Reel not found')
+    
+    if current_user['id'] in reel.get('likes', []):
+        unliked = await db.reels.update_one({'id': reel_id}, {'$pull': {'likes': current_user['id']}})
+        # A concurrent unlike may have pulled it already; only the one that did counts it
+        if unliked.modified_count:
+            trending_ranker.touch('reels', reel_id, reel, likes=-1)
+            await user_stats.increment(reel['author_id'], reel_likes=-1)
+        return {'liked': False}
+    else:
+        # Guarded so a double tap can't push the same like twice or count it twice
+        liked = await db.reels.update_one({'id': reel_id, 'likes': {'$ne': current_user['id']}}, {'$push': {'likes': current_user['id']}})
+        if liked.modified_count:
+            trending_ranker.touch('reels', reel_id, reel, likes=1)
+            await user_stats.increment(reel['author_id'], reel_likes=1)
+            notification_inbox.notify(reel['author_id'], 'like', current_user['id'], {'type': 'reel', 'id': reel_id})
+        return {'liked': True}
+
+@router.get("/reels/{reel_id}/comments")
+async def get_reel_comments(reel_id: str, response: Response, limit: int = 100, cursor: Optional[str] = None,
+                            current_user: dict = Depends(get_current_user)):
+    limit = max(1, min(limit, 100))
+    comments, next_position = await reel_comments.page(reel_id, None, current_user['id'], limit, decode_cursor(cursor, 2))
+    if next_position:
+        response.headers['X-Next-Cursor'] = encode_cursor(*next_position)
+    return comments
+
+@router.get("/reels/{reel_id}/comments/{comment_id}/replies")
+async def get_comment_replies(reel_id: str, comment_id: str, limit: int = 20, cursor: Optional[str] = None,
+                              current_user: dict = Depends(get_current_user)):
+    limit = max(1, min(limit, 100))
+    replies, next_position = await reel_comments.page(reel_id, comment_id, current_user['id'], limit, decode_cursor(cursor, 2))
+    return {'replies': replies, 'next_cursor': encode_cursor(*next_position) if next_position else None}
+
+@router.post("/reels/{reel_id}/comments")
+async def add_reel_comment(reel_id: str, comment_data: CommentCreate, current_user: dict = Depends(get_current_user)):
+    reel = await db.reels.find_one({'id': reel_id})
+    if not reel:
+        raise HTTPException(status_code=404, detail='Reel not found')
+    
+    # Threads are one level deep: replying to a reply joins its parent's thread
+    parent_id = None
+    if comment_data.parent_id:
+        parent = await db.reel_comments.find_one({'id': comment_data.parent_id, 'reel_id': reel_id}, {'_id': 0, 'id': 1, 'parent_id': 1, 'author_id': 1})
+        if not parent:
+            raise HTTPException(status_code=404, detail='Comment not found')
+        parent_id = parent.get('parent_id') or parent['id']
+    
+    comment_doc = {
+        'id': new_id(),
+        'content': comment_data.content,
+        'reel_id': reel_id,
+        'parent_id': parent_id,
+        'author_id': current_user['id'],
+        'likes': [],
+        'likes_count': 0,
+        'reply_count': 0,
+        'created_at': utcnow()
+    }
+    
+    await reel_comments.add(comment_doc)
+    await job_queue.enqueue('reel_comments.count', {'comment_id': comment_doc['id']}, key=f"comment:{comment_doc['id']}")
+    trending_ranker.touch('reels', reel_id, reel, comments=1)
+    notification_inbox.notify(reel['author_id'], 'comment', current_user['id'], {'type': 'reel', 'id': reel_id},
+                              preview=comment_data.content)
+    if parent_id:
+        # The target is the comment replied to; ``thread_id`` is the top-level comment whose replies list it
+        notification_inbox.notify(parent['author_id'], 'reply', current_user['id'],
+                                  {'type': 'reel_comment', 'id': parent['id'], 'thread_id': parent_id, 'reel_id': reel_id},
+                                  preview=comment_data.content)
+    
+    comment_response = {k: v for k, v in comment_doc.items() if k not in ('_id', 'likes')}
+    comment_response['is_liked'] = False
+    comment_response['author'] = {'id': current_user['id'], 'username': current_user['username'], 'avatar': current_user.get('avatar')}
+    
+    return comment_response
+
+@router.post("/reels/{reel_id}/comments/{comment_id}/like")
+async def like_reel_comment(reel_id: str, comment_id: str, current_user: dict = Depends(get_current_user)):
+    result = await reel_comments.toggle_like(reel_id, comment_id, current_user['id'])
+    if result is None:
+        raise HTTPException(status_code=404, detail='Comment not found')
+    liked, likes_count = result
+    return {'liked': liked, 'likes_count': likes_count}
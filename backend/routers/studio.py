@@ -0,0 +1,169 @@
+"""Studio projects, their versioned asset storage and templates."""
+from fastapi import APIRouter, HTTPException, Depends, Request, UploadFile, File
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
+from ids import new_id, utcnow
+from core import db, get_current_user, asset_store, placeholder_url
+from asset_store import VersionConflict
+
+router = APIRouter(tags=['studio'])
+
+# ================== MODELS ==================
+
+class StudioProjectCreate(BaseModel):
+    name: str
+    description: Optional[str] = ""
+    thumbnail: Optional[str] = None
+    project_type: str = "game"
+
+class ChunkCheck(BaseModel):
+    hashes: List[str]
+
+class ManifestFile(BaseModel):
+    path: str
+    chunks: List[str]
+
+class VersionCreate(BaseModel):
+    base_version: int
+    files: List[ManifestFile]
+
+# ================== STUDIO ENDPOINTS ==================
+
+@router.get("/studio/projects")
+async def get_studio_projects(current_user: dict = Depends(get_current_user)):
+    projects = await db.studio_projects.find({'owner_id': current_user['id']}, {'_id': 0}).sort('updated_at', -1).to_list(50)
+    return projects
+
+@router.post("/studio/projects")
+async def create_studio_project(project_data: StudioProjectCreate, current_user: dict = Depends(get_current_user)):
+    project_doc = {
+        'id': new_id(),
+        'name': project_data.name,
+        'description': project_data.description,
+        'thumbnail': project_data.thumbnail or placeholder_url(300, 200, 'Project'),
+        'project_type': project_data.project_type,
+        'owner_id': current_user['id'],
+        'collaborators': [],
+        'is_public': False,
+        'plays': 0,
+        'likes': 0,
+        'created_at': utcnow(),
+        'updated_at': utcnow()
+    }
+    
+    await db.studio_projects.insert_one(project_doc)
+    return {k: v for k, v in project_doc.items() if k != '_id'}
+
+# ================== STUDIO ASSETS ==================
+
+UPLOAD_READ_SIZE = 1024 * 1024
+
+async def get_editable_project(project_id: str, current_user: dict) -> dict:
+    project = await db.studio_projects.find_one({'id': project_id}, {'_id': 0})
+    if not project:
+        raise HTTPException(status_code=404, detail='Project not found')
+    if current_user['id'] != project['owner_id'] and current_user['id'] not in project.get('collaborators', []):
+        raise HTTPException(status_code=403, detail='Not a collaborator on this project')
+    return project
+
+async def get_manifest(project_id: str, version: int) -> dict:
+    manifest = await asset_store.manifest(project_id, version)
+    if not manifest:
+        raise HTTPException(status_code=404, detail='Version not found')
+    return manifest
+
+async def record_version(project_id: str, manifest: dict):
+    await db.studio_projects.update_one({'id': project_id}, {
+        '$set': {'updated_at': manifest['created_at'], 'size': manifest['size']},
+        '$max': {'current_version': manifest['version']}
+    })
+
+def version_summary(manifest: dict, **extra) -> dict:
+    return {**{k: v for k, v in manifest.items() if k != 'files'}, **extra}
+
+@router.post("/studio/projects/{project_id}/chunks/missing")
+async def get_missing_chunks(project_id: str, check: ChunkCheck, current_user: dict = Depends(get_current_user)):
+    await get_editable_project(project_id, current_user)
+    try:
+        return {'missing': await asset_store.missing_chunks(project_id, check.hashes)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.put("/studio/projects/{project_id}/chunks/{chunk_hash}")
+async def upload_chunk(project_id: str, chunk_hash: str, request: Request, current_user: dict = Depends(get_current_user)):
+    await get_editable_project(project_id, current_user)
+    try:
+        stored = await asset_store.put_chunk(project_id, chunk_hash, await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'hash': chunk_hash, 'stored': stored}
+
+@router.post("/studio/projects/{project_id}/versions")
+async def create_project_version(project_id: str, version_data: VersionCreate, current_user: dict = Depends(get_current_user)):
+    await get_editable_project(project_id, current_user)
+    try:
+        manifest = await asset_store.commit(project_id, current_user['id'], version_data.base_version,
+                                            [f.model_dump() for f in version_data.files])
+    except VersionConflict:
+        raise HTTPException(status_code=409, detail='Project was saved by someone else; reload and retry')
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await record_version(project_id, manifest)
+    return version_summary(manifest)
+
+@router.put("/studio/projects/{project_id}/files/{path:path}")
+async def save_project_file(project_id: str, path: str, base_version: int, file: UploadFile = File(...),
+                            current_user: dict = Depends(get_current_user)):
+    # For clients that can't chunk locally: the file is uploaded whole, but only its changed chunks are stored
+    await get_editable_project(project_id, current_user)
+    
+    async def blocks():
+        while block := await file.read(UPLOAD_READ_SIZE):
+            yield block
+    
+    try:
+        manifest, stored = await asset_store.save_file(project_id, current_user['id'], base_version, path, blocks())
+    except VersionConflict:
+        raise HTTPException(status_code=409, detail='Project was saved by someone else; reload and retry')
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await record_version(project_id, manifest)
+    return version_summary(manifest, stored_bytes=stored)
+
+@router.get("/studio/projects/{project_id}/versions")
+async def get_project_versions(project_id: str, limit: int = 50, current_user: dict = Depends(get_current_user)):
+    await get_editable_project(project_id, current_user)
+    return await asset_store.list_versions(project_id, max(1, min(limit, 100)))
+
+@router.get("/studio/projects/{project_id}/versions/{version}")
+async def get_project_version(project_id: str, version: int, current_user: dict = Depends(get_current_user)):
+    await get_editable_project(project_id, current_user)
+    return await get_manifest(project_id, version)
+
+@router.get("/studio/projects/{project_id}/versions/{version}/files/{path:path}")
+async def download_project_file(project_id: str, version: int, path: str, current_user: dict = Depends(get_current_user)):
+    await get_editable_project(project_id, current_user)
+    manifest = await get_manifest(project_id, version)
+    file = next((f for f in manifest['files'] if f['path'] == path), None)
+    if not file:
+        raise HTTPException(status_code=404, detail='File not found')
+    return StreamingResponse(asset_store.iter_file(project_id, file), media_type='application/octet-stream',
+                             headers={'Content-Length': str(file['size'])})
+
+@router.get("/studio/projects/{project_id}/versions/{version}/archive")
+async def download_project_version(project_id: str, version: int, current_user: dict = Depends(get_current_user)):
+    await get_editable_project(project_id, current_user)
+    manifest = await get_manifest(project_id, version)
+    return StreamingResponse(asset_store.iter_archive(project_id, manifest), media_type='application/x-tar',
+                             headers={'Content-Disposition': f'attachment; filename="project-{project_id}-v{version}.tar"'})
+
+@router.get("/studio/templates")
+async def get_studio_templates(current_user: dict = Depends(get_current_user)):
+    templates = [
+        {'id': '1', 'name': 'Obby Template', 'description': 'Classic obstacle course', 'thumbnail': placeholder_url(300, 200, 'Obby'), 'category': 'game'},
+        {'id': '2', 'name': 'Tycoon Base', 'description': 'Build your empire', 'thumbnail': placeholder_url(300, 200, 'Tycoon'), 'category': 'game'},
+        {'id': '3', 'name': 'Simulator Kit', 'description': 'Click simulator starter', 'thumbnail': placeholder_url(300, 200, 'Simulator'), 'category': 'game'},
+        {'id': '4', 'name': 'Roleplay Map', 'description': 'Town roleplay base', 'thumbnail': placeholder_url(300, 200, 'Roleplay'), 'category': 'game'},
+    ]
+    return templates
@@ -0,0 +1,63 @@
+"""File uploads to Cloudinary; the SDK is imported and configured on the first upload."""
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+import asyncio
+import os
+import logging
+from functools import lru_cache
+from core import get_current_user, throttled
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=['uploads'])
+
+# ================== FILE UPLOAD ==================
+
+@lru_cache(maxsize=1)
+def get_cloudinary_uploader():
+    import cloudinary
+    import cloudinary.uploader
+    cloudinary.config( 
+      cloud_name = os.environ.get('CLOUDINARY_CLOUD_NAME'), 
+      api_key = os.environ.get('CLOUDINARY_API_KEY'), 
+      api_secret = os.environ.get('CLOUDINARY_API_SECRET'),
+      secure = True
+    )
+    return cloudinary.uploader
+
+@router.post("/upload/{upload_type}", dependencies=[Depends(throttled('upload'))])
+async def upload_file(upload_type: str, file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+    if upload_type not in ['avatars', 'videos', 'images', 'files']:
+        raise HTTPException(status_code=400, detail='Invalid upload type')
+    
+    # Upload to Cloudinary
+    try:
+        # Determine resource type
+        resource_type = "auto"
+        if upload_type == "images" or upload_type == "avatars":
+            resource_type = "image"
+        elif upload_type == "videos":
+            resource_type = "video"
+            
+        # Read file content
+        content = await file.read()
+        
+        # Upload; the SDK blocks, so it runs in a worker thread instead of stalling the event loop
+        result = await asyncio.to_thread(
+            get_cloudinary_uploader().upload,
+            content, 
+            folder=f"notfox/{upload_type}", 
+            resource_type=resource_type
+        )
+        
+        file_url = result.get("secure_url")
+        return {'url': file_url, 'filename': file.filename}
+        
+    except Exception as e:
+        logger.error(f"Upload failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+@router.get("/files/{upload_type}/{filename}")
+async def get_file(upload_type: str, filename: str):
+    # Deprecated: Files are now served directly from Cloudinary
+    # This endpoint remains for backward compatibility if needed, but won't work on Vercel for new uploads
+    pass
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from metrics import SINGLE_FLIGHT_CALLS
+
+
+class SingleFlight:
+    """Shares one in-flight load between concurrent identical reads.
+
+    Calls are keyed by query shape, ``(name, *arguments)``: the first caller
+    for a key starts the load and everyone arriving before it finishes awaits
+    the same task, so a burst of requests for one viral reel costs one set of
+    queries. Nothing is kept once the load completes; this is not a cache.
+
+    The load runs as its own task, so a caller that disconnects doesn't
+    cancel it for the others, and an exception reaches every waiter. The
+    result is shared: callers copy it before adding per-user fields.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Tuple[Hashable, ...], asyncio.Task] = {}
+
+    async def do(self, key: Tuple[Hashable, ...], load: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            SINGLE_FLIGHT_CALLS.inc(key[0], 'leader')
+            flight = self._flights[key] = asyncio.ensure_future(load())
+            flight.add_done_callback(lambda task: self._landed(key, task))
+        else:
+            SINGLE_FLIGHT_CALLS.inc(key[0], 'shared')
+        return await asyncio.shield(flight)
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def _landed(self, key: Tuple[Hashable, ...], task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            # Retrieved here so a failure nobody waited for isn't logged as "never retrieved"
+            task.exception()
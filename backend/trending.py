@@ -0,0 +1,195 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from ids import parse_timestamp, utcnow
+from pagination import time_clause
+
+logger = logging.getLogger(__name__)
+
+TRENDING_TOP_K = 50
+TRENDING_REFRESH_SECONDS = 60
+TRENDING_WINDOW_DAYS = 7
+# Candidates kept in memory per kind; the lowest scoring are dropped past this
+TRENDING_MAX_CANDIDATES = 20000
+# Hacker News style gravity: score = weighted engagement / (age_hours + 2) ** gravity
+TRENDING_GRAVITY = 1.5
+
+TRENDING_KINDS = {
+    'reels': {
+        'collection': 'reels',
+        'weights': {'likes': 3.0, 'comments': 5.0, 'views': 0.1},
+    },
+    'forum_posts': {
+        'collection': 'forum_posts',
+        'weights': {'likes': 3.0, 'comments': 4.0, 'views': 0.2},
+    },
+}
+
+
+def decay_score(candidate: dict, weights: Dict[str, float], now: datetime) -> float:
+    engagement = sum(candidate[field] * weight for field, weight in weights.items())
+    age_hours = max(0.0, (now - candidate['created_at']).total_seconds() / 3600)
+    return engagement / (age_hours + 2) ** TRENDING_GRAVITY
+
+
+class TrendingRanker:
+    """Time-decayed top-K lists for reels and forum posts.
+
+    Engagement counters for recent items are kept in memory and updated by the
+    like, comment and view paths through ``touch``. A background loop rescores
+    the candidates, hydrates the top K and persists them to the ``trending``
+    collection, so the endpoints only ever read the precomputed snapshot.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.candidates: Dict[str, Dict[str, dict]] = {kind: {} for kind in TRENDING_KINDS}
+        self.pending: Dict[str, set] = {kind: set() for kind in TRENDING_KINDS}
+        self.top: Dict[str, List[dict]] = {kind: [] for kind in TRENDING_KINDS}
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        for config in TRENDING_KINDS.values():
+            await self.db[config['collection']].create_index([('created_at', -1)])
+        await self.db.forum_replies.create_index([('post_id', 1), ('created_at', 1)])
+        await self.db.trending.create_index('kind', unique=True)
+
+    async def load(self):
+        # Serve the last persisted lists straight away, then rebuild candidates from the window
+        async for snapshot in self.db.trending.find({}, {'_id': 0}):
+            if snapshot['kind'] in self.top:
+                self.top[snapshot['kind']] = snapshot.get('items', [])
+
+        cutoff = utcnow() - timedelta(days=TRENDING_WINDOW_DAYS)
+        for kind in TRENDING_KINDS:
+            docs = await self._fetch(kind, time_clause('created_at', '$gte', cutoff), TRENDING_MAX_CANDIDATES)
+            for doc in docs:
+                self.candidates[kind][doc['id']] = doc
+
+    def touch(self, kind: str, item_id: str, doc: Optional[dict] = None, likes: int = 0, comments: int = 0, views: int = 0):
+        """Apply engagement deltas; ``doc`` seeds the counters of an item not yet tracked."""
+        candidate = self.candidates[kind].get(item_id)
+        if candidate is None:
+            if doc is None:
+                self.pending[kind].add(item_id)
+                return
+            candidate = self._candidate(doc)
+            if candidate is None:
+                return
+            self.candidates[kind][item_id] = candidate
+        candidate['likes'] += likes
+        candidate['comments'] += comments
+        candidate['views'] += views
+
+    def get_top(self, kind: str, limit: int) -> List[dict]:
+        return [dict(item) for item in self.top[kind][:limit]]
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Trending refresh failed: {str(e)}")
+            await asyncio.sleep(TRENDING_REFRESH_SECONDS)
+
+    async def refresh(self):
+        now = utcnow()
+        cutoff = now - timedelta(days=TRENDING_WINDOW_DAYS)
+        for kind, config in TRENDING_KINDS.items():
+            candidates = self.candidates[kind]
+
+            if self.pending[kind]:
+                pending, self.pending[kind] = list(self.pending[kind]), set()
+                for doc in await self._fetch(kind, {'id': {'$in': pending}}, len(pending)):
+                    candidates.setdefault(doc['id'], doc)
+
+            for item_id in [i for i, c in candidates.items() if c['created_at'] < cutoff]:
+                del candidates[item_id]
+
+            scores = {item_id: decay_score(c, config['weights'], now) for item_id, c in candidates.items()}
+            if len(candidates) > TRENDING_MAX_CANDIDATES:
+                keep = set(heapq.nlargest(TRENDING_MAX_CANDIDATES, scores, key=scores.get))
+                for item_id in [i for i in candidates if i not in keep]:
+                    del candidates[item_id]
+
+            top_ids = heapq.nlargest(TRENDING_TOP_K, scores, key=scores.get)
+            items = await self._hydrate(kind, top_ids, scores)
+            self.top[kind] = items
+            await self.db.trending.update_one(
+                {'kind': kind},
+                {'$set': {'kind': kind, 'items': items, 'updated_at': now}},
+                upsert=True
+            )
+
+    async def _fetch(self, kind: str, query: dict, limit: int) -> List[dict]:
+        collection = self.db[TRENDING_KINDS[kind]['collection']]
+        docs = await collection.aggregate([
+            {'$match': query},
+            {'$sort': {'created_at': -1}},
+            {'$limit': limit},
+            # Only the size of the likes array leaves the server
+            {'$project': {'_id': 0, 'id': 1, 'created_at': 1, 'views': 1, 'comments_count': 1, 'likes_count': {'$size': {'$ifNull': ['$likes', []]}}}},
+        ]).to_list(limit)
+
+        if kind == 'forum_posts' and docs:
+            # Forum posts don't store a reply counter, so count them in one aggregation
+            replies = await self.db.forum_replies.aggregate([
+                {'$match': {'post_id': {'$in': [d['id'] for d in docs]}}},
+                {'$group': {'_id': '$post_id', 'count': {'$sum': 1}}},
+            ]).to_list(None)
+            counts = {r['_id']: r['count'] for r in replies}
+            for doc in docs:
+                doc['comments_count'] = counts.get(doc['id'], 0)
+
+        return [c for c in (self._candidate(doc) for doc in docs) if c is not None]
+
+    def _candidate(self, doc: dict) -> Optional[dict]:
+        try:
+            created_at = parse_timestamp(doc['created_at'])
+        except (KeyError, TypeError, ValueError):
+            return None
+        likes = doc['likes_count'] if 'likes_count' in doc else len(doc.get('likes', []))
+        return {
+            'id': doc['id'],
+            'created_at': created_at,
+            'likes': likes,
+            'comments': doc.get('comments_count', 0),
+            'views': doc.get('views', 0),
+        }
+
+    async def _hydrate(self, kind: str, item_ids: List[str], scores: Dict[str, float]) -> List[dict]:
+        if not item_ids:
+            return []
+        collection = self.db[TRENDING_KINDS[kind]['collection']]
+        docs = await collection.find({'id': {'$in': item_ids}}, {'_id': 0, 'likes': 0}).to_list(len(item_ids))
+        docs_by_id = {doc['id']: doc for doc in docs}
+
+        author_ids = list({doc['author_id'] for doc in docs})
+        authors = await self.db.users.find({'id': {'$in': author_ids}}, {'_id': 0, 'id': 1, 'username': 1, 'avatar': 1}).to_list(len(author_ids))
+        authors_by_id = {author['id']: author for author in authors}
+
+        items = []
+        for item_id in item_ids:
+            doc = docs_by_id.get(item_id)
+            if not doc:
+                continue
+            candidate = self.candidates[kind][item_id]
+            doc['author'] = authors_by_id.get(doc['author_id'])
+            doc['likes_count'] = candidate['likes']
+            doc['comments_count'] = candidate['comments']
+            doc['views'] = candidate['views']
+            doc['trending_score'] = round(scores[item_id], 6)
+            items.append(doc)
+        return items
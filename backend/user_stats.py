@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from ids import utcnow
+
+logger = logging.getLogger(__name__)
+
+USER_STATS_FIELDS = ('reels', 'posts', 'followers', 'following', 'reel_views', 'reel_likes')
+# Reel views are summed in memory and written this often
+USER_STATS_FLUSH_SECONDS = 2.0
+# Every this often, the least recently reconciled documents are recomputed from the source collections
+USER_STATS_RECONCILE_SECONDS = 300
+USER_STATS_RECONCILE_BATCH = 500
+
+
+class UserStats:
+    """Materialized per-user counters for profile pages.
+
+    One ``user_stats`` document per user holds USER_STATS_FIELDS, so a
+    profile view reads it instead of counting reels and posts. Creates,
+    likes and follows keep it current with ``$inc`` through ``increment``;
+    reel views arrive at read rate, so ``count_view`` sums them in memory
+    and a flusher writes them with one bulk ``$inc`` every
+    USER_STATS_FLUSH_SECONDS. Pending views are added on reads.
+
+    Increments never create a document, so a user who predates this never
+    gets a partial count: the document is created with zeros at signup, or
+    computed from the source collections on first read. A reconciler
+    recomputes USER_STATS_RECONCILE_BATCH of the least recently reconciled
+    documents every USER_STATS_RECONCILE_SECONDS and overwrites any drift,
+    such as an increment lost to a crash. An increment that lands while its
+    user is being recomputed may be lost until the next pass.
+    """
+
+    def __init__(self, db, flush_seconds: float = USER_STATS_FLUSH_SECONDS,
+                 reconcile_seconds: float = USER_STATS_RECONCILE_SECONDS, reconcile_batch: int = USER_STATS_RECONCILE_BATCH):
+        self.db = db
+        self.flush_seconds = flush_seconds
+        self.reconcile_seconds = reconcile_seconds
+        self.reconcile_batch = reconcile_batch
+        # user id -> reel views not yet written
+        self.pending_views: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        await self.db.user_stats.create_index('user_id', unique=True)
+        await self.db.user_stats.create_index('reconciled_at')
+        # For the reconciler's post counts; reels are already indexed by author for the feed
+        await self.db.forum_posts.create_index('author_id')
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write pending views, then stop the flusher and reconciler."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        next_reconcile = time.monotonic() + self.reconcile_seconds
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"User stats flush failed: {str(e)}")
+            if time.monotonic() >= next_reconcile:
+                next_reconcile = time.monotonic() + self.reconcile_seconds
+                try:
+                    await self.reconcile()
+                except Exception as e:
+                    logger.error(f"User stats reconcile failed: {str(e)}")
+
+    # ---------- writes ----------
+
+    async def create(self, user_id: str):
+        """Zeroed stats for a new user."""
+        await self.db.user_stats.update_one(
+            {'user_id': user_id},
+            {'$setOnInsert': {**{field: 0 for field in USER_STATS_FIELDS}, 'reconciled_at': utcnow()}},
+            upsert=True
+        )
+
+    async def increment(self, user_id: str, **deltas: int):
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if deltas:
+            await self.db.user_stats.update_one({'user_id': user_id}, {'$inc': deltas})
+
+    def count_view(self, user_id: str):
+        self.pending_views[user_id] = self.pending_views.get(user_id, 0) + 1
+
+    async def flush(self) -> int:
+        if not self.pending_views:
+            return 0
+        views, self.pending_views = self.pending_views, {}
+        try:
+            await self.db.user_stats.bulk_write(
+                [UpdateOne({'user_id': user_id}, {'$inc': {'reel_views': count}}) for user_id, count in views.items()],
+                ordered=False
+            )
+        except BaseException:
+            for user_id, count in views.items():
+                self.pending_views[user_id] = self.pending_views.get(user_id, 0) + count
+            raise
+        return len(views)
+
+    # ---------- reads ----------
+
+    async def get(self, user_id: str) -> dict:
+        stats = await self.db.user_stats.find_one({'user_id': user_id}, {'_id': 0, **{field: 1 for field in USER_STATS_FIELDS}})
+        if stats is None:
+            stats = await self.compute(user_id)
+            stats['reel_views'] -= self.pending_views.get(user_id, 0)
+            # Another request may have created it meanwhile; its counts are as good as these
+            await self.db.user_stats.update_one(
+                {'user_id': user_id}, {'$setOnInsert': {**stats, 'reconciled_at': utcnow()}}, upsert=True)
+        stats = {field: stats.get(field, 0) for field in USER_STATS_FIELDS}
+        stats['reel_views'] += self.pending_views.get(user_id, 0)
+        return stats
+
+    # ---------- reconciliation ----------
+
+    async def compute(self, user_id: str) -> dict:
+        """Counts straight from the source collections."""
+        reel_totals, posts, follows = await asyncio.gather(
+            self.db.reels.aggregate([
+                {'$match': {'author_id': user_id}},
+                {'$group': {'_id': None, 'reels': {'$sum': 1}, 'reel_views': {'$sum': '$views'},
+                            'reel_likes': {'$sum': {'$size': {'$ifNull': ['$likes', []]}}}}},
+            ]).to_list(1),
+            self.db.forum_posts.count_documents({'author_id': user_id}),
+            self.db.users.aggregate([
+                {'$match': {'id': user_id}},
+                {'$project': {'_id': 0, 'followers': {'$size': {'$ifNull': ['$followers', []]}},
+                              'following': {'$size': {'$ifNull': ['$following', []]}}}},
+            ]).to_list(1),
+        )
+        totals = reel_totals[0] if reel_totals else {}
+        follow_counts = follows[0] if follows else {}
+        return {
+            'reels': totals.get('reels', 0),
+            'posts': posts,
+            'followers': follow_counts.get('followers', 0),
+            'following': follow_counts.get('following', 0),
+            'reel_views': totals.get('reel_views', 0),
+            'reel_likes': totals.get('reel_likes', 0),
+        }
+
+    async def reconcile(self, limit: Optional[int] = None) -> int:
+        """Recompute the least recently reconciled documents; returns how many had drifted."""
+        limit = limit or self.reconcile_batch
+        docs = await self.db.user_stats.find({}, {'_id': 0}).sort('reconciled_at', 1).limit(limit).to_list(limit)
+        drifted: List[str] = []
+        operations = []
+        for doc in docs:
+            stats = await self.compute(doc['user_id'])
+            # Views still pending here are already on the reels and will be added by the next flush
+            stats['reel_views'] -= self.pending_views.get(doc['user_id'], 0)
+            if any(doc.get(field, 0) != stats[field] for field in USER_STATS_FIELDS):
+                drifted.append(doc['user_id'])
+            operations.append(UpdateOne({'user_id': doc['user_id']}, {'$set': {**stats, 'reconciled_at': utcnow()}}))
+        if operations:
+            await self.db.user_stats.bulk_write(operations, ordered=False)
+        if drifted:
+            logger.info(f"Corrected drifted stats for {len(drifted)} of {len(docs)} users")
+        return len(drifted)
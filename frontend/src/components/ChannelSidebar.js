@@ -7,6 +7,7 @@ import { Hash, Volume2, Video, Megaphone, ChevronDown, ChevronRight, Plus, Setti
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '../components/ui/tooltip';
 import CreateChannelModal from './modals/CreateChannelModal';
 import { toast } from 'sonner';
+import { defaultAvatar } from '@/lib/utils';
 
 export const ChannelSidebar = () => {
   const { user, logout } = useAuth();
@@ -159,7 +160,7 @@ export const ChannelSidebar = () => {
                       {voiceUsers[channel.id].map((voiceUser) => (
                         <div key={voiceUser.id} className="voice-user">
                           <div className="voice-user-avatar">
-                            <img src={voiceUser.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${voiceUser.username}`} alt="" />
+                            <img src={voiceUser.avatar || defaultAvatar(voiceUser.username)} alt="" />
                           </div>
                           <span>{voiceUser.username}</span>
                         </div>
@@ -175,7 +176,7 @@ export const ChannelSidebar = () => {
         {/* User Panel */}
         <div className="user-panel">
           <div className="user-panel-avatar relative">
-            <img src={user?.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${user?.username}`} alt="" />
+            <img src={user?.avatar || defaultAvatar(user?.username)} alt="" />
             <div className={`member-status status-${user?.status || 'online'}`} />
           </div>
           <div className="user-panel-info">
@@ -10,6 +10,7 @@ import { DropdownMenu, DropdownMenuContent, DropdownMenuItem, DropdownMenuTrigge
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '../components/ui/tooltip';
 import EmojiPicker from 'emoji-picker-react';
 import { toast } from 'sonner';
+import { defaultAvatar } from '@/lib/utils';
 
 export const ChatArea = ({ showMembers, onToggleMembers }) => {
   const { user } = useAuth();
@@ -222,7 +223,7 @@ export const ChatArea = ({ showMembers, onToggleMembers }) => {
                   {showHeader && (
                     <div className="message-avatar">
                       <img 
-                        src={message.author?.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${message.author?.username}`} 
+                        src={message.author?.avatar || defaultAvatar(message.author?.username)} 
                         alt="" 
                       />
                     </div>
@@ -7,6 +7,7 @@ import { Phone, Video, Pin, MoreHorizontal, Smile, PlusCircle, Send, MessageCirc
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '../components/ui/tooltip';
 import EmojiPicker from 'emoji-picker-react';
 import { toast } from 'sonner';
+import { defaultAvatar } from '@/lib/utils';
 
 export const DMChatArea = () => {
   const { user } = useAuth();
@@ -79,7 +80,7 @@ export const DMChatArea = () => {
           <div className="flex items-center gap-3">
             <div className="member-avatar w-8 h-8 relative">
               <img 
-                src={otherUser.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${otherUser.username}`} 
+                src={otherUser.avatar || defaultAvatar(otherUser.username)} 
                 alt="" 
                 className="rounded-full"
               />
@@ -129,7 +130,7 @@ export const DMChatArea = () => {
             <div className="text-center">
               <div className="w-20 h-20 mx-auto mb-4 rounded-full overflow-hidden">
                 <img 
-                  src={otherUser.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${otherUser.username}`} 
+                  src={otherUser.avatar || defaultAvatar(otherUser.username)} 
                   alt="" 
                   className="w-full h-full object-cover"
                 />
@@ -161,7 +162,7 @@ export const DMChatArea = () => {
                     {showHeader && (
                       <div className="message-avatar">
                         <img 
-                          src={message.author?.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${message.author?.username}`} 
+                          src={message.author?.avatar || defaultAvatar(message.author?.username)} 
                           alt="" 
                         />
                       </div>
@@ -7,6 +7,7 @@ import { Input } from '../components/ui/input';
 import { Button } from '../components/ui/button';
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from '../components/ui/dialog';
 import { toast } from 'sonner';
+import { defaultAvatar } from '@/lib/utils';
 
 export const DMSidebar = () => {
   const { user } = useAuth();
@@ -107,7 +108,7 @@ export const DMSidebar = () => {
                 >
                   <div className="member-avatar w-8 h-8 relative">
                     <img 
-                      src={otherUser.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${otherUser.username}`} 
+                      src={otherUser.avatar || defaultAvatar(otherUser.username)} 
                       alt="" 
                       className="rounded-full"
                     />
@@ -162,7 +163,7 @@ export const DMSidebar = () => {
                   >
                     <div className="member-avatar w-10 h-10 relative">
                       <img 
-                        src={result.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${result.username}`} 
+                        src={result.avatar || defaultAvatar(result.username)} 
                         alt="" 
                         className="rounded-full"
                       />
@@ -1,6 +1,7 @@
 import { motion } from 'framer-motion';
 import { useApp } from '../context/AppContext';
 import { Crown } from 'lucide-react';
+import { defaultAvatar } from '@/lib/utils';
 
 export const MemberList = () => {
   const { members, currentServer, createDM, setCurrentDM, setCurrentServer, setCurrentChannel } = useApp();
@@ -39,7 +40,7 @@ export const MemberList = () => {
             >
               <div className="member-avatar">
                 <img 
-                  src={member.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${member.username}`} 
+                  src={member.avatar || defaultAvatar(member.username)} 
                   alt={member.username} 
                 />
                 <div className={`member-status status-${member.status}`} />
@@ -73,7 +74,7 @@ export const MemberList = () => {
             >
               <div className="member-avatar">
                 <img 
-                  src={member.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${member.username}`} 
+                  src={member.avatar || defaultAvatar(member.username)} 
                   alt={member.username} 
                 />
                 <div className={`member-status status-offline`} />
@@ -25,6 +25,7 @@ import {
 } from "../../components/ui/select";
 import { User, Palette, Sparkles, LogOut, Loader2 } from "lucide-react";
 import { toast } from "sonner";
+import { defaultAvatar } from "@/lib/utils";
 
 export const SettingsModal = ({ open, onClose }) => {
   const { user, updateProfile, logout } = useAuth();
@@ -93,7 +94,7 @@ export const SettingsModal = ({ open, onClose }) => {
                 <img
                   src={
                     user?.avatar ||
-                    `https://api.dicebear.com/7.x/avataaars/svg?seed=${user?.username}`
+                    defaultAvatar(user?.username)
                   }
                   alt=""
                   className="w-full h-full object-cover"
@@ -4,3 +4,14 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+const getBackendUrl = () => {
+  const url = process.env.REACT_APP_BACKEND_URL;
+  if (!url) return "";
+  return url.startsWith("http") ? url : `https://${url}`;
+};
+
+// The identicon the API assigns at signup, rendered by the backend and cached as immutable
+export function defaultAvatar(seed) {
+  return `${getBackendUrl()}/api/avatars/identicon/${encodeURIComponent(String(seed ?? "?").slice(0, 100) || "?")}.svg`;
+}
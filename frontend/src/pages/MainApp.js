@@ -17,6 +17,7 @@ import MarketplaceSection from '../sections/MarketplaceSection';
 import StudioSection from '../sections/StudioSection';
 import ProfileSection from '../sections/ProfileSection';
 import SettingsSection from '../sections/SettingsSection';
+import { defaultAvatar } from '@/lib/utils';
 
 const navItems = [
   { id: 'chat', icon: MessageCircle, label: 'Chat', path: '/app/chat' },
@@ -101,7 +102,7 @@ export default function MainApp() {
                   data-testid="nav-profile"
                 >
                   <img 
-                    src={user?.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${user?.username}`} 
+                    src={user?.avatar || defaultAvatar(user?.username)} 
                     alt={user?.username}
                     className="w-full h-full object-cover"
                   />
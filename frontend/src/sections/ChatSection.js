@@ -12,6 +12,7 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle } from '../components/
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '../components/ui/tooltip';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '../components/ui/tabs';
 import { toast } from 'sonner';
+import { defaultAvatar } from '@/lib/utils';
 
 export default function ChatSection() {
   const { user, axiosInstance } = useAuth();
@@ -313,7 +314,7 @@ export default function ChatSection() {
                       }`}
                     >
                       <div className="w-8 h-8 rounded-full overflow-hidden">
-                        <img src={other.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${other.username}`} alt="" className="w-full h-full object-cover" />
+                        <img src={other.avatar || defaultAvatar(other.username)} alt="" className="w-full h-full object-cover" />
                       </div>
                       <span className="text-sm text-[var(--text-secondary)] truncate">{other.username}</span>
                     </button>
@@ -479,7 +480,7 @@ export default function ChatSection() {
                   >
                     {showHeader && (
                       <div className="w-10 h-10 rounded-full overflow-hidden flex-shrink-0">
-                        <img src={message.author?.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${message.author?.username}`} alt="" className="w-full h-full object-cover" />
+                        <img src={message.author?.avatar || defaultAvatar(message.author?.username)} alt="" className="w-full h-full object-cover" />
                       </div>
                     )}
                     <div className={showHeader ? '' : 'ml-14'}>
@@ -9,6 +9,7 @@ import {
 import { Button } from '../components/ui/button';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '../components/ui/tabs';
 import { toast } from 'sonner';
+import { defaultAvatar } from '@/lib/utils';
 
 export default function ProfileSection() {
   const { userId } = useParams();
@@ -27,7 +28,7 @@ export default function ProfileSection() {
     try {
       const response = await axiosInstance.get(`/users/${targetUserId}`);
       setProfile(response.data);
-      setIsFollowing(response.data.followers?.includes(currentUser?.id));
+      setIsFollowing(Boolean(response.data.is_following));
     } catch (error) {
       console.error('Failed to fetch profile:', error);
       if (!isOwnProfile) {
@@ -108,7 +109,7 @@ export default function ProfileSection() {
           <div className="relative">
             <div className="w-32 h-32 md:w-40 md:h-40 rounded-2xl border-4 border-[var(--bg-base)] overflow-hidden bg-[var(--bg-layer2)]">
               <img 
-                src={displayProfile?.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${displayProfile?.username}`} 
+                src={displayProfile?.avatar || defaultAvatar(displayProfile?.username)} 
                 alt="" 
                 className="w-full h-full object-cover"
               />
@@ -23,6 +23,7 @@ import {
   DialogTitle,
 } from "../components/ui/dialog";
 import { toast } from "sonner";
+import { defaultAvatar } from "@/lib/utils";
 
 export default function ReelsSection() {
   const { user, axiosInstance } = useAuth();
@@ -191,7 +192,7 @@ export default function ReelsSection() {
                       <img
                         src={
                           reel.author?.avatar ||
-                          `https://api.dicebear.com/7.x/avataaars/svg?seed=${reel.author?.username}`
+                          defaultAvatar(reel.author?.username)
                         }
                         alt=""
                         className="w-full h-full object-cover"
@@ -11,6 +11,7 @@ import { Textarea } from '../components/ui/textarea';
 import { Label } from '../components/ui/label';
 import { Switch } from '../components/ui/switch';
 import { toast } from 'sonner';
+import { defaultAvatar } from '@/lib/utils';
 
 const themes = [
   { id: 'liquid-glass', name: 'Liquid Glass', description: 'Dark glassmorphism with blur effects', icon: Sparkles, preview: 'linear-gradient(135deg, #0a0a0a 0%, #1a1a2e 100%)' },
@@ -130,7 +131,7 @@ export default function SettingsSection() {
               <div className="relative">
                 <div className="w-24 h-24 rounded-2xl overflow-hidden bg-[var(--bg-layer2)]">
                   <img 
-                    src={user?.avatar || `https://api.dicebear.com/7.x/avataaars/svg?seed=${user?.username}`} 
+                    src={user?.avatar || defaultAvatar(user?.username)} 
                     alt="" 
                     className="w-full h-full object-cover"
                   />
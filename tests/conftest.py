@@ -0,0 +1,92 @@
+"""Shared fixtures: the API on a throwaway database, driven in-process through httpx.
+
+The app is loaded once per session with ``benchmarks.common.load_app``: set
+BENCH_MONGO_URL to run against a real mongod, otherwise the database is
+mongomock-motor. Query counts work on both, through command monitoring or
+``benchmarks.common.count_mock_queries``.
+
+Async tests run on one session event loop (Motor binds its client to the
+loop it first runs on), so coroutine tests need no plugin.
+"""
+import asyncio
+import inspect
+import itertools
+import sys
+import uuid
+from pathlib import Path
+
+import httpx
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.common import drop_db, load_app  # noqa: E402
+
+LOOP = asyncio.new_event_loop()
+_names = itertools.count()
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    args = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    LOOP.run_until_complete(pyfuncitem.obj(**args))
+    return True
+
+
+@pytest.fixture(scope='session')
+def app():
+    """``(server module, db)`` with startup run, so background services are live.
+
+    Backend modules that read settings at import (``core`` and everything
+    importing it) must be imported inside tests, after this fixture ran.
+    """
+    server, db = load_app(f'vistagram_test_{uuid.uuid4().hex[:8]}')
+    LOOP.run_until_complete(server.app.router.startup())
+    yield server, db
+    LOOP.run_until_complete(drop_db(db))
+    LOOP.run_until_complete(server.app.router.shutdown())
+    # Let cancelled background loops unwind before the loop goes away
+    pending = asyncio.all_tasks(LOOP)
+    for task in pending:
+        task.cancel()
+    LOOP.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    LOOP.close()
+
+
+@pytest.fixture(scope='session')
+def db(app):
+    return app[1]
+
+
+@pytest.fixture(scope='session')
+def client(app):
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app[0].app), base_url='http://test')
+    yield client
+    LOOP.run_until_complete(client.aclose())
+
+
+@pytest.fixture
+def jobs_done(db):
+    """``await jobs_done()`` waits until the job queue has nothing queued or running."""
+    async def wait(timeout: float = 10.0):
+        deadline = LOOP.time() + timeout
+        while await db.jobs.count_documents({'state': {'$in': ['queued', 'running']}}):
+            assert LOOP.time() < deadline, 'jobs still pending'
+            await asyncio.sleep(0.02)
+    return wait
+
+
+@pytest.fixture
+def signup(client):
+    """``await signup()`` creates a user with a fresh name and returns ``(user, auth headers)``."""
+    async def create(name: str = 'user') -> tuple:
+        username = f'{name}_{next(_names)}'
+        response = await client.post('/api/auth/signup', json={'username': username, 'email': f'{username}@test.local', 'password': 'pw'})
+        assert response.status_code == 200, response.text
+        data = response.json()
+        return data['user'], {'Authorization': f"Bearer {data['token']}"}
+    return create
@@ -0,0 +1,101 @@
+"""Cold message buckets: reads across hot and archived messages, compaction and recovery."""
+from datetime import timedelta
+
+import pytest
+
+import archive
+from ids import new_id, utcnow
+
+
+@pytest.fixture
+def fast_compaction(monkeypatch):
+    monkeypatch.setattr(archive, 'ARCHIVE_BUCKETS_PER_SECOND', 1e9)
+    monkeypatch.setattr(archive, 'BUCKET_MAX_MESSAGES', 7)
+
+
+async def old_channel(client, db, signup, count: int = 40) -> tuple:
+    """A channel holding ``count`` messages five hours apart, all older than the archive cutoff."""
+    author, headers = await signup('archivist')
+    server = (await client.post('/api/servers', json={'name': 'Archive'}, headers=headers)).json()
+    channel = (await client.get(f"/api/servers/{server['id']}/channels", headers=headers)).json()[0]
+    oldest = utcnow() - timedelta(days=60)
+    await db.messages.insert_many([
+        {'id': new_id(), 'content': f'Message {i}', 'channel_id': channel['id'], 'author_id': author['id'],
+         'attachments': [], 'reactions': {}, 'created_at': oldest + timedelta(hours=5 * i)}
+        for i in range(count)
+    ])
+    return channel, headers
+
+
+async def walk(client, channel: dict, headers: dict) -> list:
+    from core import recent_messages
+    recent_messages.invalidate(f"channel:{channel['id']}")
+    contents, cursor = [], None
+    while True:
+        response = await client.get(f"/api/channels/{channel['id']}/messages", headers=headers,
+                                    params={'limit': 9, **({'cursor': cursor} if cursor else {})})
+        contents = [m['content'] for m in response.json()] + contents
+        cursor = response.headers.get('x-next-cursor')
+        if not cursor:
+            return contents
+
+
+async def compact(channel: dict) -> int:
+    from core import message_archive
+    return await message_archive.compact_channel(channel['id'], utcnow() - timedelta(days=30))
+
+
+async def test_pages_read_the_same_across_compaction(client, db, signup, fast_compaction):
+    channel, headers = await old_channel(client, db, signup)
+    before = await walk(client, channel, headers)
+    assert before == [f'Message {i}' for i in range(40)]
+
+    assert await compact(channel) > 0
+    assert await db.messages.count_documents({'channel_id': channel['id']}) == 0
+    assert await walk(client, channel, headers) == before
+
+    # Newer hot messages page in front of the archived ones
+    await client.post('/api/messages', json={'content': 'Fresh', 'channel_id': channel['id']}, headers=headers)
+    assert await walk(client, channel, headers) == before + ['Fresh']
+
+
+async def test_since_polling_continues_from_an_archived_anchor(client, db, signup, fast_compaction):
+    from core import recent_messages
+    channel, headers = await old_channel(client, db, signup, count=20)
+    anchor = await db.messages.find_one({'channel_id': channel['id'], 'content': 'Message 10'})
+    await compact(channel)
+    await client.post('/api/messages', json={'content': 'Fresh', 'channel_id': channel['id']}, headers=headers)
+
+    recent_messages.invalidate(f"channel:{channel['id']}")
+    response = await client.get(f"/api/channels/{channel['id']}/messages", params={'since': anchor['id'], 'limit': 20}, headers=headers)
+    assert response.status_code == 200
+    assert [m['content'] for m in response.json()] == [f'Message {i}' for i in range(11, 20)] + ['Fresh']
+
+    response = await client.get(f"/api/channels/{channel['id']}/messages", params={'since': new_id()}, headers=headers)
+    assert response.status_code == 404
+
+
+async def test_archived_messages_are_read_only(client, db, signup, fast_compaction):
+    channel, headers = await old_channel(client, db, signup, count=3)
+    message = await db.messages.find_one({'channel_id': channel['id']})
+    await compact(channel)
+    response = await client.post(f"/api/messages/{message['id']}/reactions/wave", headers=headers)
+    assert response.status_code == 404
+
+
+async def test_pending_buckets_are_finished_on_the_next_pass(client, db, signup, fast_compaction):
+    from core import message_archive
+    channel, headers = await old_channel(client, db, signup, count=14)
+    before = await walk(client, channel, headers)
+    await compact(channel)
+
+    # As if the compactor died after writing a bucket but before deleting its hot copies
+    bucket = await db.message_buckets.find_one({'channel_id': channel['id']}, {'_id': 0}, sort=[('first_created_at', 1)])
+    await db.message_buckets.update_one({'id': bucket['id']}, {'$set': {'state': 'pending'}})
+    await db.messages.insert_many(archive.decode_bucket(bucket))
+    assert await walk(client, channel, headers) == before
+
+    await message_archive.recover()
+    assert await db.messages.count_documents({'channel_id': channel['id']}) == 0
+    assert await db.message_buckets.count_documents({'channel_id': channel['id'], 'state': 'pending'}) == 0
+    assert await walk(client, channel, headers) == before
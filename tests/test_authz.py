@@ -0,0 +1,73 @@
+"""Membership checks on server and channel reads, served from the membership cache."""
+
+
+async def owned_server(client, headers: dict) -> tuple:
+    server = (await client.post('/api/servers', json={'name': 'Private'}, headers=headers)).json()
+    channel = (await client.get(f"/api/servers/{server['id']}/channels", headers=headers)).json()[0]
+    return server, channel
+
+
+async def test_outsiders_are_refused(client, signup):
+    _, owner_headers = await signup('owner')
+    _, outsider_headers = await signup('outsider')
+    server, channel = await owned_server(client, owner_headers)
+
+    for path in (f"/api/servers/{server['id']}", f"/api/servers/{server['id']}/channels",
+                 f"/api/servers/{server['id']}/members", f"/api/channels/{channel['id']}/messages"):
+        assert (await client.get(path, headers=owner_headers)).status_code == 200, path
+        assert (await client.get(path, headers=outsider_headers)).status_code == 403, path
+    response = await client.post('/api/messages', json={'content': 'Hi', 'channel_id': channel['id']}, headers=outsider_headers)
+    assert response.status_code == 403
+    assert (await client.get('/api/channels/missing/messages', headers=outsider_headers)).status_code == 404
+
+
+async def test_joining_grants_access_straight_away(client, signup):
+    _, owner_headers = await signup('owner')
+    _, joiner_headers = await signup('joiner')
+    server, channel = await owned_server(client, owner_headers)
+    path = f"/api/channels/{channel['id']}/messages"
+
+    # The refusal caches the joiner's servers; the join has to update them
+    assert (await client.get(path, headers=joiner_headers)).status_code == 403
+    await client.post(f"/api/servers/join/{server['invite_code']}", headers=joiner_headers)
+    assert (await client.get(path, headers=joiner_headers)).status_code == 200
+
+
+async def test_new_channels_are_readable_by_members(client, signup):
+    _, owner_headers = await signup('owner')
+    server, _ = await owned_server(client, owner_headers)
+    response = await client.post('/api/channels', json={'name': 'New Channel', 'server_id': server['id']}, headers=owner_headers)
+    channel = response.json()
+    assert channel['name'] == 'new-channel'
+    assert (await client.get(f"/api/channels/{channel['id']}/messages", headers=owner_headers)).status_code == 200
+
+
+async def test_memberships_written_elsewhere_are_rechecked(client, db, signup, monkeypatch):
+    from core import membership_cache
+    _, owner_headers = await signup('owner')
+    member, member_headers = await signup('member')
+    server, channel = await owned_server(client, owner_headers)
+    path = f"/api/channels/{channel['id']}/messages"
+    assert (await client.get(path, headers=member_headers)).status_code == 403
+
+    # As if another API process handled the join
+    await db.servers.update_one({'id': server['id']}, {'$push': {'members': member['id']}})
+    monkeypatch.setattr(membership_cache, 'recheck_seconds', 0)
+    assert (await client.get(path, headers=member_headers)).status_code == 200
+
+
+async def test_channel_checks_follow_the_metadata_cache(client, db, signup):
+    from core import metadata_cache
+    _, owner_headers = await signup('owner')
+    _, other_headers = await signup('other')
+    server, channel = await owned_server(client, owner_headers)
+    elsewhere, _ = await owned_server(client, other_headers)
+    path = f"/api/channels/{channel['id']}/messages"
+    assert (await client.get(path, headers=owner_headers)).status_code == 200
+
+    # Moved to a server the owner isn't in; invalidating the metadata is enough for authorization too
+    await db.channels.update_one({'id': channel['id']}, {'$set': {'server_id': elsewhere['id']}})
+    metadata_cache.bump(server['id'])
+    metadata_cache.bump(elsewhere['id'])
+    assert (await client.get(path, headers=owner_headers)).status_code == 403
+    assert (await client.get(path, headers=other_headers)).status_code == 200
@@ -0,0 +1,88 @@
+"""Server discovery: ranked snapshot, search, category filters and cursor pages."""
+import uuid
+
+from pagination import encode_cursor
+
+
+async def create_servers(client, headers: dict, tag: str, count: int) -> list:
+    servers = []
+    for i in range(count):
+        category = 'music' if i % 3 == 0 else 'gaming'
+        response = await client.post('/api/servers', headers=headers, json={
+            'name': f'{tag} server {i}', 'description': f'A {category} place', 'category': category})
+        assert response.status_code == 200
+        servers.append(response.json())
+    return servers
+
+
+async def discover(client, headers: dict, **params) -> list:
+    servers, cursor = [], None
+    while True:
+        response = await client.get('/api/discover/servers', headers=headers, params={**params, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        servers += response.json()
+        cursor = response.headers.get('x-next-cursor')
+        if not cursor:
+            return servers
+
+
+async def test_ranked_pages_search_and_filters(client, db, signup):
+    from core import discovery_index
+    _, owner_headers = await signup('owner')
+    _, member_headers = await signup('member')
+    tag = uuid.uuid4().hex[:8]
+    servers = await create_servers(client, owner_headers, tag, 9)
+    await db.servers.update_one({'id': servers[4]['id']}, {'$set': {'boost_count': 5}})
+    await client.post(f"/api/servers/join/{servers[7]['invite_code']}", headers=member_headers)
+    await discovery_index.rebuild()
+
+    ranked = await discover(client, member_headers, q=tag, limit=2)
+    assert len(ranked) == 9
+    assert [s['name'] for s in ranked[:2]] == [f'{tag} server 4', f'{tag} server 7']
+    scores = [s['discovery_score'] for s in ranked]
+    assert scores == sorted(scores, reverse=True)
+    assert [s['is_member'] for s in ranked[:2]] == [False, True]
+    assert 'members' not in ranked[0]
+
+    music = await discover(client, member_headers, q=f'{tag} music', category='music')
+    assert sorted(s['name'] for s in music) == [f'{tag} server {i}' for i in (0, 3, 6)]
+
+
+async def test_snapshot_survives_a_restart(client, db, signup):
+    from core import discovery_index
+    _, headers = await signup('owner')
+    tag = uuid.uuid4().hex[:8]
+    await create_servers(client, headers, tag, 3)
+    await discovery_index.rebuild()
+    before = [s['id'] for s in discovery_index.servers]
+
+    # One document per entry, the current build named by a small pointer document
+    assert await db.discovery_servers.count_documents({}) == len(before)
+    assert 'items' not in await db.discovery.find_one({'id': 'servers'})
+
+    discovery_index.servers = []
+    await discovery_index.load()
+    assert [s['id'] for s in discovery_index.servers] == before
+
+
+async def test_bad_input_is_rejected(client, signup):
+    _, headers = await signup('owner')
+    response = await client.post('/api/servers', json={'name': 'Nowhere', 'category': 'not-a-category'}, headers=headers)
+    assert response.status_code == 400
+    for cursor in ('garbage!', encode_cursor('high', 'id'), encode_cursor(1.5, 7), encode_cursor(True, 'id')):
+        response = await client.get('/api/discover/servers', params={'cursor': cursor}, headers=headers)
+        assert response.status_code == 400, cursor
+
+
+async def test_rebuild_keeps_the_best_servers(client, signup, monkeypatch):
+    import discovery
+    from core import discovery_index
+    _, headers = await signup('owner')
+    await create_servers(client, headers, uuid.uuid4().hex[:8], 5)
+    await discovery_index.rebuild()
+    best = [s['id'] for s in discovery_index.servers[:2]]
+
+    # Trimmed while streaming, to the same ranking a full sort gives
+    monkeypatch.setattr(discovery, 'DISCOVERY_MAX_SERVERS', 2)
+    await discovery_index.rebuild()
+    assert [s['id'] for s in discovery_index.servers] == best
@@ -0,0 +1,82 @@
+"""Channel history export and import."""
+import gzip
+import json
+
+
+async def create_channel(client, headers: dict) -> dict:
+    server = (await client.post('/api/servers', json={'name': 'History'}, headers=headers)).json()
+    channel = (await client.get(f"/api/servers/{server['id']}/channels", headers=headers)).json()[0]
+    return channel
+
+
+def upload(lines: list, compress: bool = False) -> dict:
+    data = '\n'.join(json.dumps(line) for line in lines).encode()
+    if compress:
+        return {'file': ('history.ndjson.gz', gzip.compress(data))}
+    return {'file': ('history.ndjson', data)}
+
+
+async def test_export_streams_every_message_oldest_first(client, signup):
+    owner, headers = await signup('owner')
+    channel = await create_channel(client, headers)
+    for i in range(30):
+        await client.post('/api/messages', json={'content': f'Message {i}', 'channel_id': channel['id']}, headers=headers)
+
+    response = await client.get(f"/api/channels/{channel['id']}/export", headers=headers)
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['content'] for line in lines] == [f'Message {i}' for i in range(30)]
+    assert lines[0]['author']['id'] == owner['id']
+
+    compressed = await client.get(f"/api/channels/{channel['id']}/export", params={'compress': 'true'}, headers=headers)
+    assert gzip.decompress(compressed.content).decode().splitlines() == response.text.splitlines()
+
+
+async def test_only_the_owner_exports_and_imports(client, signup):
+    _, owner_headers = await signup('owner')
+    _, other_headers = await signup('other')
+    channel = await create_channel(client, owner_headers)
+
+    assert (await client.get(f"/api/channels/{channel['id']}/export", headers=other_headers)).status_code == 403
+    assert (await client.post(f"/api/channels/{channel['id']}/import", files=upload([]), headers=other_headers)).status_code == 403
+
+
+async def test_exported_history_restores_a_channel(client, db, signup):
+    _, headers = await signup('owner')
+    channel = await create_channel(client, headers)
+    for i in range(5):
+        await client.post('/api/messages', json={'content': f'Message {i}', 'channel_id': channel['id']}, headers=headers)
+    exported = [json.loads(line) for line in (await client.get(f"/api/channels/{channel['id']}/export", headers=headers)).text.splitlines()]
+    await db.messages.delete_many({'channel_id': channel['id']})
+
+    path = f"/api/channels/{channel['id']}/import"
+    response = await client.post(path, files=upload(exported, compress=True), headers=headers)
+    assert response.json() == {'inserted': 5, 'skipped': 0}
+    # Importing the same file again skips the ids it already has
+    response = await client.post(path, files=upload(exported), headers=headers)
+    assert response.json() == {'inserted': 0, 'skipped': 5}
+
+    messages = (await client.get(f"/api/channels/{channel['id']}/messages", headers=headers)).json()
+    assert [m['content'] for m in messages] == [f'Message {i}' for i in range(5)]
+
+
+async def test_import_rejects_missing_timestamps_and_foreign_authors(client, signup):
+    owner, headers = await signup('owner')
+    outsider, _ = await signup('outsider')
+    channel = await create_channel(client, headers)
+    path = f"/api/channels/{channel['id']}/import"
+    created_at = '2024-01-01T00:00:00+00:00'
+
+    for line in (
+        {'id': 'no-time', 'author_id': owner['id'], 'content': 'hi'},
+        {'id': 'bad-time', 'author_id': owner['id'], 'content': 'hi', 'created_at': 5},
+        {'id': 'forged', 'author_id': outsider['id'], 'content': 'hi', 'created_at': created_at},
+    ):
+        response = await client.post(path, files=upload([line]), headers=headers)
+        assert response.status_code == 400, line
+
+    response = await client.post(path, files=upload([{'id': 'ok', 'author_id': owner['id'], 'content': 'hi', 'created_at': created_at}]),
+                                 headers=headers)
+    assert response.status_code == 200
+    messages = (await client.get(f"/api/channels/{channel['id']}/messages", headers=headers)).json()
+    assert [m['id'] for m in messages] == ['ok']
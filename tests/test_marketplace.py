@@ -0,0 +1,59 @@
+"""Marketplace browsing: filters, keyset pages per sort and cached category counts."""
+import uuid
+
+import pytest
+
+
+async def create_products(client, headers: dict, category: str, prices) -> list:
+    products = []
+    for i, price in enumerate(prices):
+        response = await client.post('/api/marketplace/products', headers=headers, json={
+            'name': f'Product {i}', 'description': 'For sale', 'price': price, 'category': category})
+        assert response.status_code == 200
+        products.append(response.json())
+    return products
+
+
+async def browse(client, headers: dict, **params) -> list:
+    products, cursor = [], None
+    while True:
+        response = await client.get('/api/marketplace/products', headers=headers,
+                                    params={**params, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        products += response.json()
+        cursor = response.headers.get('x-next-cursor')
+        if not cursor:
+            return products
+
+
+@pytest.mark.parametrize('sort, key, reverse', [
+    ('newest', 'created_at', True),
+    ('price_asc', 'price', False),
+    ('price_desc', 'price', True),
+])
+async def test_sorted_pages_cover_the_filtered_range(client, signup, sort, key, reverse):
+    seller, headers = await signup('seller')
+    category = f'test-{uuid.uuid4().hex[:8]}'
+    # Repeated prices make the id tie-breaker matter
+    created = await create_products(client, headers, category, [(i * 7) % 13 for i in range(25)])
+
+    products = await browse(client, headers, category=category, sort=sort, min_price=2, max_price=10, limit=4)
+    expected = sorted((p for p in created if 2 <= p['price'] <= 10), key=lambda p: (p[key], p['id']), reverse=reverse)
+    assert [p['id'] for p in products] == [p['id'] for p in expected]
+    assert all(p['seller']['id'] == seller['id'] for p in products)
+
+
+async def test_category_counts_follow_new_products(client, signup):
+    _, headers = await signup('seller')
+    category = f'test-{uuid.uuid4().hex[:8]}'
+    await client.get('/api/marketplace/categories', headers=headers)
+    await create_products(client, headers, category, [1, 2, 3])
+
+    counts = (await client.get('/api/marketplace/categories', headers=headers)).json()
+    assert {'category': category, 'count': 3} in counts
+
+
+async def test_unknown_sort_is_rejected(client, signup):
+    _, headers = await signup('buyer')
+    response = await client.get('/api/marketplace/products', params={'sort': 'cheapest'}, headers=headers)
+    assert response.status_code == 400
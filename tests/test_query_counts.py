@@ -0,0 +1,61 @@
+"""Mongo commands issued by the hot read endpoints, pinned so an N+1 fails the suite.
+
+Counts include the ``users`` lookup that authenticates every request. Where an
+endpoint caches, the cache is dropped before the measured request, so these
+are the uncached paths.
+"""
+from profiler import assert_max_queries
+
+
+async def create_text_channels(client, headers: dict, servers: int) -> list:
+    channels = []
+    for i in range(servers):
+        server = (await client.post('/api/servers', json={'name': f'Counted {i}'}, headers=headers)).json()
+        listed = (await client.get(f"/api/servers/{server['id']}/channels", headers=headers)).json()
+        channels += [channel for channel in listed if channel['channel_type'] == 'text']
+    return channels
+
+
+async def test_reels_page(client, signup):
+    authors = [await signup('reeler') for _ in range(3)]
+    for i in range(25):
+        _, headers = authors[i % len(authors)]
+        await client.post('/api/reels', json={'title': f'Reel {i}', 'video_url': 'https://example.invalid/v.mp4'}, headers=headers)
+
+    # The page, then one batched author lookup however many authors it has
+    with assert_max_queries(3, 'GET /api/reels'):
+        response = await client.get('/api/reels', headers=authors[0][1])
+    assert response.status_code == 200
+    assert len(response.json()) == 20
+
+
+async def test_channel_messages_pages(client, signup):
+    from core import recent_messages
+    _, headers = await signup('chatter')
+    channel = (await create_text_channels(client, headers, 1))[0]
+    for i in range(60):
+        await client.post('/api/messages', json={'content': f'Message {i}', 'channel_id': channel['id']}, headers=headers)
+    path = f"/api/channels/{channel['id']}/messages"
+
+    # Hot messages fill the newest page, so the archive isn't read
+    recent_messages.invalidate(f"channel:{channel['id']}")
+    with assert_max_queries(3, f'GET {path}'):
+        response = await client.get(path, headers=headers)
+    assert len(response.json()) == 50
+    cursor = response.headers['x-next-cursor']
+
+    # A short hot page also asks the archive for older buckets
+    recent_messages.invalidate(f"channel:{channel['id']}")
+    with assert_max_queries(4, f'GET {path}?cursor'):
+        response = await client.get(path, params={'cursor': cursor}, headers=headers)
+    assert len(response.json()) == 10
+
+
+async def test_server_list(client, signup):
+    _, headers = await signup('owner')
+    await create_text_channels(client, headers, 3)
+
+    # However many servers and channels: the same few queries plus one unread aggregation
+    with assert_max_queries(5, 'GET /api/servers'):
+        response = await client.get('/api/servers', headers=headers)
+    assert len(response.json()) == 3
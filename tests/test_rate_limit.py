@@ -0,0 +1,118 @@
+"""Token-bucket rate limits and per-class admission control."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import rate_limit
+from rate_limit import AdmissionControl, Limit, MemoryRateLimitBackend, RateLimitBackend, RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only the limiter's clock; the event loop keeps the real one
+    monkeypatch.setattr(rate_limit, 'time', SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.fixture
+def limits_on(monkeypatch):
+    """The app's limiter and admission control switched on, with empty buckets of their own."""
+    from core import admission, rate_limiter
+    monkeypatch.setattr(rate_limiter, 'enabled', True)
+    monkeypatch.setattr(rate_limiter, 'backend', MemoryRateLimitBackend())
+    monkeypatch.setattr(admission, 'enabled', True)
+
+
+def test_backends_must_implement_take():
+    with pytest.raises(TypeError):
+        RateLimitBackend()
+
+
+async def test_bucket_spends_its_burst_then_refills(clock):
+    backend = MemoryRateLimitBackend()
+    assert [await backend.take('k', rate=0.5, burst=3) for _ in range(3)] == [0, 0, 0]
+    # Empty: one token is two seconds away, and a refused take spends nothing
+    assert await backend.take('k', rate=0.5, burst=3) == pytest.approx(2.0)
+    clock.now += 1
+    assert await backend.take('k', rate=0.5, burst=3) == pytest.approx(1.0)
+    clock.now += 1
+    assert await backend.take('k', rate=0.5, burst=3) == 0
+    # Refills never exceed the burst
+    clock.now += 3600
+    assert [await backend.take('k', rate=0.5, burst=3) for _ in range(4)][-1] > 0
+
+
+async def test_least_recently_used_buckets_are_dropped(clock):
+    backend = MemoryRateLimitBackend(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        await backend.take(key, rate=1, burst=1)
+    assert list(backend.buckets) == ['b', 'c']
+    # A dropped bucket starts full again
+    assert await backend.take('a', rate=1, burst=1) == 0
+
+
+async def test_limiter_checks_user_and_ip_budgets_separately(clock):
+    limiter = RateLimiter(limits={'search': {'user': Limit(2, 10), 'ip': Limit(3, 10)}})
+    await limiter.check('search', ip='10.0.0.1', user_id='alice')
+    await limiter.check('search', ip='10.0.0.1', user_id='alice')
+    with pytest.raises(HTTPException) as refused:
+        await limiter.check('search', ip='10.0.0.1', user_id='alice')
+    assert refused.value.status_code == 429
+    assert refused.value.headers['Retry-After'] == '10'
+
+    # Another user behind the same address has a budget, until the address runs out
+    await limiter.check('search', ip='10.0.0.1', user_id='bob')
+    with pytest.raises(HTTPException):
+        await limiter.check('search', ip='10.0.0.1', user_id='carol')
+
+    disabled = RateLimiter(limits={'search': {'user': Limit(1, 10)}}, enabled=False)
+    for _ in range(5):
+        await disabled.check('search', user_id='alice')
+
+
+async def test_admission_queues_briefly_then_sheds():
+    admission = AdmissionControl(limits={'upload': 1}, wait_seconds=0.05)
+
+    async def run(seconds: float):
+        try:
+            async with admission.slot('upload'):
+                await asyncio.sleep(seconds)
+            return 'ran'
+        except HTTPException as e:
+            assert e.headers['Retry-After'] == '1'
+            return e.status_code
+
+    # One runs, one waits and times out, and the third finds the wait list full
+    assert await asyncio.gather(run(0.2), run(0), run(0)) == ['ran', 503, 503]
+    # A slot freed within the wait is taken
+    assert await asyncio.gather(run(0.01), run(0)) == ['ran', 'ran']
+    assert admission.in_flight == {'upload': 0}
+
+
+async def test_signup_is_limited_per_address(client, limits_on):
+    codes = []
+    for i in range(6):
+        response = await client.post('/api/auth/signup', json={'username': f'burst_{i}', 'email': f'burst_{i}@test.local', 'password': 'pw'})
+        codes.append(response.status_code)
+    assert codes == [200] * 5 + [429]
+    assert int(response.headers['retry-after']) > 0
+
+
+async def test_login_is_limited_per_account(client, signup, limits_on):
+    user, _ = await signup('target')
+    email = f"{user['username']}@test.local"
+    codes = [(await client.post('/api/auth/login', json={'email': email if i % 2 else email.upper(), 'password': 'wrong'})).status_code
+             for i in range(11)]
+    # Spelling the address differently doesn't reset the budget
+    assert codes == [401] * 10 + [429]
@@ -0,0 +1,81 @@
+"""Read markers and unread badges on the server and channel lists."""
+from read_state import UNREAD_COUNT_CAP
+
+
+async def shared_channel(client, signup) -> tuple:
+    """A server owned by one user and joined by another, with its first text channel."""
+    owner, owner_headers = await signup('owner')
+    member, member_headers = await signup('member')
+    server = (await client.post('/api/servers', json={'name': 'Unread'}, headers=owner_headers)).json()
+    channel = (await client.get(f"/api/servers/{server['id']}/channels", headers=owner_headers)).json()[0]
+    return server, channel, (owner, owner_headers), (member, member_headers)
+
+
+async def send(client, channel: dict, headers: dict, contents) -> list:
+    messages = []
+    for content in contents:
+        response = await client.post('/api/messages', json={'content': content, 'channel_id': channel['id']}, headers=headers)
+        messages.append(response.json())
+    return messages
+
+
+async def badges(client, server: dict, channel: dict, headers: dict) -> tuple:
+    channels = (await client.get(f"/api/servers/{server['id']}/channels", headers=headers)).json()
+    listed = next(c for c in channels if c['id'] == channel['id'])
+    return listed['unread_count'], listed['mention_count']
+
+
+async def test_history_before_joining_is_not_unread(client, signup):
+    server, channel, (_, owner_headers), (member, member_headers) = await shared_channel(client, signup)
+    await send(client, channel, owner_headers, [f'Before {i}' for i in range(5)])
+    await client.post(f"/api/servers/join/{server['invite_code']}", headers=member_headers)
+    assert await badges(client, server, channel, member_headers) == (0, 0)
+
+    await send(client, channel, owner_headers, ['Hello', f"Hi @{member['username']}"])
+    assert await badges(client, server, channel, member_headers) == (2, 1)
+    servers = (await client.get('/api/servers', headers=member_headers)).json()
+    listed = next(s for s in servers if s['id'] == server['id'])
+    assert (listed['unread_count'], listed['mention_count']) == (2, 1)
+
+
+async def test_ack_clears_up_to_the_message(client, signup):
+    server, channel, (_, owner_headers), (_, member_headers) = await shared_channel(client, signup)
+    await client.post(f"/api/servers/join/{server['invite_code']}", headers=member_headers)
+    messages = await send(client, channel, owner_headers, [f'Message {i}' for i in range(4)])
+
+    response = await client.post(f"/api/channels/{channel['id']}/ack", json={'message_id': messages[1]['id']}, headers=member_headers)
+    assert response.json()['last_read_id'] == messages[1]['id']
+    assert await badges(client, server, channel, member_headers) == (2, 0)
+
+    # An older ack never moves the marker back
+    await client.post(f"/api/channels/{channel['id']}/ack", json={'message_id': messages[0]['id']}, headers=member_headers)
+    assert await badges(client, server, channel, member_headers) == (2, 0)
+
+    await client.post(f"/api/channels/{channel['id']}/ack", json={}, headers=member_headers)
+    assert await badges(client, server, channel, member_headers) == (0, 0)
+
+
+async def test_own_messages_are_never_unread(client, signup):
+    server, channel, (_, owner_headers), _ = await shared_channel(client, signup)
+    await send(client, channel, owner_headers, ['Mine'])
+    assert await badges(client, server, channel, owner_headers) == (0, 0)
+
+
+async def test_counts_stop_at_the_cap(client, signup):
+    from core import read_state
+    server, channel, (_, owner_headers), (member, member_headers) = await shared_channel(client, signup)
+    await client.post(f"/api/servers/join/{server['invite_code']}", headers=member_headers)
+    await send(client, channel, owner_headers, [f"@{member['username']} {i}" for i in range(UNREAD_COUNT_CAP + 5)])
+    assert await badges(client, server, channel, member_headers) == (UNREAD_COUNT_CAP, UNREAD_COUNT_CAP)
+
+    # Without any marker the scan is still bounded
+    await read_state.flush()
+    read_state.pending.clear()
+    await read_state.db.read_states.delete_many({'user_id': member['id']})
+    assert await badges(client, server, channel, member_headers) == (UNREAD_COUNT_CAP, UNREAD_COUNT_CAP)
+
+
+async def test_ack_needs_membership(client, signup):
+    _, channel, _, (_, member_headers) = await shared_channel(client, signup)
+    response = await client.post(f"/api/channels/{channel['id']}/ack", json={}, headers=member_headers)
+    assert response.status_code == 403
@@ -0,0 +1,98 @@
+"""Threaded reel comments: keyset pages, one-level threads, counters and top comments."""
+
+
+async def create_reel(client, headers: dict) -> dict:
+    return (await client.post('/api/reels', json={'title': 'Commented', 'video_url': 'https://example.invalid/v.mp4'}, headers=headers)).json()
+
+
+async def comment(client, reel: dict, headers: dict, content: str, parent_id: str = None) -> dict:
+    response = await client.post(f"/api/reels/{reel['id']}/comments", headers=headers,
+                                 json={'content': content, 'reel_id': reel['id'], 'parent_id': parent_id})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_top_level_pages_newest_first_and_replies_oldest_first(client, signup):
+    _, headers = await signup('viewer')
+    reel = await create_reel(client, headers)
+    top = [await comment(client, reel, headers, f'Comment {i}') for i in range(7)]
+    first = await comment(client, reel, headers, 'Reply 0', top[0]['id'])
+    # Replying to a reply joins the top-level thread
+    second = await comment(client, reel, headers, 'Reply 1', first['id'])
+    assert second['parent_id'] == top[0]['id']
+
+    contents, cursor = [], None
+    while True:
+        response = await client.get(f"/api/reels/{reel['id']}/comments", params={'limit': 3, **({'cursor': cursor} if cursor else {})}, headers=headers)
+        contents += [c['content'] for c in response.json()]
+        cursor = response.headers.get('x-next-cursor')
+        if not cursor:
+            break
+    assert contents == [f'Comment {i}' for i in reversed(range(7))]
+
+    path = f"/api/reels/{reel['id']}/comments/{top[0]['id']}/replies"
+    page = (await client.get(path, params={'limit': 1}, headers=headers)).json()
+    assert [c['content'] for c in page['replies']] == ['Reply 0']
+    page = (await client.get(path, params={'limit': 1, 'cursor': page['next_cursor']}, headers=headers)).json()
+    assert [c['content'] for c in page['replies']] == ['Reply 1']
+    assert page['next_cursor'] is None
+
+
+async def test_replying_to_a_missing_comment_is_a_404(client, signup):
+    _, headers = await signup('viewer')
+    reel = await create_reel(client, headers)
+    response = await client.post(f"/api/reels/{reel['id']}/comments", json={'content': 'Hi', 'reel_id': reel['id'], 'parent_id': 'missing'}, headers=headers)
+    assert response.status_code == 404
+
+
+async def test_reply_notifies_the_comment_replied_to(client, signup):
+    from core import notification_inbox
+    _, headers = await signup('viewer')
+    _, replier_headers = await signup('replier')
+    reel = await create_reel(client, headers)
+    top = await comment(client, reel, replier_headers, 'Top')
+    reply = await comment(client, reel, headers, 'Reply', top['id'])
+    await comment(client, reel, replier_headers, 'Reply to reply', reply['id'])
+    await notification_inbox.flush()
+
+    notifications = (await client.get('/api/notifications', headers=headers)).json()['notifications']
+    replies = [n for n in notifications if n['kind'] == 'reply']
+    assert [n['target'] for n in replies] == [{'type': 'reel_comment', 'id': reply['id'], 'thread_id': top['id'], 'reel_id': reel['id']}]
+
+
+async def test_counters_count_each_comment_once(client, db, signup, jobs_done):
+    from core import reel_comments
+    _, headers = await signup('viewer')
+    reel = await create_reel(client, headers)
+    parent = await comment(client, reel, headers, 'Parent')
+    replies = [await comment(client, reel, headers, f'Reply {i}', parent['id']) for i in range(2)]
+    await jobs_done()
+
+    # A retried job finds the comment already counted
+    for counted in [parent] + replies:
+        await reel_comments.count(counted['id'])
+    assert (await db.reels.find_one({'id': reel['id']}))['comments_count'] == 3
+    listed = (await client.get(f"/api/reels/{reel['id']}/comments", headers=headers)).json()
+    assert listed[0]['reply_count'] == 2
+    assert 'counted' not in listed[0]
+
+
+async def test_likes_toggle_and_rank_top_comments(client, signup):
+    from core import reel_comments
+    _, headers = await signup('viewer')
+    _, other_headers = await signup('fan')
+    reel = await create_reel(client, headers)
+    comments = [await comment(client, reel, headers, f'Comment {i}') for i in range(5)]
+    like = f"/api/reels/{reel['id']}/comments/{{}}/like"
+
+    assert (await client.post(like.format(comments[1]['id']), headers=headers)).json() == {'liked': True, 'likes_count': 1}
+    assert (await client.post(like.format(comments[1]['id']), headers=other_headers)).json() == {'liked': True, 'likes_count': 2}
+    await client.post(like.format(comments[3]['id']), headers=headers)
+    await client.post(like.format(comments[4]['id']), headers=headers)
+    assert (await client.post(like.format(comments[4]['id']), headers=headers)).json() == {'liked': False, 'likes_count': 0}
+    assert (await client.post(f"/api/reels/other/comments/{comments[1]['id']}/like", headers=headers)).status_code == 404
+
+    await reel_comments.refresh()
+    loaded = (await client.get(f"/api/reels/{reel['id']}", headers=headers)).json()
+    assert [c['content'] for c in loaded['top_comments']] == ['Comment 1', 'Comment 3', 'Comment 4']
+    assert loaded['top_comments'][0]['author']['username'].startswith('viewer')